@@ -0,0 +1,42 @@
+# Reproduces why sps_http_client gives every thread its own HTTP/2 client: one httpx HTTP/2 client (and so one
+# multiplexed connection) shared by many threads corrupts its streams under load. Expect KeyError /
+# RemoteProtocolError (ConnectionTerminated PROTOCOL_ERROR) counts with enough threads; one client per thread has none.
+# usage: python bench_h2_shared_client.py PORT WORKERS CALLS
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+PORT, WORKERS, CALLS = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+URL = f"https://localhost:{PORT}/placementScores"
+
+
+def run(label, get_client):
+    errors = Counter()
+
+    def one(_):
+        try:
+            get_client().post(URL, json={}).raise_for_status()
+        except Exception as e:
+            errors[f"{type(e).__name__}: {str(e)[:60]}"] += 1
+
+    with ThreadPoolExecutor(WORKERS) as executor:
+        list(executor.map(one, range(CALLS)))
+    print(f"{label:20s} {WORKERS} threads, {CALLS} calls, errors {sum(errors.values())} {dict(errors)}")
+
+
+shared = httpx.Client(http2=True)
+run("shared client", lambda: shared)
+
+local = threading.local()
+
+
+def thread_client():
+    if not hasattr(local, "client"):
+        local.client = httpx.Client(http2=True, limits=httpx.Limits(max_connections=1, max_keepalive_connections=1))
+    return local.client
+
+
+run("client per thread", thread_client)
@@ -0,0 +1,66 @@
+# Throughput of the placementScores calls with and without the shared connection pool of sps_http_client
+# modes:
+#   per-call   module-level requests.post, a new connection (and TLS handshake) per call, as before the pool
+#   pooled     sps_http_client with the requests pool sized to the worker threads
+#   http2      sps_http_client with one HTTP/2 httpx client per thread (collect_sps.py --http2)
+# usage: python bench_http_pool.py PORT WORKERS CALLS MODE [MODE ...]
+# The server certificate must be trusted through REQUESTS_CA_BUNDLE and SSL_CERT_FILE (run.sh sets both).
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../collector/spot-dataset/azure/batch"))
+from sps_module import sps_http_client, sps_shared_resources  # noqa: E402
+
+PORT, WORKERS, CALLS = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+URL = (f"https://localhost:{PORT}/subscriptions/00000000-0000-0000-0000-000000000000/providers/Microsoft.Compute"
+       f"/locations/koreacentral/placementScores/spot/generate?api-version=2025-06-05")
+BODY = {"availabilityZones": True, "desiredCount": 1, "desiredLocations": ["koreacentral"] * 8,
+        "desiredSizes": [{"sku": "Standard_D2_v3"}] * 5}
+# an ARM bearer token is about 1.5 kB
+HEADERS = {"Authorization": "Bearer " + "x" * 1500, "Content-Type": "application/json"}
+
+
+def run(mode):
+    if mode == "per-call":
+        def call():
+            return requests.post(URL, headers=HEADERS, json=BODY, timeout=50)
+    else:
+        sps_shared_resources.http2 = mode == "http2"
+        client = sps_http_client.configure_http_client(WORKERS)
+
+        def call():
+            return client.post(URL, headers=HEADERS, json=BODY)
+
+    latencies = []
+    errors = Counter()
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            response = call()
+            response.raise_for_status()
+            response.json()
+        except Exception as e:
+            errors[repr(e)[:80]] += 1
+            return
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(WORKERS) as executor:
+        list(executor.map(one, range(CALLS)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float("nan")
+    print(f"{mode:10s} {WORKERS:3d} threads {CALLS / elapsed:8.1f} calls/s  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  "
+          f"errors {sum(errors.values())} {dict(errors) if errors else ''}")
+
+
+for mode in sys.argv[4:]:
+    run(mode)
@@ -0,0 +1,83 @@
+# Thread pool vs async SPS engine of load_sps.py against fake_arm_server.py
+# Runs execute_spot_placement_score_task_by_parameter_pool_df() with one engine over CALLS request rows of 3 regions
+# and 4 instance types (every 20th row with the invalid "badregion"), for desired counts 5 and 10, on LOCATIONS
+# locations of 3 subscriptions. Prints the wall time, the answers counted by the server, the retry counters and a
+# digest of the sorted result frame: runs of both engines that answered every call have the same digest.
+# The fake server does not check the bearer token, so a fixed token and subscription list replace utils.azure_auth,
+# which reads the Azure credentials from DynamoDB, and the task state is not saved to S3.
+# usage: python bench_sps_engines.py PORT ENGINE [CALLS] [LOCATIONS]   (ENGINE: thread or async)
+import json
+import os
+import random
+import sys
+import time
+import types
+import urllib.request
+
+import pandas as pd
+
+BATCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../collector/spot-dataset/azure/batch")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+sys.path.insert(0, BATCH_DIR)
+sys.path.insert(0, os.path.join(BATCH_DIR, "sps"))
+
+PORT, ENGINE = int(sys.argv[1]), sys.argv[2]
+CALLS = int(sys.argv[3]) if len(sys.argv) > 3 else 600
+LOCATIONS = [f"location{i}" for i in range(int(sys.argv[4]) if len(sys.argv) > 4 else 50)]
+SUBSCRIPTIONS = ["subscription-a", "subscription-b", "subscription-c"]
+
+sys.modules["utils.azure_auth"] = types.SimpleNamespace(
+    get_sps_token_and_subscriptions=lambda availability_zones=True: ("token", list(SUBSCRIPTIONS)))
+import load_sps  # noqa: E402
+from sps_module import sps_location_manager  # noqa: E402
+
+SS_Resources = load_sps.SS_Resources
+
+
+def prepare(regions, instance_types):
+    SS_Resources.sps_engine = ENGINE
+    SS_Resources.management_endpoint = f"http://127.0.0.1:{PORT}"
+    SS_Resources.available_locations = LOCATIONS
+    SS_Resources.locations_call_history_tmp = {subscription_id: {location: [] for location in LOCATIONS}
+                                               for subscription_id in SUBSCRIPTIONS}
+    SS_Resources.locations_over_limit_tmp = {subscription_id: {} for subscription_id in SUBSCRIPTIONS}
+    SS_Resources.last_subscription_id_and_location_tmp = {}
+    SS_Resources.sps_last_collected_tmp = {}
+    SS_Resources.invalid_regions_tmp, SS_Resources.invalid_instance_types_tmp = [], []
+    SS_Resources.location_scheduler = sps_location_manager.LocationScheduler(
+        SUBSCRIPTIONS, LOCATIONS, SS_Resources.locations_call_history_tmp, SS_Resources.locations_over_limit_tmp)
+    SS_Resources.region_map_and_instance_map_tmp = {
+        "region_map": {region: region.upper() for region in regions},
+        "instance_map": {sku: {"InstanceTier": "Standard", "InstanceTypeOld": sku.lower()} for sku in instance_types},
+    }
+    load_sps.save_tmp_files_to_s3 = lambda: None
+    load_sps.initialize_sps_count_resources()
+
+
+def main():
+    rng = random.Random(7)
+    regions = [f"region{i}" for i in range(30)]
+    instance_types = [f"Standard_D{i}_v5" for i in range(40)]
+    api_calls_df = pd.DataFrame([
+        {"Regions": rng.sample(regions, 3) + (["badregion"] if index % 20 == 0 else []),
+         "InstanceTypes": rng.sample(instance_types, 4)}
+        for index in range(CALLS)
+    ])
+    prepare(regions, instance_types)
+
+    urllib.request.urlopen(f"http://127.0.0.1:{PORT}/reset").read()
+    start = time.perf_counter()
+    result_df = load_sps.execute_spot_placement_score_task_by_parameter_pool_df(api_calls_df, [5, 10])
+    seconds = time.perf_counter() - start
+    stats = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{PORT}/stats").read())
+
+    result_df = result_df.sort_values(list(result_df.columns)).reset_index(drop=True)
+    digest = pd.util.hash_pandas_object(result_df.astype(str), index=False).sum() & 0xFFFFFFFF
+    print(f"{ENGINE}: {seconds:.1f} s, {len(result_df)} rows (digest {digest:08x}), server {stats}")
+    print(f"  retries: timeout {SS_Resources.time_out_retry_count}, bad gateway {SS_Resources.bad_request_retry_count}, "
+          f"pair limit {SS_Resources.too_many_requests_count}, 429 {SS_Resources.too_many_requests_count_2}, "
+          f"invalid region {SS_Resources.found_invalid_region_retry_count}")
+
+
+if __name__ == "__main__":
+    main()
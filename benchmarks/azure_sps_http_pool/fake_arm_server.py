@@ -0,0 +1,107 @@
+# Fake ARM placementScores endpoint for bench_sps_engines.py, enforcing the quotas the SPS engines have to live with
+#   - per (subscription, location) pair: PAIR_LIMIT answered calls per run, then 429 "You have reached the maximum
+#     number of requests allowed." with Retry-After: 3600
+#   - per subscription: at most SUBSCRIPTION_IN_FLIGHT calls in flight, then 429 TooManyRequests with Retry-After: 1
+#   - the "badregion" region answers 400 InvalidParameter with the ARM message naming it
+#   - BAD_GATEWAY_RATE of the admitted calls answer 502 BadGatewayConnection
+# Every admitted call waits 0.1-0.3 s. Scores are a hash of (sku, region, zone, desired count), so runs are comparable.
+# GET /stats returns the answer counters, GET /reset clears them and the pair quotas.
+# usage: python fake_arm_server.py PORT PAIR_LIMIT SUBSCRIPTION_IN_FLIGHT [BAD_GATEWAY_RATE]
+import hashlib
+import http.server
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+PORT, PAIR_LIMIT, SUBSCRIPTION_IN_FLIGHT = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+BAD_GATEWAY_RATE = float(sys.argv[4]) if len(sys.argv) > 4 else 0.01
+INVALID_REGIONS = {"badregion"}
+URL = re.compile(r"/subscriptions/([^/]+)/providers/Microsoft.Compute/locations/([^/]+)/placementScores")
+
+lock = threading.Lock()
+pair_calls = Counter()
+in_flight = Counter()
+stats = Counter()
+
+
+def score(sku, region, zone, desired_count):
+    digest = int(hashlib.md5(f"{sku}{region}{zone}{desired_count}".encode()).hexdigest(), 16)
+    return ["High", "Medium", "Low"][digest % 3]
+
+
+def error(code, message):
+    return {"error": {"code": code, "message": message}}
+
+
+class FakeArmHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def answer(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        with lock:
+            if self.path == "/reset":
+                pair_calls.clear()
+                stats.clear()
+            self.answer(200, dict(stats))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        subscription_id, location = URL.search(self.path).groups()
+        with lock:
+            stats["requests"] += 1
+            if in_flight[subscription_id] >= SUBSCRIPTION_IN_FLIGHT:
+                stats["429_subscription"] += 1
+                return self.answer(429, error("TooManyRequests", "Too many requests for the subscription"),
+                                   [("Retry-After", "1")])
+            if pair_calls[(subscription_id, location)] >= PAIR_LIMIT:
+                stats["429_pair"] += 1
+                return self.answer(429, error("TooManyRequests", "You have reached the maximum number of requests allowed."),
+                                   [("Retry-After", "3600")])
+            pair_calls[(subscription_id, location)] += 1
+            in_flight[subscription_id] += 1
+        try:
+            time.sleep(random.uniform(0.1, 0.3))
+            invalid = [region for region in body["desiredLocations"] if region in INVALID_REGIONS]
+            if invalid:
+                status, outcome = 400, "400_invalid_region"
+                answer = error("InvalidParameter", f"The value '{invalid[0]}' provided for the input parameter "
+                                                   f"'desiredLocations' is not valid")
+            elif random.random() < BAD_GATEWAY_RATE:
+                status, outcome = 502, "502"
+                answer = error("BadGatewayConnection", "BadGatewayConnection")
+            else:
+                status, outcome = 200, "200"
+                answer = {"placementScores": [
+                    {"sku": size["sku"], "region": region, "availabilityZone": str(zone),
+                     "score": score(size["sku"], region, zone, body["desiredCount"])}
+                    for region in body["desiredLocations"] for size in body["desiredSizes"] for zone in (1, 2, 3)
+                ]}
+            with lock:
+                stats[outcome] += 1
+            self.answer(status, answer)
+        finally:
+            with lock:
+                in_flight[subscription_id] -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", PORT), FakeArmHandler)
+server.daemon_threads = True
+server.request_queue_size = 1024
+server.serve_forever()
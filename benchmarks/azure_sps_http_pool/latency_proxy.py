@@ -0,0 +1,54 @@
+# TCP proxy that delays every chunk by DELAY seconds in both directions (RTT = 2 * DELAY), so the benchmark pays for
+# the TCP and TLS handshakes of new connections the way a call to management.azure.com does
+# usage: python latency_proxy.py LISTEN_PORT TARGET_PORT DELAY
+import asyncio
+import sys
+
+LISTEN_PORT, TARGET_PORT, DELAY = int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3])
+
+
+async def pipe(reader, writer):
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+
+    async def read():
+        while True:
+            data = await reader.read(65536)
+            await queue.put((loop.time() + DELAY, data))
+            if not data:
+                return
+
+    async def write():
+        while True:
+            deliver_at, data = await queue.get()
+            delay = deliver_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not data:
+                try:
+                    writer.write_eof()
+                except Exception:
+                    pass
+                return
+            writer.write(data)
+            await writer.drain()
+
+    try:
+        await asyncio.gather(read(), write())
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+
+async def handle(client_reader, client_writer):
+    server_reader, server_writer = await asyncio.open_connection("127.0.0.1", TARGET_PORT)
+    await asyncio.gather(pipe(client_reader, server_writer), pipe(server_reader, client_writer))
+
+
+async def main():
+    server = await asyncio.start_server(handle, "127.0.0.1", LISTEN_PORT, backlog=1024)
+    async with server:
+        await server.serve_forever()
+
+asyncio.run(main())
@@ -0,0 +1,45 @@
+# TLS mock of the placementScores endpoint for bench_http_pool.py
+# Every POST waits `service_time` seconds and answers a fixed placementScores body, over HTTP/1.1 or HTTP/2 (ALPN).
+# usage: python mock_server.py PORT CERT_FILE KEY_FILE [SERVICE_TIME]
+import asyncio
+import json
+import sys
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+PORT, CERT_FILE, KEY_FILE = int(sys.argv[1]), sys.argv[2], sys.argv[3]
+SERVICE_TIME = float(sys.argv[4]) if len(sys.argv) > 4 else 0.02
+BODY = json.dumps({"placementScores": [
+    {"sku": "Standard_D2_v3", "region": "koreacentral", "availabilityZone": str(zone), "score": "High"}
+    for zone in (1, 2, 3)
+]}).encode()
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            else:
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await asyncio.sleep(SERVICE_TIME)
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+config = Config()
+config.bind = [f"127.0.0.1:{PORT}"]
+config.certfile, config.keyfile = CERT_FILE, KEY_FILE
+config.alpn_protocols = ["h2", "http/1.1"]
+config.keep_alive_timeout = 60
+config.backlog = 1024
+config.loglevel = "ERROR"
+config.accesslog = None
+asyncio.run(serve(app, config))
@@ -0,0 +1,28 @@
+#!/bin/bash
+# Pooled vs per-call placementScores throughput against a local TLS mock server, directly and through a proxy adding
+# 20 ms RTT, then the shared HTTP/2 client regression.
+# requires: hypercorn, httpx, h2 (benchmark only) and openssl
+set -euo pipefail
+cd "$(dirname "$0")"
+
+WORKDIR=$(mktemp -d)
+trap 'kill $(jobs -p) 2>/dev/null; rm -rf "$WORKDIR"' EXIT
+
+openssl req -x509 -newkey rsa:2048 -nodes -days 1 -subj "/CN=localhost" -addext "subjectAltName=DNS:localhost" \
+    -keyout "$WORKDIR/key.pem" -out "$WORKDIR/cert.pem" 2>/dev/null
+export REQUESTS_CA_BUNDLE="$WORKDIR/cert.pem" SSL_CERT_FILE="$WORKDIR/cert.pem"
+
+python mock_server.py 18443 "$WORKDIR/cert.pem" "$WORKDIR/key.pem" 0.02 2>/dev/null &
+python latency_proxy.py 18444 18443 0.01 2>/dev/null &
+sleep 2
+
+for workers_calls in "40 2000" "8 800"; do
+    set -- $workers_calls
+    echo "== direct, $1 threads"
+    python bench_http_pool.py 18443 "$1" "$2" per-call pooled http2
+    echo "== 20 ms RTT, $1 threads"
+    python bench_http_pool.py 18444 "$1" "$2" per-call pooled http2
+done
+
+echo "== shared HTTP/2 client"
+python bench_h2_shared_client.py 18443 40 2000
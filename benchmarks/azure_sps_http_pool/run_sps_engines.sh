@@ -0,0 +1,20 @@
+#!/bin/bash
+# Thread pool vs async SPS engine against fake ARM servers: loose quotas, a cap of 25 calls in flight per subscription
+# (429 + Retry-After: 1), and a per-pair quota of 5 calls that the run exhausts
+set -euo pipefail
+cd "$(dirname "$0")"
+
+trap 'kill $(jobs -p) 2>/dev/null' EXIT
+
+python fake_arm_server.py 18600 1000 1000 0.01 &
+python fake_arm_server.py 18601 1000 25 0.01 &
+python fake_arm_server.py 18602 5 1000 0.01 &
+sleep 1
+
+for port_name in "18600 loose quotas" "18601 25 in flight per subscription" "18602 5 calls per pair"; do
+    set -- $port_name
+    echo "== ${port_name#* }"
+    for engine in thread async; do
+        python bench_sps_engines.py "$1" "$engine" 2>&1 | grep -E "^(thread|async):|^  retries:|RuntimeError" || true
+    done
+done
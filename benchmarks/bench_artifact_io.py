@@ -0,0 +1,97 @@
+# Size and latency of the intermediate AWS batch artifacts in the two formats of utility/artifact_io.py
+#   pickle   the .pkl.gz artifacts written before the switch (pickle.dump into a GzipFile)
+#   parquet  the default format, Parquet with zstd
+# Frames have the shape of the collector outputs: SPS (810 instance types over 99 AZs), IF and on-demand price
+# (810 x 33 regions) and spot price (categorical keys, as load_price.py builds them). Both formats must round-trip
+# every frame unchanged. "merge read" loads only the columns merge_data.py asks for.
+# usage: python benchmarks/bench_artifact_io.py [--scale 1] [--repeat 5]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utility.artifact_io import dumps_df, loads_df  # noqa: E402
+
+# columns merge_data.py loads from each artifact
+MERGE_COLUMNS = {
+    "sps": ["InstanceType", "Region", "AZ", "SPS", "T3", "T2"],
+    "if": ["InstanceType", "Region", "IF"],
+    "ondemand_price": ["InstanceType", "Region", "OndemandPrice"],
+    "spot_price": ["InstanceType", "AZ", "SpotPrice"],
+}
+
+
+def frames(scale, seed=0):
+    rng = np.random.default_rng(seed)
+    instance_types = [f"{family}{generation}.{size}" for family in "cmrtx" for generation in range(1, int(18 * scale) + 1)
+                      for size in ["large", "xlarge", "2xlarge", "4xlarge", "8xlarge", "12xlarge", "metal", "nano", "micro"]]
+    regions = [f"region-{i}" for i in range(33)]
+    zones = [(region, f"{region[-2:]}-az{k}") for region in regions for k in range(1, 4)]
+
+    sps_rows = len(instance_types) * len(zones)
+    sps = rng.integers(1, 4, sps_rows)
+    target_capacity = 50
+    sps_df = pd.DataFrame({
+        "InstanceType": np.repeat(instance_types, len(zones)),
+        "Region": [region for region, _ in zones] * len(instance_types),
+        "AZ": [zone for _, zone in zones] * len(instance_types),
+        "SPS": sps,
+        "TargetCapacity": target_capacity,
+        "T3": np.where(sps >= 3, target_capacity, 0),
+        "T2": np.where(sps == 2, target_capacity, 0),
+    })
+
+    # prices repeat like the real ones: one base price per instance type, a few regional multipliers and spot discounts
+    base_price = rng.random(len(instance_types)) * 20
+    region_rows = len(instance_types) * len(regions)
+    if_df = pd.DataFrame({
+        "Region": regions * len(instance_types),
+        "InstanceType": np.repeat(instance_types, len(regions)),
+        "IF": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0], region_rows),
+    })
+    ondemand_price_df = pd.DataFrame({
+        "Region": regions * len(instance_types),
+        "InstanceType": np.repeat(instance_types, len(regions)),
+        "OndemandPrice": (np.repeat(base_price, len(regions)) * rng.choice([1.0, 1.08, 1.12, 1.25], region_rows)).round(5),
+    })
+    spot_price_df = pd.DataFrame({
+        "InstanceType": pd.Categorical(sps_df["InstanceType"]),
+        "AZ": pd.Categorical(sps_df["AZ"]),
+        "SpotPrice": (np.repeat(base_price, len(zones)) * rng.choice(np.linspace(0.2, 0.7, 11), sps_rows)).round(5),
+    })
+    return {"sps": sps_df, "if": if_df, "ondemand_price": ondemand_price_df, "spot_price": spot_price_df}
+
+
+def best_of(repeat, function):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'artifact':>14} {'rows':>7} {'format':>7} {'size':>9} {'write':>9} {'full read':>10} {'merge read':>11}")
+    for name, df in frames(args.scale).items():
+        for fmt in ["pickle", "parquet"]:
+            write_ms, body = best_of(args.repeat, lambda: dumps_df(df, fmt))
+            read_ms, loaded = best_of(args.repeat, lambda: loads_df(body, fmt))
+            pd.testing.assert_frame_equal(loaded, df, obj=f"{name} {fmt} round trip")
+            merge_read_ms, _ = best_of(args.repeat, lambda: loads_df(body, fmt, columns=MERGE_COLUMNS[name]))
+            print(f"{name:>14} {len(df):>7} {fmt:>7} {len(body) / 1024:>6.0f} KB {write_ms:>6.1f} ms "
+                  f"{read_ms:>7.1f} ms {merge_read_ms:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
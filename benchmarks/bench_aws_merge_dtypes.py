@@ -0,0 +1,157 @@
+# Latency and memory of the AWS merge step with and without the canonical dtypes of merge/merge_schema.py
+#   object/int64   the merge before merge_schema.py: string keys, int64 SPS/T3/T2, float64 IF
+#   schema         merge_frames() of merge/merge_data.py: shared categorical keys, int8 SPS, int16 T3/T2, float32 IF
+# Inputs are synthetic, --scale 1 is about 850 instance types x 33 regions (76k SPS rows). The spot prices come in with
+# categorical keys as handed over by collect_price. Both merges must return the same values in the same row order.
+# Each variant is measured in its own process; the peak RSS over the inputs uses /proc/self/clear_refs (Linux only).
+# usage: python benchmarks/bench_aws_merge_dtypes.py [--scale 1 3] [--repeat 5]
+import argparse
+import ast
+import gc
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+MERGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/aws/batch/merge")
+sys.path.insert(0, MERGE_DIR)
+from merge_schema import NUMERIC_DTYPES, build_vocabularies, apply_schema  # noqa: E402
+
+
+# merge_data.py creates S3 and Timestream clients at import, so only merge_frames() is compiled out of it
+def load_merge_frames():
+    path = os.path.join(MERGE_DIR, "merge_data.py")
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    function = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == "merge_frames")
+    namespace = {"pd": pd, "NUMERIC_DTYPES": NUMERIC_DTYPES, "build_vocabularies": build_vocabularies,
+                 "apply_schema": apply_schema}
+    exec(compile(ast.Module(body=[function], type_ignores=[]), path, "exec"), namespace)
+    return namespace["merge_frames"]
+
+
+# the merge of merge_data.py before merge_schema.py
+def object_merge(sps_df, spotinfo_df, ondemand_price_df, spot_price_df, time_value):
+    sps_df = sps_df[['InstanceType', 'Region', 'AZ', 'SPS', 'T3', 'T2']]
+    spotinfo_df = spotinfo_df[['InstanceType', 'Region', 'IF']]
+    ondemand_price_df = ondemand_price_df[['InstanceType', 'Region', 'OndemandPrice']]
+    spot_price_df = spot_price_df[['InstanceType', 'AZ', 'SpotPrice']].copy()
+    ondemand_price_df = ondemand_price_df.copy()
+
+    spot_price_df['SpotPrice'] = spot_price_df['SpotPrice'].astype('float').round(5)
+    ondemand_price_df['OndemandPrice'] = ondemand_price_df['OndemandPrice'].astype('float').round(5)
+
+    merge_df = pd.merge(sps_df, spotinfo_df, how="outer")
+    merge_df = pd.merge(merge_df, ondemand_price_df, how="outer")
+    merge_df = pd.merge(merge_df, spot_price_df, how="outer")
+
+    merge_df['Savings'] = 100.0 - (merge_df['SpotPrice'] * 100 / merge_df['OndemandPrice'])
+    merge_df['Savings'] = merge_df['Savings'].fillna(-1)
+    merge_df['SPS'] = merge_df['SPS'].fillna(-1)
+    merge_df['SpotPrice'] = merge_df['SpotPrice'].fillna(-1)
+    merge_df['OndemandPrice'] = merge_df['OndemandPrice'].fillna(-1)
+    merge_df['IF'] = merge_df['IF'].fillna(-1)
+
+    merge_df['Savings'] = merge_df['Savings'].astype('int')
+    merge_df['SPS'] = merge_df['SPS'].astype('int')
+    merge_df['T3'] = merge_df['T3'].fillna(0).astype('int')
+    merge_df['T2'] = merge_df['T2'].fillna(0).astype('int')
+
+    merge_df = merge_df.drop(merge_df[(merge_df['AZ'].isna()) | (merge_df['Region'].isna()) | (merge_df['InstanceType'].isna())].index)
+
+    merge_df.reset_index(drop=True, inplace=True)
+    merge_df['Time'] = time_value
+    return merge_df
+
+
+def inputs(scale, seed=0):
+    rng = np.random.default_rng(seed)
+    type_count, region_count = int(850 * scale), 33
+    types = np.array([f"{family}{generation}.{size}" for family, generation, size in
+                      zip(rng.choice(list("cmrtxzgpi"), type_count), range(type_count),
+                          rng.choice(["large", "xlarge", "2xlarge", "metal"], type_count))])
+    regions = np.array([f"region-{i}" for i in range(region_count)])
+    zones = {region: [f"{region[-2:]}-az{k}" for k in range(1, 4 + (i % 3))] for i, region in enumerate(regions)}
+    type_index, region_index = np.nonzero(rng.random((type_count, region_count)) < 0.75)
+
+    rows = [(types[t], regions[r], zone) for t, r in zip(type_index, region_index) for zone in zones[regions[r]]
+            if rng.random() < 0.9]
+    sps_df = pd.DataFrame(rows, columns=["InstanceType", "Region", "AZ"])
+    sps_df["SPS"] = rng.integers(1, 4, len(sps_df))
+    sps_df["T3"] = 0
+    sps_df["T2"] = 0
+    sps_df = sps_df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    spotinfo_df = pd.DataFrame({"Region": regions[region_index], "InstanceType": types[type_index],
+                                "IF": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0], len(type_index))})
+    spotinfo_df = spotinfo_df.sample(frac=0.97, random_state=1)
+    ondemand_price_df = pd.DataFrame({"InstanceType": types[type_index], "Region": regions[region_index],
+                                      "OndemandPrice": rng.random(len(type_index)) * 20})
+    ondemand_price_df = ondemand_price_df.sample(frac=0.98, random_state=2)
+    spot_price_df = sps_df[["InstanceType", "AZ"]].sample(frac=0.95, random_state=3)
+    spot_price_df["SpotPrice"] = rng.random(len(spot_price_df)) * 5
+    # zones without SPS rows, dropped by the merge
+    spot_price_df = pd.concat([spot_price_df, pd.DataFrame({"InstanceType": types[:50], "AZ": "zz-az9", "SpotPrice": 0.5})],
+                              ignore_index=True)
+    spot_price_df = spot_price_df.astype({"InstanceType": "category", "AZ": "category"})
+    return sps_df, spotinfo_df, ondemand_price_df, spot_price_df
+
+
+def check(scale):
+    frames = inputs(scale)
+    expected = object_merge(*[df.copy() for df in frames], "2026-10-18 00:00:00")
+    merged = load_merge_frames()(*[df.copy() for df in frames], "2026-10-18 00:00:00")
+    pd.testing.assert_frame_equal(expected, merged.astype(expected.dtypes.to_dict()))
+    return len(frames[0]), expected.memory_usage(deep=True).sum(), merged.memory_usage(deep=True).sum()
+
+
+def rss_mib(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+
+
+# run in a child process: prints "<ms per merge> <peak RSS over the inputs in MiB>"
+def measure(variant, scale, repeat):
+    merge = object_merge if variant == "object" else load_merge_frames()
+    frames = inputs(scale)
+    merge(*frames, "t")
+    gc.collect()
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    base = rss_mib("VmRSS:")
+    merged = merge(*frames, "t")
+    peak = rss_mib("VmHWM:") - base
+    del merged
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        merge(*frames, "t")
+    print(f"{(time.perf_counter() - start) / repeat * 1000:.0f} {peak:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 3])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--measure", nargs=2, metavar=("VARIANT", "SCALE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure[0], float(args.measure[1]), args.repeat)
+        return
+
+    print(f"{'scale':>5} {'SPS rows':>9} {'variant':>7} {'ms':>6} {'peak RSS':>9} {'merged frame':>13}")
+    for scale in args.scale:
+        sps_rows, object_bytes, schema_bytes = check(scale)
+        for variant, frame_bytes in [("object", object_bytes), ("schema", schema_bytes)]:
+            output = subprocess.run([sys.executable, __file__, "--measure", variant, str(scale), "--repeat", str(args.repeat)],
+                                    check=True, capture_output=True, text=True).stdout.split()
+            print(f"{scale:>5g} {sps_rows:>9} {variant:>7} {output[0]:>6} {output[1]:>5} MiB {frame_bytes / 2**20:>9.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
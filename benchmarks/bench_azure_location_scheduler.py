@@ -0,0 +1,197 @@
+# Cost of handing out Azure SPS (subscription, location) pairs under the global location lock
+#   scan        get_next_available_location() before LocationScheduler: expire and re-parse the whole call history, then
+#               scan the pairs round-robin from the last one handed out
+#   scheduler   sps_location_manager.LocationScheduler: FIFO ready queue plus availability heap, lazy expiry
+# 30 subscriptions x 60 locations, with 0, 5 and 9 calls per pair already made in the window by previous runs.
+# With no prior calls both must hand out the same sequence of pairs. The scan makes a full run take about five minutes.
+# usage: python benchmarks/bench_azure_location_scheduler.py [--acquisitions 10000] [--prefill 0 5 9] [--threads 64]
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/azure/batch"))
+from sps_module import sps_shared_resources as SS_Resources  # noqa: E402
+from sps_module import sps_location_manager  # noqa: E402
+
+SUBSCRIPTIONS = [f"{i:08x}-0000-0000-0000-000000000000" for i in range(30)]
+LOCATIONS = [f"location{i}" for i in range(60)]
+
+
+# ------ get_next_available_location() of sps_location_manager.py before LocationScheduler ------
+def scan_validation_can_call(subscription_id, location):
+    if SS_Resources.locations_over_limit_tmp.get(subscription_id):
+        if ((location not in SS_Resources.locations_over_limit_tmp.get(subscription_id))
+                and (len(SS_Resources.locations_call_history_tmp[subscription_id][location]) < 10)):
+            return True
+    else:
+        if len(SS_Resources.locations_call_history_tmp[subscription_id][location]) < 10:
+            return True
+    return False
+
+
+def scan_clean_expired_over_limit_locations():
+    if SS_Resources.locations_over_limit_tmp:
+        for subscription_id in SS_Resources.subscriptions:
+            one_hour_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=62)
+            for location_key, location_value in list(
+                    SS_Resources.locations_over_limit_tmp[subscription_id].items()):
+                dt = datetime.fromisoformat(location_value)
+                if dt <= one_hour_ago:
+                    del SS_Resources.locations_over_limit_tmp[subscription_id][location_key]
+
+
+def scan_clean_expired_over_call_history_locations():
+    if SS_Resources.locations_call_history_tmp:
+        one_hour_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=62)
+        for subscription_id in SS_Resources.subscriptions:
+            subscription_data = SS_Resources.locations_call_history_tmp.get(subscription_id, {})
+
+            new_subscription_data = {
+                location: [
+                    t for t in timestamps if datetime.fromisoformat(t) > one_hour_ago
+                ]
+                for location, timestamps in subscription_data.items()
+            }
+            SS_Resources.locations_call_history_tmp[subscription_id] = new_subscription_data
+
+
+def scan_get_next_available_location():
+    try:
+        if SS_Resources.locations_call_history_tmp is None or SS_Resources.locations_over_limit_tmp is None:
+            return None
+
+        scan_clean_expired_over_limit_locations()
+        scan_clean_expired_over_call_history_locations()
+
+        subs = SS_Resources.subscriptions
+        locs = SS_Resources.available_locations
+        if not subs or not locs:
+            return None
+
+        n, m = len(subs), len(locs)
+
+        last_pair = getattr(SS_Resources, "last_subscription_id_and_location_tmp", None) or {}
+        last_sub_id = last_pair.get("last_subscription_id")
+        last_loc = last_pair.get("last_location")
+
+        if last_sub_id in subs and last_loc in locs:
+            s_idx = subs.index(last_sub_id)
+            l_idx = locs.index(last_loc)
+            l_idx = (l_idx + 1) % m
+            if l_idx == 0:
+                s_idx = (s_idx + 1) % n
+        else:
+            s_idx, l_idx = 0, 0
+
+        attempts = 0
+        while attempts < n * m:
+            sub_id = subs[s_idx]
+            loc = locs[l_idx]
+
+            if scan_validation_can_call(sub_id, loc):
+                SS_Resources.succeed_to_get_next_available_location_count += 1
+                SS_Resources.succeed_to_get_next_available_location_count_all += 1
+
+                SS_Resources.locations_call_history_tmp[sub_id][loc].append(
+                    datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
+
+                SS_Resources.last_subscription_id_and_location_tmp = {
+                    "last_subscription_id": sub_id,
+                    "last_location": loc,
+                }
+                return sub_id, loc
+
+            l_idx = (l_idx + 1) % m
+            if l_idx == 0:
+                s_idx = (s_idx + 1) % n
+
+            attempts += 1
+
+    except Exception as e:
+        print("\n[ERROR] Exception occurred in get_next_available_location:")
+        print(traceback.format_exc())
+        print(f"\n[ERROR] Failed to get_next_available_location: {e}")
+        return None
+    return None
+
+
+# calls already made in the window by previous runs, as loaded from S3
+def call_history(prefill, seed=1):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rng = random.Random(seed)
+    return {subscription_id: {location: sorted((now - timedelta(minutes=rng.uniform(0, 61))).isoformat()
+                                               for _ in range(rng.randint(0, prefill)))
+                              for location in LOCATIONS}
+            for subscription_id in SUBSCRIPTIONS}
+
+
+# reset the shared state like check_and_add_available_locations does at the start of a collection
+def setup(variant, prefill):
+    SS_Resources.subscriptions = list(SUBSCRIPTIONS)
+    SS_Resources.available_locations = list(LOCATIONS)
+    SS_Resources.locations_call_history_tmp = call_history(prefill)
+    SS_Resources.locations_over_limit_tmp = {subscription_id: {} for subscription_id in SUBSCRIPTIONS}
+    SS_Resources.last_subscription_id_and_location_tmp = {"last_subscription_id": SUBSCRIPTIONS[3],
+                                                          "last_location": LOCATIONS[10]}
+    if variant == "scan":
+        return scan_get_next_available_location
+    SS_Resources.location_scheduler = sps_location_manager.LocationScheduler(
+        SS_Resources.subscriptions, SS_Resources.available_locations, SS_Resources.locations_call_history_tmp,
+        SS_Resources.locations_over_limit_tmp,
+        sps_location_manager.last_pair_of(SS_Resources.last_subscription_id_and_location_tmp))
+    return sps_location_manager.get_next_available_location
+
+
+def acquire(get_next_available_location, count):
+    pairs = []
+    for _ in range(count):
+        with SS_Resources.location_lock:
+            pairs.append(get_next_available_location())
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--acquisitions", type=int, default=10_000)
+    parser.add_argument("--prefill", type=int, nargs="+", default=[0, 5, 9])
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    # 30 x 60 pairs x 10 calls, plus a few acquisitions after every pair reached its limit
+    exhausted = len(SUBSCRIPTIONS) * len(LOCATIONS) * 10 + 10
+    expected = acquire(setup("scan", 0), exhausted)
+    if acquire(setup("scheduler", 0), exhausted) != expected:
+        raise SystemExit("the scheduler hands out a different sequence of pairs than the scan")
+    print(f"same sequence of pairs over {exhausted} acquisitions with no prior calls")
+
+    for prefill in args.prefill:
+        for variant in ["scan", "scheduler"]:
+            get_next_available_location = setup(variant, prefill)
+            start = time.perf_counter()
+            pairs = acquire(get_next_available_location, args.acquisitions)
+            seconds = time.perf_counter() - start
+            handed_out = sum(pair is not None for pair in pairs)
+            print(f"prior calls per pair <= {prefill}, {variant:>9}: {args.acquisitions} acquisitions in "
+                  f"{seconds * 1000:8.1f} ms ({seconds / args.acquisitions * 1e6:7.1f} us each), {handed_out} pairs handed out")
+
+    for variant in ["scan", "scheduler"]:
+        get_next_available_location = setup(variant, 5)
+        threads = [threading.Thread(target=acquire, args=(get_next_available_location, args.acquisitions // args.threads))
+                   for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"{args.threads} threads, {variant:>9}: {(time.perf_counter() - start) * 1000:8.1f} ms for "
+              f"{args.acquisitions // args.threads * args.threads} acquisitions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Request count and build time of the daily Azure SPS request pool, a set cover of the offered
+# (region, instance type) pairs by requests of at most 8 regions x 5 instance types
+#   greedy          sps_prepare_parameters._cover_remaining_greedily
+#   kmeans+greedy   sps_prepare_parameters.clustering_cover_remaining_greedily, used by load_sps before the lazy greedy
+#   lazy            sps_prepare_parameters.lazy_greedy_cover
+# The support is synthetic, 60 regions x 1500 instance types (about 30k pairs): regions differ in size, instance types
+# in how widely they are offered, and instance types of a family are offered in the same regions. Every cover is
+# checked for full coverage and the request shape. greedy and kmeans+greedy take about a minute per seed.
+# usage: python benchmarks/bench_azure_sps_set_cover.py [--seeds 0 1 2] [--regions 60] [--instance-types 1500]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/azure/batch"))
+from sps_module import sps_prepare_parameters  # noqa: E402
+from sps_module.sps_request_planner import MAX_REGIONS_PER_CALL, MAX_INSTANCE_TYPES_PER_CALL  # noqa: E402
+
+FAMILIES = 40
+
+
+def synthetic_support(seed, region_count, instance_type_count):
+    rng = np.random.default_rng(seed)
+    region_size = rng.beta(2, 2, region_count)
+    instance_type_reach = rng.beta(1.2, 2.5, instance_type_count)
+    family = rng.integers(0, FAMILIES, instance_type_count)
+    family_regions = rng.random((FAMILIES, region_count)) < rng.uniform(0.3, 0.95, (FAMILIES, 1))
+    probability = (np.clip(region_size[:, None] * 0.6 + instance_type_reach[None, :] * 0.6, 0, 1)
+                   * family_regions[family].T)
+    offered = rng.random((region_count, instance_type_count)) < probability
+    regions = [f"region{r:02d}" for r in range(region_count)]
+    instance_types = [f"Standard_X{i:04d}" for i in range(instance_type_count)]
+    support = {(regions[r], instance_types[i]) for r, i in zip(*np.nonzero(offered))}
+    return support, regions, instance_types
+
+
+def check_cover(support, queries):
+    covered = {(region, instance_type) for regions, instance_types in queries
+               for region in regions for instance_type in instance_types}
+    if not support <= covered:
+        raise SystemExit(f"{len(support - covered)} pairs are not covered")
+    if any(len(regions) > MAX_REGIONS_PER_CALL or len(instance_types) > MAX_INSTANCE_TYPES_PER_CALL
+           for regions, instance_types in queries):
+        raise SystemExit("a request exceeds the 8 regions x 5 instance types shape")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--regions", type=int, default=60)
+    parser.add_argument("--instance-types", type=int, default=1500)
+    args = parser.parse_args()
+
+    for seed in args.seeds:
+        support, regions, instance_types = synthetic_support(seed, args.regions, args.instance_types)
+        print(f"seed {seed}: {len(support)} pairs")
+        covers = [
+            ("greedy", lambda: sps_prepare_parameters._cover_remaining_greedily(set(support))),
+            ("kmeans+greedy", lambda: sps_prepare_parameters.clustering_cover_remaining_greedily(support, regions, instance_types)),
+            ("lazy", lambda: sps_prepare_parameters.lazy_greedy_cover(support, regions, instance_types)),
+        ]
+        for name, cover in covers:
+            start = time.perf_counter()
+            queries = cover()
+            seconds = time.perf_counter() - start
+            check_cover(support, queries)
+            print(f"  {name:>13} {len(queries):5d} requests {seconds:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
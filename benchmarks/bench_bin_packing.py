@@ -0,0 +1,114 @@
+# Packing of the (region, number of AZs) items of each instance type into SPS queries of at most 10 AZs
+#   old ilp   the per-instance-type CBC model of generate_workload.py before workload/bin_packing.py: n^2 binaries and
+#             no time limit. It is only run on the first --old-ilp-types instance types, each with a time limit of
+#             --old-ilp-time-limit seconds, and counts the types where it proved no optimum (it returned None and the
+#             workload generation crashed).
+#   ffd/bfd   bin_packing.fit_decreasing through pack()
+#   bfd+ilp   bin_packing.pack() with the optional --ilp-time-limit refinement per instance type
+# The input has the shape of load_metadata.num_az_by_region(): {instance type: [(region, number of AZs), ...]} over
+# 33 regions with 2-6 AZs, every instance type offered in a random share of them and sometimes in one AZ less.
+# --workloads reads a real one instead, e.g. the monitoring/<date>/workloads.pkl that generate_workload.py uploads.
+# usage: python benchmarks/bench_bin_packing.py [--workloads FILE] [--ilp-time-limit 1] [--old-ilp-types 60]
+#                                               [--old-ilp-time-limit 5]
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/aws/batch/workload"))
+from bin_packing import pack  # noqa: E402
+
+CAPACITY = 10
+
+
+def synthetic_workloads(seed=0, instance_types=900, region_count=33):
+    rng = random.Random(seed)
+    regions = [f"region-{i}" for i in range(region_count)]
+    az_count = {region: rng.choice([2, 3, 3, 3, 3, 4, 4, 5, 6]) for region in regions}
+    workloads = {}
+    for index in range(instance_types):
+        share = rng.random()
+        offered = [region for region in regions if rng.random() < share]
+        if offered:
+            workloads[f"type{index}.xlarge"] = [(region, max(1, az_count[region] - (rng.random() < 0.2)))
+                                                for region in offered]
+    return workloads
+
+
+def load_workloads(path):
+    if path is None:
+        return synthetic_workloads()
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+# bin_packing() of generate_workload.py before bin_packing.py, with a time limit so that the benchmark terminates
+# return the number of bins, or None when the solver did not prove an optimum
+def old_ilp_bins(weights, capacity, time_limit_sec):
+    from ortools.linear_solver import pywraplp
+
+    solver = pywraplp.Solver.CreateSolver('CBC')
+    solver.SetTimeLimit(int(time_limit_sec * 1000))
+    items = range(len(weights))
+    x = {(i, j): solver.IntVar(0, 1, 'x_%i_%i' % (i, j)) for i in items for j in items}
+    y = {j: solver.IntVar(0, 1, 'y[%i]' % j) for j in items}
+    for i in items:
+        solver.Add(sum(x[i, j] for j in items) == 1)
+    for j in items:
+        solver.Add(sum(x[(i, j)] * weights[i] for i in items) <= y[j] * capacity)
+    solver.Minimize(solver.Sum([y[j] for j in items]))
+    if solver.Solve() != pywraplp.Solver.OPTIMAL:
+        return None
+    return sum(1 for j in items if y[j].solution_value() == 1)
+
+
+def check_packing(weights, bin_index_list):
+    packed = sorted(i for bin_items, _ in bin_index_list for i in bin_items)
+    if packed != list(range(len(weights))):
+        raise SystemExit("an item is missing or packed twice")
+    if any(sum(weights[i] for i in bin_items) > CAPACITY for bin_items, _ in bin_index_list):
+        raise SystemExit(f"a query has more than {CAPACITY} AZs")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workloads")
+    parser.add_argument("--ilp-time-limit", type=float, default=1)
+    parser.add_argument("--old-ilp-types", type=int, default=60)
+    parser.add_argument("--old-ilp-time-limit", type=float, default=5)
+    args = parser.parse_args()
+
+    workloads = load_workloads(args.workloads)
+    weight_lists = [[num_az for _, num_az in query] for query in workloads.values()]
+    lower_bound = sum(pack(weights, CAPACITY)[1]['lower_bound'] for weights in weight_lists)
+    print(f"{len(workloads)} instance types, {sum(map(len, weight_lists))} (region, AZ count) items, "
+          f"lower bound {lower_bound} queries")
+
+    packers = [("ffd", "ffd", 0), ("bfd", "bfd", 0)]
+    if args.ilp_time_limit > 0:
+        packers.append((f"bfd+ilp({args.ilp_time_limit:g}s)", "bfd", args.ilp_time_limit))
+    for name, algorithm, ilp_time_limit in packers:
+        start = time.perf_counter()
+        bins = 0
+        for weights in weight_lists:
+            bin_index_list, report = pack(weights, CAPACITY, algorithm, ilp_time_limit)
+            check_packing(weights, bin_index_list)
+            bins += report['bins']
+        print(f"  {name:>12} {time.perf_counter() - start:8.2f} s {bins:6d} queries")
+
+    if args.old_ilp_types > 0:
+        sample = weight_lists[:args.old_ilp_types]
+        start = time.perf_counter()
+        results = [old_ilp_bins(weights, CAPACITY, args.old_ilp_time_limit) for weights in sample]
+        seconds = time.perf_counter() - start
+        bfd_bins = sum(pack(weights, CAPACITY)[1]['bins'] for weights in sample)
+        solved = [bins for bins in results if bins is not None]
+        print(f"  old ilp on the first {len(sample)} instance types ({sum(map(len, sample))} items): {seconds:.2f} s, "
+              f"{results.count(None)} without a proven optimum in {args.old_ilp_time_limit:g} s, "
+              f"{sum(solved)} queries for the solved ones; bfd {bfd_bins} queries for all of them")
+
+
+if __name__ == "__main__":
+    main()
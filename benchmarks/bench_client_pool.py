@@ -0,0 +1,95 @@
+# Cost of the per-credential EC2 clients of the AWS SPS fan-out, against a stub EC2 endpoint on 127.0.0.1
+#   per-call   a new boto3 session and EC2 client for every query_sps() call, as before utility/client_pool.py
+#   pooled     CredentialClientPool: clients share one botocore data loader, the first use of a credential builds one
+#   cached     CredentialClientPool on the next round, every credential already has a client
+# Every credential makes one query_sps() call with --scenarios scenarios, which is how often a run uses a credential.
+# The stub answers GetSpotPlacementScores with one score, so the time is dominated by client construction.
+# usage: python benchmarks/bench_client_pool.py [--credentials 100] [--scenarios 3]
+import argparse
+import http.server
+import os
+import sys
+import threading
+import time
+
+import boto3.session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/aws/batch/sps"))
+from utility.client_pool import CredentialClientPool  # noqa: E402
+from sps_query_api import query_sps  # noqa: E402
+
+REGION = "us-east-1"
+RESPONSE = (b'<GetSpotPlacementScoresResponse xmlns="http://ec2.amazonaws.com/doc/2016-11-15/">'
+            b'<requestId>00000000-0000-0000-0000-000000000000</requestId><spotPlacementScoreSet><item>'
+            b'<region>us-east-1</region><availabilityZoneId>use1-az1</availabilityZoneId><score>3</score>'
+            b'</item></spotPlacementScoreSet></GetSpotPlacementScoresResponse>')
+
+
+class StubEC2Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in two writes; without this the keep-alive calls wait on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def per_call_client(credential):
+    session = boto3.session.Session(
+        aws_access_key_id=credential["AccessKeyId"],
+        aws_secret_access_key=credential["SecretAccessKey"],
+    )
+    return session.client('ec2', region_name=REGION)
+
+
+def timed_round(get_client, credentials, scenarios):
+    start = time.perf_counter()
+    for index, credential in enumerate(credentials):
+        query_sps((get_client(index, credential), scenarios, 1))
+    return (time.perf_counter() - start) / len(credentials) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--credentials", type=int, default=100)
+    parser.add_argument("--scenarios", type=int, default=3)
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubEC2Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # botocore reads the service specific endpoint override, so the collector code runs unchanged
+    os.environ["AWS_ENDPOINT_URL_EC2"] = f"http://127.0.0.1:{server.server_port}"
+
+    credentials = [{"AccessKeyId": f"AKIA{index:016d}", "SecretAccessKey": "secret"} for index in range(args.credentials)]
+    scenarios = [("m5.large", [REGION])] * args.scenarios
+
+    per_call = timed_round(lambda index, credential: per_call_client(credential), credentials, scenarios)
+    client_pool = CredentialClientPool('ec2', region_name=REGION)
+    pooled = timed_round(client_pool.get, credentials, scenarios)
+    cached = timed_round(client_pool.get, credentials, scenarios)
+
+    start = time.perf_counter()
+    for index, credential in enumerate(credentials):
+        client_pool.get(index, credential)
+    lookup = (time.perf_counter() - start) / len(credentials) * 1e6
+    client_pool.clear()
+    server.shutdown()
+
+    print(f"{args.credentials} credentials, one query_sps() call of {args.scenarios} scenarios each")
+    print(f"  per-call session and client  {per_call:8.1f} ms per credential")
+    print(f"  pooled, first use            {pooled:8.1f} ms per credential")
+    print(f"  pooled, cached               {cached:8.1f} ms per credential")
+    print(f"  cached lookup only           {lookup:8.1f} us per credential")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Throughput of parsing the PriceList of the Pricing API get_products responses of get_ondemand_price()
+#   json.loads x2   the loop of get_ondemand_price() before price/price_list_parser.py, two full decodes per product
+#   key scan        price_list_parser.parse_price_list(), decoding only the instanceType and OnDemand values
+#   full decode     parse_price_list() on bytes documents, which skip the scan, with json.loads and with orjson when
+#                   it is installed
+# Products are the documents of tests/data/price_list/get_products_us-east-1.json, repeated to --products. All parsers
+# must return the same instance types and prices.
+# usage: python benchmarks/bench_price_list_parser.py [--products 20000] [--repeat 5]
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/aws/batch/price"))
+from price_list_parser import parse_price_list  # noqa: E402
+
+PAYLOAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../tests/data/price_list/get_products_us-east-1.json")
+
+
+# product loop of get_ondemand_price() before price_list_parser.py
+def json_loads_price_list(price_list):
+    instance_types = []
+    prices = []
+    for price_info in price_list:
+        instance_type = json.loads(price_info)['product']['attributes']['instanceType']
+        instance_price = float(list(list(json.loads(price_info)['terms']['OnDemand'].values())[0]['priceDimensions'].values())[0]['pricePerUnit']['USD'])
+
+        # case of instance-region is not available
+        if instance_price == 0.0:
+            continue
+
+        instance_types.append(instance_type)
+        prices.append(instance_price)
+    return instance_types, np.array(prices, dtype=np.float64)
+
+
+def best_of(parse, price_list, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(price_list)
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(PAYLOAD) as f:
+        payload = json.load(f)["PriceList"]
+    price_list = [payload[i % len(payload)] for i in range(args.products)]
+    price_list_bytes = [price_info.encode() for price_info in price_list]
+
+    parsers = [
+        ("json.loads x2", json_loads_price_list, price_list),
+        ("key scan", parse_price_list, price_list),
+        ("full decode, json", lambda documents: parse_price_list(documents, json.loads), price_list_bytes),
+    ]
+    try:
+        import orjson
+        parsers.append(("full decode, orjson", lambda documents: parse_price_list(documents, orjson.loads), price_list_bytes))
+    except ImportError:
+        print("orjson is not installed, skipping its full decode")
+
+    print(f"{args.products} products, {sum(map(len, price_list)) / args.products / 1024:.1f} KB on average, "
+          f"best of {args.repeat}")
+    expected = None
+    for name, parse, documents in parsers:
+        seconds, (instance_types, prices) = best_of(parse, documents, args.repeat)
+        if expected is None:
+            expected = (instance_types, prices)
+        elif instance_types != expected[0] or not np.array_equal(prices, expected[1]):
+            raise SystemExit(f"{name} returned different instance types or prices than json.loads x2")
+        print(f"  {name:>20} {args.products / seconds / 1000:8.1f}k products/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Spot price collection of collect_price.py over fixture describe_spot_price_history pages
+#   previous   load_price.get_spot_price() before the typed buffers: a new boto3 session per region, manual NextToken
+#              paging into Python lists, object columns and DataFrame.replace for the AZ IDs
+#   buffers    load_price.get_spot_price(): one EC2 client per region from one session, the boto3 paginator, int32
+#              category codes and float64 prices in array buffers, Categorical.from_codes
+# data/spot_price_history_us-east-1.json.gz holds 67 pages (20k records, all product descriptions) and the
+# DescribeAvailabilityZones answer of one region; the same pages are served for every region with the region's AZ
+# names, 25 regions by default. Both collectors must return the same rows. Client setup is measured separately with
+# real boto3 clients, which make no call at construction.
+# usage: python benchmarks/bench_spot_price.py [--regions 25] [--repeat 3]
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import boto3.session
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/aws/batch/price"))
+import load_price  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/spot_price_history_us-east-1.json.gz")
+REGIONS = ["us-east-1", "us-east-2", "us-west-1", "us-west-2", "ca-central-1", "sa-east-1", "eu-west-1", "eu-west-2",
+           "eu-west-3", "eu-central-1", "eu-central-2", "eu-north-1", "eu-south-1", "eu-south-2", "ap-northeast-1",
+           "ap-northeast-2", "ap-northeast-3", "ap-southeast-1", "ap-southeast-2", "ap-southeast-3", "ap-south-1",
+           "ap-south-2", "ap-east-1", "me-south-1", "af-south-1"]
+
+
+# fixture pages of every region, the AZ names and IDs of the fixture region rewritten for `region`
+def load_fixture(regions):
+    with gzip.open(FIXTURE, "rt") as f:
+        fixture = json.load(f)
+    source = fixture["Region"]
+    for page in fixture["DescribeSpotPriceHistoryPages"]:
+        for record in page["SpotPriceHistory"]:
+            record["Timestamp"] = datetime.fromisoformat(record["Timestamp"])
+
+    fixtures = {}
+    for index, region in enumerate(regions):
+        pages = [{"SpotPriceHistory": [{**record, "AvailabilityZone": region + record["AvailabilityZone"][len(source):]}
+                                       for record in page["SpotPriceHistory"]]}
+                 for page in fixture["DescribeSpotPriceHistoryPages"]]
+        zones = {"AvailabilityZones": [{**zone, "ZoneName": region + zone["ZoneName"][len(source):],
+                                        "ZoneId": f"r{index}-{zone['ZoneId'].split('-')[1]}", "RegionName": region}
+                                       for zone in fixture["DescribeAvailabilityZones"]["AvailabilityZones"]]}
+        fixtures[region] = (pages, zones)
+    return fixtures
+
+
+# EC2 client answering from the fixture pages, with both the NextToken and the paginator interface
+class FixtureEC2:
+    def __init__(self, pages, zones):
+        self.pages = pages
+        self.zones = zones
+
+    def describe_spot_price_history(self, **kwargs):
+        index = int(kwargs.get("NextToken") or 0)
+        next_token = str(index + 1) if index + 1 < len(self.pages) else ""
+        return {**self.pages[index], "NextToken": next_token}
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, **kwargs):
+        yield from self.pages
+
+    def describe_availability_zones(self):
+        return self.zones
+
+
+# get_spot_price_region() / get_spot_price() of load_price.py before the typed buffers, on an already built client
+def previous_get_spot_price(client):
+    def get_spot_price_region():
+        describe_args = {'MaxResults': 300}
+        while True:
+            response = client.describe_spot_price_history(**describe_args)
+            for obj in response['SpotPriceHistory']:
+                if obj['ProductDescription'] != 'Linux/UNIX':
+                    continue
+                yield obj['InstanceType'], obj['AvailabilityZone'], float(obj['SpotPrice']), obj['Timestamp']
+            if not response['NextToken']:
+                break
+            describe_args['NextToken'] = response['NextToken']
+
+    spotprice_dict = {"InstanceType": [], "AZ": [], "SpotPrice": []}
+    for it, az, price, _ in get_spot_price_region():
+        spotprice_dict["InstanceType"].append(it)
+        spotprice_dict["AZ"].append(az)
+        spotprice_dict["SpotPrice"].append(price)
+    spot_price_df = pd.DataFrame(spotprice_dict)
+
+    az_map = dict()
+    for val in client.describe_availability_zones()['AvailabilityZones']:
+        az_map[val['ZoneName']] = val['ZoneId']
+    return spot_price_df.replace({"AZ": az_map})
+
+
+def collect(get_spot_price, fixtures, categorical):
+    spot_price_df = pd.concat([get_spot_price(FixtureEC2(*fixtures[region]), region) for region in fixtures])
+    spot_price_df = spot_price_df.reset_index(drop=True)
+    if categorical:
+        # as collect_price.py does after the concat
+        for column in ["InstanceType", "AZ"]:
+            spot_price_df[column] = spot_price_df[column].astype("category")
+    return spot_price_df
+
+
+def measure(get_spot_price, fixtures, categorical, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.process_time()
+        spot_price_df = collect(get_spot_price, fixtures, categorical)
+        seconds.append(time.process_time() - start)
+    tracemalloc.start()
+    collect(get_spot_price, fixtures, categorical)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(seconds), peak, spot_price_df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--regions", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    regions = REGIONS[:args.regions]
+    fixtures = load_fixture(regions)
+    records = sum(len(page["SpotPriceHistory"]) for pages, _ in fixtures.values() for page in pages)
+
+    previous_seconds, previous_peak, expected = measure(lambda client, region: previous_get_spot_price(client),
+                                                        fixtures, False, args.repeat)
+    buffers_seconds, buffers_peak, spot_price_df = measure(load_price.get_spot_price, fixtures, True, args.repeat)
+    pd.testing.assert_frame_equal(spot_price_df.astype(expected.dtypes.to_dict()), expected)
+
+    print(f"{len(regions)} regions, {records} records, {len(expected)} Linux/UNIX rows")
+    for name, seconds, peak, df in [("previous", previous_seconds, previous_peak, expected),
+                                    ("buffers", buffers_seconds, buffers_peak, spot_price_df)]:
+        print(f"  {name:>8} parse CPU {seconds:6.2f} s, peak traced {peak / 2**20:6.1f} MiB, "
+              f"frame {df.memory_usage(deep=True).sum() / 2**20:5.1f} MiB")
+
+    start = time.perf_counter()
+    for region in regions:
+        session = boto3.session.Session()
+        session.client('ec2', region)
+        session.client('ec2', region_name=region)
+    per_region_sessions = time.perf_counter() - start
+    start = time.perf_counter()
+    session = boto3.session.Session()
+    {region: session.client('ec2', region_name=region) for region in regions}
+    one_session = time.perf_counter() - start
+    print(f"  client setup: a session and two clients per region {per_region_sessions:.2f} s, "
+          f"one session and a client per region {one_session:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
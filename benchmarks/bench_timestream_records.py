@@ -0,0 +1,97 @@
+# Throughput of turning the changed rows of an AWS merge into Timestream WriteRecords batches
+#   iterrows   the record loop of upload_timestream() before utility/timestream_records.py, one row at a time
+#   spec       utility.timestream_records.iter_record_batches with AWS_RECORD_SPEC, column-wise
+# Frames have the columns of the changed rows handed to upload_timestream(), about 1% of them with the "Ceased" flag
+# of removed workloads. Both builders must produce the same batches. Only record building is timed, nothing is sent.
+# usage: python benchmarks/bench_timestream_records.py [--rows 10000 100000 500000]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utility.timestream_records import AWS_RECORD_SPEC, iter_record_batches  # noqa: E402
+
+
+# record loop of collector/spot-dataset/aws/batch/merge/upload_data.py before timestream_records.py
+def iterrows_batches(data, time_value):
+    records = []
+    all_batches = []
+    for idx, row in data.iterrows():
+        dimensions = []
+        for column in data.columns:
+            if column in ['InstanceType', 'Region', 'AZ', 'OndemandPrice', 'Ceased']:
+                dimensions.append({'Name': column, 'Value': str(row[column])})
+        submit_data = {
+            'Dimensions': dimensions,
+            'MeasureName': 'aws_values',
+            'MeasureValues': [],
+            'MeasureValueType': 'MULTI',
+            'Time': time_value
+        }
+        for column, types in [('SPS', 'BIGINT'), ('T3', 'BIGINT'), ('T2', 'BIGINT'), ('IF', 'DOUBLE'), ('SpotPrice', 'DOUBLE')]:
+            submit_data['MeasureValues'].append({'Name': column, 'Value': str(row[column]), 'Type': types})
+
+        records.append(submit_data)
+        if len(records) == 100:
+            all_batches.append(records)
+            records = []
+
+    if len(records) != 0:
+        all_batches.append(records)
+    return all_batches
+
+
+def changed_rows(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(rows)
+    df = pd.DataFrame({
+        "InstanceType": [f"i{i // 99}.xlarge" for i in ids],
+        "Region": [f"region-{i % 99 // 3}" for i in ids],
+        "AZ": [f"az{i % 99}" for i in ids],
+        "SPS": rng.integers(1, 4, rows),
+        "T3": rng.choice([0, 1, 5, 10, 50], rows),
+        "T2": rng.choice([0, 1, 5, 10, 50], rows),
+        "IF": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0], rows),
+        "SpotPrice": rng.random(rows).round(5),
+        "OndemandPrice": (rng.random(rows) * 20).round(5),
+        "Savings": rng.integers(0, 90, rows),
+        "Time": "2026-10-18 00:00:00",
+    })
+    ceased = rng.random(rows) < 0.01
+    df["Ceased"] = np.where(ceased, True, None)
+    # upload_timestream() drops rows with a missing value, so only the removed workloads keep the column
+    return df[ceased], df[~ceased].drop(columns=["Ceased"])
+
+
+def build(builder, frames, time_value):
+    batches = []
+    start = time.perf_counter()
+    for df in frames:
+        batches += builder(df, time_value)
+    return time.perf_counter() - start, batches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    time_value = "1792281600000"
+    print(f"{'rows':>8} {'iterrows':>14} {'spec':>14} {'speedup':>8}")
+    for rows in args.rows:
+        frames = changed_rows(rows)
+        iterrows_seconds, expected = build(iterrows_batches, frames, time_value)
+        spec_seconds, batches = build(lambda df, value: list(iter_record_batches(df, AWS_RECORD_SPEC, value)),
+                                      frames, time_value)
+        if batches != expected:
+            raise SystemExit(f"{rows} rows: iter_record_batches built different records than the iterrows loop")
+        print(f"{rows:>8} {rows / iterrows_seconds:>9.0f} rows/s {rows / spec_seconds:>9.0f} rows/s "
+              f"{iterrows_seconds / spec_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Latency of the previous/current workload diff of the merge steps
+#   row-wise   compare() before utility/workload_diff.py: string-joined workload and feature columns, sorted merge walk
+#   hashed     utility.workload_diff.diff_workloads: one hash join on (workload hash, occurrence)
+# Frames have the AWS merge shape (workload InstanceType/Region/AZ, six feature columns); the current frame drops 1% of
+# the previous workloads, adds 1% new ones and changes the features of 5% of the rows. Both sides must return the same
+# changed and removed rows. The row-wise compare is only timed up to --row-wise-max-rows (it takes minutes above 100k).
+# usage: python benchmarks/bench_workload_diff.py [--rows 10000 100000 1000000] [--row-wise-max-rows 100000]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utility.workload_diff import diff_workloads  # noqa: E402
+
+WORKLOAD_COLS = ["InstanceType", "Region", "AZ"]
+FEATURE_COLS = ["SPS", "T3", "T2", "IF", "SpotPrice", "OndemandPrice"]
+
+
+# compare() of collector/spot-dataset/aws/batch/merge/compare_data.py before the hashed diff, without the Slack alert
+def row_wise_compare(previous_df, current_df, workload_cols, feature_cols):
+    previous_df.loc[:, "Workload"] = previous_df[workload_cols].apply(lambda row: ":".join(row.values.astype(str)), axis=1)
+    previous_df.loc[:, "Feature"] = previous_df[feature_cols].apply(lambda row: ":".join(row.values.astype(str)), axis=1)
+    current_df.loc[:, "Workload"] = current_df[workload_cols].apply(lambda row: ":".join(row.values.astype(str)), axis=1)
+    current_df.loc[:, "Feature"] = current_df[feature_cols].apply(lambda row: ":".join(row.values.astype(str)), axis=1)
+
+    current_indices = current_df[["Workload", "Feature"]].sort_values(by="Workload").index
+    current_values = current_df[["Workload", "Feature"]].sort_values(by="Workload").values
+    previous_indices = previous_df[["Workload", "Feature"]].sort_values(by="Workload").index
+    previous_values = previous_df[["Workload", "Feature"]].sort_values(by="Workload").values
+
+    changed_indices = []
+    removed_indices = []
+
+    prev_idx = 0
+    curr_idx = 0
+    while True:
+        if (curr_idx == len(current_indices)) and (prev_idx == len(previous_indices)):
+            break
+        elif curr_idx == len(current_indices):
+            if previous_values[prev_idx][0] not in current_values[:, 0]:
+                removed_indices.append(previous_indices[prev_idx])
+                prev_idx += 1
+                continue
+            raise Exception("workload error")
+        elif prev_idx == len(previous_indices):
+            if current_values[curr_idx][0] not in previous_values[:, 0]:
+                changed_indices.append(current_indices[curr_idx])
+                curr_idx += 1
+                continue
+            raise Exception("workload error")
+
+        prev_workload = previous_values[prev_idx][0]
+        prev_feature = previous_values[prev_idx][1]
+        curr_workload = current_values[curr_idx][0]
+        curr_feature = current_values[curr_idx][1]
+
+        if prev_workload != curr_workload:
+            if curr_workload not in previous_values[:, 0]:
+                changed_indices.append(current_indices[curr_idx])
+                curr_idx += 1
+            elif prev_workload not in current_values[:, 0]:
+                removed_indices.append(previous_indices[prev_idx])
+                prev_idx += 1
+            else:
+                raise Exception("workload error")
+        else:
+            if prev_feature != curr_feature:
+                changed_indices.append(current_indices[curr_idx])
+            curr_idx += 1
+            prev_idx += 1
+    changed_df = current_df.loc[changed_indices].drop(["Workload", "Feature"], axis=1)
+    removed_df = previous_df.loc[removed_indices].drop(["Workload", "Feature"], axis=1)
+
+    for col in feature_cols:
+        removed_df[col] = 0
+
+    # removed_df have one more column, "Ceased"
+    removed_df["Ceased"] = True
+
+    return changed_df, removed_df
+
+
+def workload_frame(rng, first_id, rows):
+    ids = np.arange(first_id, first_id + rows)
+    return pd.DataFrame({
+        "InstanceType": [f"i{i // 70}.x" for i in ids],
+        "Region": [f"r{i % 70 // 4}" for i in ids],
+        "AZ": [f"az{i % 70}" for i in ids],
+        "SPS": rng.integers(1, 4, rows),
+        "T3": rng.choice([0, 1, 5, 10, 50], rows),
+        "T2": rng.choice([0, 1, 5, 10, 50], rows),
+        "IF": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0], rows),
+        "SpotPrice": rng.random(rows).round(4),
+        "OndemandPrice": rng.random(rows).round(4),
+    })
+
+
+def frames(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    previous_df = workload_frame(rng, 0, rows)
+    churn = rows // 100
+    current_df = pd.concat([previous_df.iloc[churn:], workload_frame(rng, rows, churn)], ignore_index=True)
+    changed = rng.choice(len(current_df), rows // 20, replace=False)
+    current_df.loc[changed, "SPS"] = 4 - current_df.loc[changed, "SPS"]
+    current_df.loc[changed, "SpotPrice"] = (current_df.loc[changed, "SpotPrice"] + 0.0001).round(4)
+    return previous_df, current_df
+
+
+def timed(function, previous_df, current_df):
+    start = time.perf_counter()
+    result = function(previous_df.copy(), current_df.copy(), WORKLOAD_COLS, FEATURE_COLS)
+    return time.perf_counter() - start, result
+
+
+def same_rows(left, right):
+    return sorted(left[0].index) == sorted(right[0].index) and sorted(left[1].index) == sorted(right[1].index)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--row-wise-max-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'changed':>8} {'removed':>8} {'row-wise':>10} {'hashed':>9} {'speedup':>8}")
+    for rows in args.rows:
+        previous_df, current_df = frames(rows)
+        hashed_seconds, hashed = timed(diff_workloads, previous_df, current_df)
+        row_wise = "skipped"
+        speedup = "-"
+        if rows <= args.row_wise_max_rows:
+            row_wise_seconds, expected = timed(row_wise_compare, previous_df, current_df)
+            if not same_rows(expected, hashed):
+                raise SystemExit(f"{rows} rows: the hashed diff returned different rows than the row-wise compare")
+            row_wise = f"{row_wise_seconds:.2f}s"
+            speedup = f"{row_wise_seconds / hashed_seconds:.0f}x"
+        print(f"{rows:>9} {len(hashed[0]):>8} {len(hashed[1]):>8} {row_wise:>10} {hashed_seconds:>8.2f}s {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
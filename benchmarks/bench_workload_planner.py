@@ -0,0 +1,97 @@
+# Regression check of the SPS workload plan: calls, AZ fill ratio and credentials per collection cycle
+#   previous   generate_workload.py before workload_planner.py: pack() with best-fit decreasing per instance type,
+#              then chunks of 50 queries per credential
+#   planner    workload_planner.plan_workload() with the default 'exact' packer, and with 'bfd' for reference
+# Both plans must query every (instance type, region) exactly once, with at most 10 AZs and 10 regions per query and
+# 50 queries per credential. Input as in bench_bin_packing.py, synthetic or --workloads FILE.
+# usage: python benchmarks/bench_workload_planner.py [--workloads FILE]
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../collector/spot-dataset/aws/batch/workload"))
+from bin_packing import pack  # noqa: E402
+from workload_planner import plan_workload, QUERY_AZ_CAPACITY, QUERY_REGION_LIMIT, QUERIES_PER_CREDENTIAL  # noqa: E402
+from bench_bin_packing import load_workloads  # noqa: E402
+
+
+# packing and credential chunking of generate_workload.py before workload_planner.py
+def previous_plan(workloads, algorithm='bfd', ilp_time_limit=0):
+    result_binpacked = {}
+    for instance, query in workloads.items():
+        weights = [weight for _, weight in query]
+        bin_index_list, _ = pack(weights, 10, algorithm, ilp_time_limit)
+        result_binpacked[instance] = [[(query[x][0], query[x][1]) for x in bin_index] for bin_index, _ in bin_index_list]
+
+    user_queries_list = []
+    user_queries = []
+    for instance, queries in result_binpacked.items():
+        for query in queries:
+            new_query = [instance, [], 0]
+            for tup in query:
+                new_query[1].append(tup[0])
+                new_query[2] += tup[1]
+            user_queries.append(new_query)
+            if len(user_queries) == 50:
+                user_queries_list.append(user_queries)
+                user_queries = []
+
+    if len(user_queries) != 0:
+        user_queries_list.append(user_queries)
+    return user_queries_list
+
+
+def check_plan(workloads, user_queries_list):
+    covered = {}
+    for chunk in user_queries_list:
+        if len(chunk) > QUERIES_PER_CREDENTIAL:
+            raise SystemExit(f"a credential has {len(chunk)} queries")
+        for instance, regions, total_az in chunk:
+            az_by_region = dict(workloads[instance])
+            if total_az > QUERY_AZ_CAPACITY or len(regions) > QUERY_REGION_LIMIT:
+                raise SystemExit(f"{instance}: query of {total_az} AZs over {len(regions)} regions")
+            if total_az != sum(az_by_region[region] for region in regions):
+                raise SystemExit(f"{instance}: AZ total does not match its regions")
+            covered.setdefault(instance, []).extend(regions)
+    for instance, query in workloads.items():
+        if sorted(covered.get(instance, [])) != sorted(region for region, _ in query):
+            raise SystemExit(f"{instance}: regions missing or queried twice")
+
+
+def describe(workloads, user_queries_list, seconds):
+    queries = sum(len(chunk) for chunk in user_queries_list)
+    total_az = sum(num_az for query in workloads.values() for _, num_az in query)
+    return (f"{seconds:6.2f} s {queries:6d} calls {len(user_queries_list):4d} credentials "
+            f"fill {total_az / (queries * QUERY_AZ_CAPACITY):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workloads")
+    args = parser.parse_args()
+
+    workloads = load_workloads(args.workloads)
+    lower_bound = sum(math.ceil(sum(num_az for _, num_az in query) / QUERY_AZ_CAPACITY) for query in workloads.values())
+    print(f"{len(workloads)} instance types, {sum(map(len, workloads.values()))} (region, AZ count) items")
+
+    start = time.perf_counter()
+    user_queries_list = previous_plan(workloads)
+    seconds = time.perf_counter() - start
+    check_plan(workloads, user_queries_list)
+    print(f"  {'previous':>15} {describe(workloads, user_queries_list, seconds)}")
+
+    for algorithm in ["bfd", "exact"]:
+        start = time.perf_counter()
+        user_queries_list, stats = plan_workload(workloads, algorithm)
+        seconds = time.perf_counter() - start
+        check_plan(workloads, user_queries_list)
+        print(f"  {'planner ' + algorithm:>15} {describe(workloads, user_queries_list, seconds)}")
+
+    print(f"  {'lower bound':>15} {'':8} {lower_bound:6d} calls "
+          f"{math.ceil(lower_bound / QUERIES_PER_CREDENTIAL):4d} credentials")
+
+
+if __name__ == "__main__":
+    main()
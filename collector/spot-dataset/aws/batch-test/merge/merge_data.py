@@ -1,14 +1,13 @@
 # ------ import module ------
 from datetime import datetime, timezone, timedelta
 import boto3
-import pickle
-import gzip
 import json
 import pandas as pd
 import argparse
 
 # ------ import user module ------
 from utility.slack_msg_sender import send_slack_message
+from utility.artifact_io import load_df
 from upload_data import upload_timestream, update_latest, save_raw, update_query_selector
 from compare_data import compare, compare_max_instance
 
@@ -36,13 +35,13 @@ def main():
     if args.sps_key:
         sps_file_name = args.sps_key
         # Extract info from key
-        # Expected format: .../2023/11/23/02-10_sps_50.pkl.gz
+        # Expected format: .../2023/11/23/02-10_sps_50.parquet (or legacy .pkl.gz)
         try:
             filename = sps_file_name.split('/')[-1]
             parts = filename.split('_')
             # parts[0] is "02-10" (time)
             # parts[1] is "sps"
-            # parts[2] is "50.pkl.gz"
+            # parts[2] is "50.parquet"
             time_part = parts[0]
             target_capacity = int(parts[2].split('.')[0])
             
@@ -105,9 +104,9 @@ def main():
     print(f"Timestamp: {TIMESTAMP}")
     print(f"Target Capacity: {target_capacity}")
 
-    SPOTIF_FILE_NAME = f"{S3_PATH_PREFIX}/spot_if/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_if.pkl.gz"
-    ONDEMAND_PRICE_FILE_NAME = f"{S3_PATH_PREFIX}/ondemand_price/{S3_DIR_NAME}/ondemand_price.pkl.gz"
-    SPOTPRICE_FILE_NAME = f"{S3_PATH_PREFIX}/spot_price/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_price.pkl.gz"
+    SPOTIF_FILE_NAME = f"{S3_PATH_PREFIX}/spot_if/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_if"
+    ONDEMAND_PRICE_FILE_NAME = f"{S3_PATH_PREFIX}/ondemand_price/{S3_DIR_NAME}/ondemand_price"
+    SPOTPRICE_FILE_NAME = f"{S3_PATH_PREFIX}/spot_price/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_price"
 
     # ------ Set time data ------
     time_value = TIMESTAMP.strftime("%Y-%m-%d %H:%M:%S")
@@ -115,24 +114,25 @@ def main():
     try:
         # ------ Create Boto3 Session ------
         s3 = boto3.resource("s3")
+        s3_client = boto3.client('s3')
 
-        # ------ Load Data from PKL File in S3 ------
+        # ------ Load Data Artifacts from S3 ------
         print("Loading data files...")
         try:
-            sps_df = pickle.load(gzip.open(s3.Object(WRITE_BUCKET_NAME, sps_file_name).get()["Body"]))
+            sps_df = load_df(s3_client, WRITE_BUCKET_NAME, sps_file_name, columns=['InstanceType', 'Region', 'AZ', 'SPS', 'T3', 'T2'])
         except Exception as e:
              print(f"Failed to load SPS file: {e}")
              raise e
              
         try:
-            spotinfo_df = pickle.load(gzip.open(s3.Object(READ_BUCKET_NAME, SPOTIF_FILE_NAME.strip()).get()["Body"]))
+            spotinfo_df = load_df(s3_client, READ_BUCKET_NAME, SPOTIF_FILE_NAME, columns=['InstanceType', 'Region', 'IF'])
         except Exception as e:
             print(f"Failed to load Spot IF file ({SPOTIF_FILE_NAME}): {e}")
             # Should we fail or continue with empty? Original code would fail.
             raise e
 
         try:
-            ondemand_price_df = pickle.load(gzip.open(s3.Object(READ_BUCKET_NAME, ONDEMAND_PRICE_FILE_NAME.strip()).get()["Body"]))
+            ondemand_price_df = load_df(s3_client, READ_BUCKET_NAME, ONDEMAND_PRICE_FILE_NAME, columns=['InstanceType', 'Region', 'OndemandPrice'])
         except Exception as e:
              print(f"Failed to load OnDemand Price file ({ONDEMAND_PRICE_FILE_NAME}): {e}")
              # Maybe ondemand price is not collected every 10 mins? 
@@ -140,7 +140,7 @@ def main():
              raise e
 
         try:
-            spot_price_df = pickle.load(gzip.open(s3.Object(READ_BUCKET_NAME, SPOTPRICE_FILE_NAME.strip()).get()["Body"]))
+            spot_price_df = load_df(s3_client, READ_BUCKET_NAME, SPOTPRICE_FILE_NAME, columns=['InstanceType', 'AZ', 'SpotPrice'])
         except Exception as e:
             print(f"Failed to load Spot Price file ({SPOTPRICE_FILE_NAME}): {e}")
             raise e
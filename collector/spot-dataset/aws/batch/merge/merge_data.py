@@ -1,16 +1,23 @@
 # ------ import module ------
 from datetime import datetime, timezone, timedelta
 import boto3
-import pickle
-import gzip
 import json
 import pandas as pd
 import argparse
 
 # ------ import user module ------
 from utility.slack_msg_sender import send_slack_message
+from utility.artifact_io import load_df
+from utility.artifact_pointer import load_snapshot
+from utility.latest_state import LatestStateStore
 from upload_data import upload_timestream, update_latest, save_raw, update_query_selector
 from compare_data import compare, compare_max_instance
+from merge_schema import NUMERIC_DTYPES, build_vocabularies, apply_schema
+
+# ------ Set Constants ------
+BUCKET_NAME = "spotlake"
+S3_PATH_PREFIX = "rawdata/aws"
+LATEST_STATE_PREFIX = "latest_data/state/aws"
 
 class FirstRunError(Exception):
     pass
@@ -26,21 +33,16 @@ def main():
     parser.add_argument('--timestamp', dest='timestamp', action='store', help='Timestamp in format YYYY-MM-DDTHH:MM (optional override)')
     args = parser.parse_args()
 
-    # ------ Set Constants ------
-    BUCKET_NAME = "spotlake"
-    S3_PATH_PREFIX = "rawdata/aws"
-    # BUCKET_FILE_PATH is removed in favor of specific paths from const_config
-    
     if args.sps_key:
         sps_file_name = args.sps_key
         # Extract info from key
-        # Expected format: .../2023/11/23/02-10_sps_50.pkl.gz
+        # Expected format: .../2023/11/23/02-10_sps_50.parquet (or legacy .pkl.gz)
         try:
             filename = sps_file_name.split('/')[-1]
             parts = filename.split('_')
             # parts[0] is "02-10" (time)
             # parts[1] is "sps"
-            # parts[2] is "50.pkl.gz"
+            # parts[2] is "50.parquet"
             time_part = parts[0]
             target_capacity = int(parts[2].split('.')[0])
             
@@ -99,13 +101,68 @@ def main():
         sps_file_name = sps_files[0] # Just take the first one? Original code did this.
         target_capacity = int(sps_file_name.split('/')[-1].split('_')[2].split('.')[0])
 
-    print(f"Processing SPS File: {sps_file_name}")
+    merge_and_upload(TIMESTAMP, target_capacity, sps_file_name=sps_file_name)
+
+
+# merge the SPS, IF, on-demand price and spot price of a cycle into one row per (InstanceType, Region, AZ)
+# every input is cast to the canonical dtypes of merge_schema.py first, so the outer merges join on shared categoricals
+def merge_frames(sps_df, spotinfo_df, ondemand_price_df, spot_price_df, time_value):
+    # ------ Create a DF by Selecting Only The Columns Required ------
+    sps_df = sps_df[['InstanceType', 'Region', 'AZ', 'SPS', 'T3', 'T2']]
+    spotinfo_df = spotinfo_df[['InstanceType', 'Region', 'IF']]
+    ondemand_price_df = ondemand_price_df[['InstanceType', 'Region', 'OndemandPrice']]
+    spot_price_df = spot_price_df[['InstanceType', 'AZ', 'SpotPrice']]
+
+    # ------ Apply Canonical Dtypes ------
+    vocabularies = build_vocabularies([sps_df, spotinfo_df, ondemand_price_df, spot_price_df])
+    sps_df = apply_schema(sps_df, vocabularies)
+    spotinfo_df = apply_schema(spotinfo_df, vocabularies)
+    ondemand_price_df = apply_schema(ondemand_price_df, vocabularies)
+    spot_price_df = apply_schema(spot_price_df, vocabularies)
+
+    # ------ Formatting Data ------
+    spot_price_df['SpotPrice'] = spot_price_df['SpotPrice'].round(5)
+    ondemand_price_df['OndemandPrice'] = ondemand_price_df['OndemandPrice'].round(5)
+
+    # ------ Need to Change to Outer Join ------
+    merge_df = pd.merge(sps_df, spotinfo_df, how="outer")
+    merge_df = pd.merge(merge_df, ondemand_price_df, how="outer")
+    merge_df = pd.merge(merge_df, spot_price_df, how="outer")
+
+    merge_df['Savings'] = 100.0 - (merge_df['SpotPrice'] * 100 / merge_df['OndemandPrice'])
+    merge_df['Savings'] = merge_df['Savings'].fillna(-1)
+    merge_df['SPS'] = merge_df['SPS'].fillna(-1)
+    merge_df['SpotPrice'] = merge_df['SpotPrice'].fillna(-1)
+    merge_df['OndemandPrice'] = merge_df['OndemandPrice'].fillna(-1)
+    merge_df['IF'] = merge_df['IF'].fillna(-1)
+
+    merge_df['Savings'] = merge_df['Savings'].astype('int')
+    merge_df['SPS'] = merge_df['SPS'].astype(NUMERIC_DTYPES['SPS'])
+    merge_df['T3'] = merge_df['T3'].fillna(0).astype(NUMERIC_DTYPES['T3'])
+    merge_df['T2'] = merge_df['T2'].fillna(0).astype(NUMERIC_DTYPES['T2'])
+
+    merge_df = merge_df.drop(merge_df[(merge_df['AZ'].isna()) | (merge_df['Region'].isna()) | (merge_df['InstanceType'].isna())].index)
+
+    merge_df.reset_index(drop=True, inplace=True)
+    merge_df['Time'] = time_value
+    return merge_df
+
+
+# merge the SPS, IF and price data of the cycle at TIMESTAMP and upload the result
+# DataFrames handed over by an in-process collector (run_pipeline.py) are used as they are,
+# any DataFrame left as None is loaded from the S3 artifact of the cycle
+def merge_and_upload(TIMESTAMP, target_capacity, sps_file_name=None, sps_df=None, spotinfo_df=None, ondemand_price_df=None, spot_price_df=None):
+    start_time = datetime.now(timezone.utc)
+    S3_DIR_NAME = TIMESTAMP.strftime('%Y/%m/%d')
+    S3_OBJECT_PREFIX = TIMESTAMP.strftime('%H-%M')
+
+    print(f"Processing SPS File: {sps_file_name if sps_df is None else '(in memory)'}")
     print(f"Timestamp: {TIMESTAMP}")
     print(f"Target Capacity: {target_capacity}")
 
-    SPOTIF_FILE_NAME = f"{S3_PATH_PREFIX}/spot_if/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_if.pkl.gz"
-    ONDEMAND_PRICE_FILE_NAME = f"{S3_PATH_PREFIX}/ondemand_price/{S3_DIR_NAME}/ondemand_price.pkl.gz"
-    SPOTPRICE_FILE_NAME = f"{S3_PATH_PREFIX}/spot_price/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_price.pkl.gz"
+    SPOTIF_FILE_NAME = f"{S3_PATH_PREFIX}/spot_if/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_if"
+    ONDEMAND_PRICE_FILE_NAME = f"{S3_PATH_PREFIX}/ondemand_price/{S3_DIR_NAME}/ondemand_price"
+    SPOTPRICE_FILE_NAME = f"{S3_PATH_PREFIX}/spot_price/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_price"
 
     # ------ Set time data ------
     time_value = TIMESTAMP.strftime("%Y-%m-%d %H:%M:%S")
@@ -115,98 +172,81 @@ def main():
         s3 = boto3.resource("s3")
         s3_client = boto3.client('s3')
 
-        # ------ Load Data from PKL File in S3 ------
+        # ------ Load Data Artifacts from S3 ------
+        # only the DataFrames that were not handed over in memory
         print("Loading data files...")
-        try:
-            sps_df = pickle.load(gzip.open(s3.Object(BUCKET_NAME, sps_file_name).get()["Body"]))
-        except Exception as e:
-             print(f"Failed to load SPS file: {e}")
-             raise e
+        if sps_df is None:
+            try:
+                sps_df = load_df(s3_client, BUCKET_NAME, sps_file_name, columns=['InstanceType', 'Region', 'AZ', 'SPS', 'T3', 'T2'])
+            except Exception as e:
+                 print(f"Failed to load SPS file: {e}")
+                 raise e
              
-        try:
-            spotinfo_df = pickle.load(gzip.open(s3.Object(BUCKET_NAME, SPOTIF_FILE_NAME.strip()).get()["Body"]))
-        except Exception as e:
-            print(f"Failed to load Spot IF file ({SPOTIF_FILE_NAME}): {e}")
-            # Should we fail or continue with empty? Original code would fail.
-            raise e
-
-        try:
-            ondemand_price_df = pickle.load(gzip.open(s3.Object(BUCKET_NAME, ONDEMAND_PRICE_FILE_NAME.strip()).get()["Body"]))
-        except Exception as e:
-             print(f"Failed to load OnDemand Price file ({ONDEMAND_PRICE_FILE_NAME}): {e}")
-             # Maybe ondemand price is not collected every 10 mins? 
-             # Original code assumes it exists.
-             raise e
-
-        try:
-            spot_price_df = pickle.load(gzip.open(s3.Object(BUCKET_NAME, SPOTPRICE_FILE_NAME.strip()).get()["Body"]))
-        except Exception as e:
-            print(f"Failed to load Spot Price file ({SPOTPRICE_FILE_NAME}): {e}")
-            raise e
+        if spotinfo_df is None:
+            try:
+                # IF and spot price cycles may point to an earlier unchanged snapshot
+                spotinfo_df, _ = load_snapshot(s3_client, BUCKET_NAME, SPOTIF_FILE_NAME, columns=['InstanceType', 'Region', 'IF'])
+            except Exception as e:
+                print(f"Failed to load Spot IF file ({SPOTIF_FILE_NAME}): {e}")
+                # Should we fail or continue with empty? Original code would fail.
+                raise e
 
-        # ------ Create a DF by Selecting Only The Columns Required ------
-        sps_df = sps_df[['InstanceType', 'Region', 'AZ', 'SPS', 'T3', 'T2']]
-        spotinfo_df = spotinfo_df[['InstanceType', 'Region', 'IF']]
-        ondemand_price_df = ondemand_price_df[['InstanceType', 'Region', 'OndemandPrice']]
-        spot_price_df = spot_price_df[['InstanceType', 'AZ', 'SpotPrice']]
+        if ondemand_price_df is None:
+            try:
+                ondemand_price_df = load_df(s3_client, BUCKET_NAME, ONDEMAND_PRICE_FILE_NAME, columns=['InstanceType', 'Region', 'OndemandPrice'])
+            except Exception as e:
+                 print(f"Failed to load OnDemand Price file ({ONDEMAND_PRICE_FILE_NAME}): {e}")
+                 # Maybe ondemand price is not collected every 10 mins? 
+                 # Original code assumes it exists.
+                 raise e
 
-        # ------ Formatting Data ------
-        spot_price_df['SpotPrice'] = spot_price_df['SpotPrice'].astype('float').round(5)
-        ondemand_price_df['OndemandPrice'] = ondemand_price_df['OndemandPrice'].astype('float').round(5)
+        if spot_price_df is None:
+            try:
+                spot_price_df, _ = load_snapshot(s3_client, BUCKET_NAME, SPOTPRICE_FILE_NAME, columns=['InstanceType', 'AZ', 'SpotPrice'])
+            except Exception as e:
+                print(f"Failed to load Spot Price file ({SPOTPRICE_FILE_NAME}): {e}")
+                raise e
 
-        # ------ Need to Change to Outer Join ------
         print("Merging dataframes...")
-        merge_df = pd.merge(sps_df, spotinfo_df, how="outer")
-        merge_df = pd.merge(merge_df, ondemand_price_df, how="outer")
-        merge_df = pd.merge(merge_df, spot_price_df, how="outer")
-
-        merge_df['Savings'] = 100.0 - (merge_df['SpotPrice'] * 100 / merge_df['OndemandPrice'])
-        merge_df['Savings'] = merge_df['Savings'].fillna(-1)
-        merge_df['SPS'] = merge_df['SPS'].fillna(-1)
-        merge_df['SpotPrice'] = merge_df['SpotPrice'].fillna(-1)
-        merge_df['OndemandPrice'] = merge_df['OndemandPrice'].fillna(-1)
-        merge_df['IF'] = merge_df['IF'].fillna(-1)
-
-        merge_df['Savings'] = merge_df['Savings'].astype('int')
-        merge_df['SPS'] = merge_df['SPS'].astype('int')
-        merge_df['T3'] = merge_df['T3'].fillna(0).astype('int')
-        merge_df['T2'] = merge_df['T2'].fillna(0).astype('int')
-
-        merge_df = merge_df.drop(merge_df[(merge_df['AZ'].isna()) | (merge_df['Region'].isna()) | (merge_df['InstanceType'].isna())].index)
-
-        merge_df.reset_index(drop=True, inplace=True)
-        merge_df['Time'] = time_value
+        merge_df = merge_frames(sps_df, spotinfo_df, ondemand_price_df, spot_price_df, time_value)
 
         end_time = datetime.now(timezone.utc)
         print(f"Merging time is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
 
-        # ------ Check The Previous DF File in S3 and Local ------
+        # ------ Load The Previous State Snapshot from S3 ------
         previous_df = None
         start_time = datetime.now(timezone.utc)
-        filename = 'latest_aws.json'
-        LATEST_PATH = f'latest_data/{filename}'
+        workload_cols = ['InstanceType', 'Region', 'AZ']
+        state_store = LatestStateStore(s3_client, BUCKET_NAME, LATEST_STATE_PREFIX, key_columns=workload_cols)
+        state_version = TIMESTAMP.strftime("%Y-%m-%dT%H-%M")
         try:
-            previous_df = pd.DataFrame(json.load(s3.Object(BUCKET_NAME, LATEST_PATH).get()['Body']))
+            previous_df = state_store.load()
+            if previous_df is None:
+                # No snapshot yet, fall back to the public latest json once
+                filename = 'latest_aws.json'
+                LATEST_PATH = f'latest_data/{filename}'
+                previous_df = pd.DataFrame(json.load(s3.Object(BUCKET_NAME, LATEST_PATH).get()['Body']))
+                previous_df = previous_df.drop(columns=['id'], errors='ignore')
+
             # Verify that the data is in the old format
             columns_to_check = ["T3", "T2"]
             existing_columns = [col for col in columns_to_check if col in previous_df.columns]
 
             if len(existing_columns) == 0:
                 raise FirstRunError("Can't load the previous df from s3 bucket or First run since changing the collector")
-            else:
-                previous_df = previous_df.drop(columns=['id'])
         except Exception as e: # Catching generic exception to handle NoSuchKey or FirstRunError
             print(f"First run or error loading previous data: {e}")
             # If system is first time uploading data, make a new one and upload it to TSDB
+            state_store.save(merge_df, state_version)
             update_latest(merge_df, TIMESTAMP)
             save_raw(merge_df, TIMESTAMP)
             upload_timestream(merge_df, TIMESTAMP)
             end_time = datetime.now(timezone.utc)
-            print(f"Checking time of previous json file is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
+            print(f"Checking time of previous state is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
             return
 
         end_time = datetime.now(timezone.utc)
-        print(f"Checking time of previous json file is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
+        print(f"Checking time of previous state is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
 
         start_time = datetime.now(timezone.utc)
 
@@ -214,12 +254,13 @@ def main():
         print("Comparing with previous data...")
         current_df = compare_max_instance(previous_df, merge_df, target_capacity)
 
-        # ------ Upload Merge DF to s3 Bucket ------
+        # ------ Save State Snapshot and Upload Merge DF to s3 Bucket ------
+        # latest_aws.json is derived from the same DataFrame for public consumers
+        state_store.save(current_df, state_version)
         update_latest(current_df, TIMESTAMP)
         save_raw(current_df, TIMESTAMP)
 
         # ------ Compare All Data ------
-        workload_cols = ['InstanceType', 'Region', 'AZ']
         feature_cols = ['SPS', 'T3', 'T2', 'IF', 'SpotPrice', 'OndemandPrice']
 
         changed_df, removed_df = compare(previous_df, current_df, workload_cols, feature_cols)  # compare previous_df and current_df to extract changed rows)
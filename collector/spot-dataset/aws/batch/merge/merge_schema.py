@@ -0,0 +1,45 @@
+# ------ import module ------
+import numpy as np
+import pandas as pd
+
+# Canonical dtypes of the AWS merge inputs
+# Dimension columns are categoricals sharing one vocabulary across all inputs of a cycle, so the outer merges join on
+# category codes instead of strings. Numeric columns are narrowed to the smallest dtype that holds their values exactly.
+# Prices stay float64: they are rounded to 5 decimals and written as text (latest json, raw csv, Timestream), and a
+# float32 price would neither print nor compare equal to the previous state.
+DIMENSION_COLUMNS = ["InstanceType", "Region", "AZ"]
+NUMERIC_DTYPES = {
+    "SPS": np.int8,
+    "T3": np.int16,
+    "T2": np.int16,
+    "IF": np.float32,
+    "SpotPrice": np.float64,
+    "OndemandPrice": np.float64,
+}
+
+
+# shared category vocabulary of every dimension column present in `frames`
+# return {column: CategoricalDtype}
+def build_vocabularies(frames):
+    vocabularies = {}
+    for col in DIMENSION_COLUMNS:
+        values = [pd.unique(df[col].dropna()) for df in frames if df is not None and col in df.columns]
+        if values:
+            vocabularies[col] = pd.CategoricalDtype(np.sort(pd.unique(np.concatenate(values)).astype(object)))
+    return vocabularies
+
+
+# cast the columns of `df` to the canonical dtypes
+# integer columns that still hold missing values are kept as float32, which holds small integers exactly
+def apply_schema(df, vocabularies):
+    dtypes = {}
+    for col, dtype in vocabularies.items():
+        if col in df.columns:
+            dtypes[col] = dtype
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if np.issubdtype(dtype, np.integer) and df[col].isna().any():
+            dtype = np.float32
+        dtypes[col] = dtype
+    return df.astype(dtypes)
@@ -3,82 +3,36 @@ import boto3
 import pandas as pd
 import json
 from botocore.config import Config
-import concurrent.futures
 
 # ------ import user module ------
 from utility.utils import get_region
+from utility.s3_stream import S3StreamWriter
+from utility.timestream_records import iter_record_batches, AWS_RECORD_SPEC
+from utility.timestream_writer import TimestreamBatchWriter, table_records_per_second, WRITER_CLIENT_RETRIES
+from utility.slack_msg_sender import send_slack_message
 
 BUCKET_NAME = "spotlake"
 S3_PATH_PREFIX = "rawdata/aws"
 
 DATABASE_NAME = "spotlake"
 AWS_TABLE_NAME = "aws"
+# write budget of the aws table (records per second), TIMESTREAM_RECORDS_PER_SECOND_AWS overrides it
+AWS_TABLE_RECORDS_PER_SECOND = table_records_per_second(AWS_TABLE_NAME, 5000)
 
+# TimestreamBatchWriter owns the retries of the writes
 write_client = boto3.client('timestream-write', region_name=get_region(),
-                            config=Config(read_timeout=20, max_pool_connections=5000, retries={'max_attempts': 10}))
-
-# Submit Batch To Timestream
-
-
-def submit_batch(records, counter, recursive):
-    if recursive == 10:
-        return
-    try:
-        write_client.write_records(DatabaseName=DATABASE_NAME, TableName=AWS_TABLE_NAME,
-                                            Records=records, CommonAttributes={})
-    except write_client.exceptions.RejectedRecordsException as err:
-        re_records = []
-        for rr in err.response["RejectedRecords"]:
-            send_slack_message(rr['Reason'])
-            print(rr['Reason'])
-            re_records.append(records[rr["RecordIndex"]])
-        submit_batch(re_records, counter, recursive + 1)
-    except Exception as err:
-        send_slack_message(err)
-        print(err)
-        exit()
-
+                            config=Config(read_timeout=20, max_pool_connections=5000, retries=WRITER_CLIENT_RETRIES))
 
 # Check Database And Table Are Exist and Upload Data to Timestream
 def upload_timestream(data, timestamp):
     data = data.dropna(axis=0)
     time_value = str(int(timestamp.timestamp() * 1000))
 
-    records = []
-    all_batches = []
-    counter = 0
-    for idx, row in data.iterrows():
-        dimensions = []
-        for column in data.columns:
-            if column in ['InstanceType', 'Region', 'AZ', 'OndemandPrice', 'Ceased']:
-                dimensions.append({'Name': column, 'Value': str(row[column])})
-        submit_data = {
-            'Dimensions': dimensions,
-            'MeasureName': 'aws_values',
-            'MeasureValues': [],
-            'MeasureValueType': 'MULTI',
-            'Time': time_value
-        }
-        for column, types in [('SPS', 'BIGINT'), ('T3', 'BIGINT'), ('T2', 'BIGINT'), ('IF', 'DOUBLE'), ('SpotPrice', 'DOUBLE')]:
-            submit_data['MeasureValues'].append({'Name': column, 'Value': str(row[column]), 'Type': types})
-
-        records.append(submit_data)
-        counter += 1
-        if len(records) == 100:
-            all_batches.append(records)
-            records = []
-
-    if len(records) != 0:
-        all_batches.append(records)
-
-    # Submit batches in parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(submit_batch, batch, counter, 0) for batch in all_batches]
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                print(f"Error submitting batch: {e}")
+    # Batches are written from one shared pool with rate limiting and retry; failures are reported once per run
+    writer = TimestreamBatchWriter(write_client, DATABASE_NAME, AWS_TABLE_NAME, notify=send_slack_message,
+                                   records_per_second=AWS_TABLE_RECORDS_PER_SECOND)
+    writer.write(iter_record_batches(data, AWS_RECORD_SPEC, time_value))
+    return writer.close()
 
 
 def update_latest(data, timestamp):
@@ -88,15 +42,9 @@ def update_latest(data, timestamp):
 
     data['id'] = data.index+1
     # Note: 'Time' column is already added in merge_data.py before calling this function
-    data.to_json(f"/tmp/{filename}", orient="records")
-
-    s3 = boto3.resource('s3')
     s3_client = boto3.client('s3')
-
-    with open(f"/tmp/{filename}", 'rb') as f:
-        s3_client.upload_fileobj(f, BUCKET_NAME, LATEST_PATH, ExtraArgs={'ContentType': 'application/json'})
-    object_acl = s3.ObjectAcl(BUCKET_NAME, LATEST_PATH)
-    object_acl.put(ACL='public-read')
+    with S3StreamWriter(s3_client, BUCKET_NAME, LATEST_PATH, extra_args={'ContentType': 'application/json', 'ACL': 'public-read'}) as f:
+        data.to_json(f, orient="records")
 
     data.drop(['id'], axis=1, inplace=True)
 
@@ -127,13 +75,10 @@ def save_raw(data, timestamp):
     s3_obj_name = timestamp.strftime("%H-%M-%S")
 
     rawdata = data[['Time', 'InstanceType', 'Region', 'AZ', 'SPS', 'T3', 'T2', 'IF', 'OndemandPrice', 'SpotPrice', 'Savings']]
-    SAVE_FILENAME = f"/tmp/{s3_obj_name}.csv.gz"
-    rawdata.to_csv(SAVE_FILENAME, index=False, compression="gzip")
 
     s3 = boto3.client('s3')
-
-    with open(SAVE_FILENAME, 'rb') as f:
-        s3.upload_fileobj(f, BUCKET_NAME, f"{S3_PATH_PREFIX}/{s3_dir_name}/{s3_obj_name}.csv.gz")
+    with S3StreamWriter(s3, BUCKET_NAME, f"{S3_PATH_PREFIX}/{s3_dir_name}/{s3_obj_name}.csv.gz") as f:
+        rawdata.to_csv(f, index=False, compression="gzip")
 
 
 def update_config(config_path, text, target_capacity, target_capacities):
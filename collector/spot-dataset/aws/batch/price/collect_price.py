@@ -2,8 +2,6 @@
 from datetime import datetime, timezone
 import pandas as pd
 import boto3.session
-import pickle, gzip
-import io
 import argparse
 import json
 import time
@@ -11,7 +9,10 @@ import concurrent.futures
 
 # ------ import user module ------
 from utility.slack_msg_sender import send_slack_message
+from utility.artifact_io import upload_df
+from utility.artifact_pointer import upload_df_if_changed
 from load_price import get_spot_price, get_regions
+from price_list_parser import parse_price_list
 
 # get ondemand price by all instance type in single region
 def get_ondemand_price_region(region, pricing_client):
@@ -37,33 +38,24 @@ def get_ondemand_price_region(region, pricing_client):
 
 
 # get all ondemand price with regions
+# return (ondemand_price_df, failed_regions)
 def get_ondemand_price():
     session = boto3.session.Session()
     regions = get_regions(session)
     
     pricing_client = session.client('pricing', region_name='us-east-1')
 
-    ondemand_dict = {"Region": [], "InstanceType": [], "OndemandPrice": []}
+    ondemand_price_df_list = []
+    failed_regions = []
 
     def process_region(region):
         print(f"Collecting on-demand price for region: {region}")
-        local_data = {"Region": [], "InstanceType": [], "OndemandPrice": []}
         try:
             # Add delay to avoid rate limiting
             time.sleep(0.5)
             price_infos = get_ondemand_price_region(region, pricing_client)
-            for price_info in price_infos:
-                instance_type = json.loads(price_info)['product']['attributes']['instanceType']
-                instance_price = float(list(list(json.loads(price_info)['terms']['OnDemand'].values())[0]['priceDimensions'].values())[0]['pricePerUnit']['USD'])
-
-                # case of instance-region is not available
-                if instance_price == 0.0:
-                    continue
-
-                local_data['Region'].append(region)
-                local_data['InstanceType'].append(instance_type)
-                local_data['OndemandPrice'].append(instance_price)
-            return local_data
+            instance_types, prices = parse_price_list(price_infos)
+            return pd.DataFrame({"Region": region, "InstanceType": instance_types, "OndemandPrice": prices})
         except Exception as e:
             print(f"Error collecting on-demand price for region {region}: {e}")
             return None
@@ -73,24 +65,144 @@ def get_ondemand_price():
         future_to_region = {executor.submit(process_region, region): region for region in regions}
         for future in concurrent.futures.as_completed(future_to_region):
             result = future.result()
-            if result:
-                ondemand_dict['Region'].extend(result['Region'])
-                ondemand_dict['InstanceType'].extend(result['InstanceType'])
-                ondemand_dict['OndemandPrice'].extend(result['OndemandPrice'])
+            if result is not None:
+                ondemand_price_df_list.append(result)
+            else:
+                failed_regions.append(future_to_region[future])
     
-    ondemand_price_df = pd.DataFrame(ondemand_dict)
+    if ondemand_price_df_list:
+        ondemand_price_df = pd.concat(ondemand_price_df_list, ignore_index=True)
+    else:
+        ondemand_price_df = pd.DataFrame({"Region": [], "InstanceType": [], "OndemandPrice": []})
 
-    return ondemand_price_df
+    return ondemand_price_df, sorted(failed_regions)
+
+
+# get the publication version of the current EC2 price lists, e.g. "20240125221806"
+# the version is the timestamp part of the PriceListArn and changes whenever AWS publishes new prices
+# return None when the price lists cannot be listed (e.g. missing pricing:ListPriceLists permission)
+def get_price_list_version(pricing_client):
+    try:
+        paginator = pricing_client.get_paginator('list_price_lists')
+        versions = set()
+        for response in paginator.paginate(ServiceCode='AmazonEC2', CurrencyCode='USD', EffectiveDate=datetime.now(timezone.utc)):
+            for price_list in response['PriceLists']:
+                # arn:aws:pricing:::price-list/aws/AmazonEC2/USD/{version}/{region}
+                versions.add(price_list['PriceListArn'].split('/')[-2])
+        return max(versions) if versions else None
+    except Exception as e:
+        print(f"Failed to get price list version: {e}")
+        return None
+
+
+# the on-demand price is stored once per day with a manifest of the price list version it was collected from
+# the cached price is fresh when the manifest of the day exists, every region was collected and the price list version
+# did not change; an unknown version (None) on either side only relies on the daily key
+def is_ondemand_price_fresh(s3_client, bucket, manifest_key, price_list_version):
+    try:
+        manifest = json.loads(s3_client.get_object(Bucket=bucket, Key=manifest_key)['Body'].read())
+    except s3_client.exceptions.NoSuchKey:
+        return False
+    if manifest.get('failed_regions'):
+        return False
+    if price_list_version is None or manifest.get('price_list_version') is None:
+        return True
+    return manifest['price_list_version'] == price_list_version
+
+
+def put_ondemand_price_manifest(s3_client, bucket, manifest_key, price_list_version, data_key, rows, failed_regions):
+    manifest = {
+        'price_list_version': price_list_version,
+        'collected_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'key': data_key,
+        'rows': rows,
+        'failed_regions': failed_regions,
+    }
+    s3_client.put_object(Bucket=bucket, Key=manifest_key, Body=json.dumps(manifest).encode('utf-8'), ContentType='application/json')
+
+# ------ Set Constants ------
+S3_PATH_PREFIX = "rawdata/aws"
+BUCKET_NAME = "spotlake"
+
+
+# collect spot price of all regions with one client per region
+# return None when no region returned data
+def collect_spot_price(session):
+    regions = get_regions(session)
+    # boto3 sessions are not thread-safe, so one client per region is created here and shared with the workers
+    ec2_clients = {region: session.client('ec2', region_name=region) for region in regions}
+    spot_price_df_list = []
+
+    def process_spot_price_region(region):
+        print(f"Collecting price for region: {region}")
+        try:
+            return get_spot_price(ec2_clients[region], region)
+        except Exception as e:
+            print(f"Error collecting price for region {region}: {e}")
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        future_to_region = {executor.submit(process_spot_price_region, region): region for region in regions}
+        for future in concurrent.futures.as_completed(future_to_region):
+            result = future.result()
+            if result is not None:
+                spot_price_df_list.append(result)
+
+    if not spot_price_df_list:
+        return None
+
+    spot_price_df = pd.concat(spot_price_df_list).reset_index(drop=True)
+    # concat keeps categoricals only when all categories match, so unify them across regions
+    for column in ["InstanceType", "AZ"]:
+        spot_price_df[column] = spot_price_df[column].astype("category")
+    return spot_price_df
 
-def main():
-    # ------ Set Constants ------
-    # Constants are now imported from const_config
-    S3_PATH_PREFIX = "rawdata/aws"
-    BUCKET_NAME = "spotlake"
 
+def ondemand_price_keys(timestamp_utc):
+    base_key = f"{S3_PATH_PREFIX}/ondemand_price/{timestamp_utc.strftime('%Y/%m/%d')}/ondemand_price"
+    return base_key, f"{base_key}_manifest.json"
+
+
+# on-demand price is stored once per day, so it is only collected when the cache of the day is missing
+# or AWS published a new price list
+# return (ondemand_price_df, price_list_version, failed_regions) where ondemand_price_df is None when the cache is fresh
+def collect_ondemand_price(session, s3_client, timestamp_utc, refresh=False):
+    _, manifest_key = ondemand_price_keys(timestamp_utc)
+    price_list_version = get_price_list_version(session.client('pricing', region_name='us-east-1'))
+    if not refresh and is_ondemand_price_fresh(s3_client, BUCKET_NAME, manifest_key, price_list_version):
+        print(f"On-Demand Price of {timestamp_utc.strftime('%Y/%m/%d')} is fresh (price list version {price_list_version}), skipping collection")
+        return None, price_list_version, []
+
+    print("Collecting On-Demand Price...")
+    ondemand_price_df, failed_regions = get_ondemand_price()
+    print(f"Collected {len(ondemand_price_df)} rows of On-Demand Price data")
+    if failed_regions:
+        print(f"On-Demand Price of {failed_regions} was not collected, it will be collected again in the next run")
+    return ondemand_price_df, price_list_version, failed_regions
+
+
+# upload the spot price of a cycle, pointing to the previous snapshot when unchanged
+# return (key of the snapshot holding the data, uploaded)
+def save_spot_price(s3_client, spot_price_df, timestamp_utc):
+    S3_DIR_NAME = timestamp_utc.strftime('%Y/%m/%d')
+    S3_OBJECT_PREFIX = timestamp_utc.strftime('%H-%M')
+    return upload_df_if_changed(s3_client, spot_price_df, BUCKET_NAME, f"{S3_PATH_PREFIX}/spot_price/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_price", f"{S3_PATH_PREFIX}/spot_price")
+
+
+# upload the on-demand price of the day, then its manifest
+def save_ondemand_price(s3_client, ondemand_price_df, timestamp_utc, price_list_version, failed_regions):
+    base_key, manifest_key = ondemand_price_keys(timestamp_utc)
+    key = upload_df(s3_client, ondemand_price_df, BUCKET_NAME, base_key)
+    put_ondemand_price_manifest(s3_client, BUCKET_NAME, manifest_key, price_list_version, key, len(ondemand_price_df), failed_regions)
+    return key
+
+
+def main():
     # ------ Set time data ------
     parser = argparse.ArgumentParser()
     parser.add_argument('--timestamp', dest='timestamp', action='store', help='Timestamp in format YYYY-MM-DDTHH:MM')
+    parser.add_argument('--refresh_ondemand', dest='refresh_ondemand', action='store_true',
+                        help='collect on-demand price even when the cached price of the day is fresh')
     args = parser.parse_args()
     
     if args.timestamp:
@@ -106,35 +218,14 @@ def main():
         start_time = datetime.now(timezone.utc)
         timestamp_utc = start_time.replace(minute=((start_time.minute // 10) * 10), second=0)
 
-    S3_DIR_NAME = timestamp_utc.strftime('%Y/%m/%d')
-    S3_OBJECT_PREFIX = timestamp_utc.strftime('%H-%M')
-    
     print(f"Collecting Spot Price and On-Demand Price for timestamp: {timestamp_utc}")
     start_time = datetime.now(timezone.utc)
 
     # ------ Collect Spot Price ------
     try:
         session = boto3.session.Session()
-        regions = get_regions(session)
-        spot_price_df_list = []
-        
-        def process_spot_price_region(region):
-            print(f"Collecting price for region: {region}")
-            try:
-                return get_spot_price(region)
-            except Exception as e:
-                print(f"Error collecting price for region {region}: {e}")
-                return None
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_region = {executor.submit(process_spot_price_region, region): region for region in regions}
-            for future in concurrent.futures.as_completed(future_to_region):
-                result = future.result()
-                if result is not None:
-                    spot_price_df_list.append(result)
-                
-        if spot_price_df_list:
-            spot_price_df = pd.concat(spot_price_df_list).reset_index(drop=True)
+        spot_price_df = collect_spot_price(session)
+        if spot_price_df is not None:
             print(f"Collected {len(spot_price_df)} rows of Spot Price data")
         else:
             print("No spot price data collected")
@@ -149,10 +240,9 @@ def main():
 
     # ------ Collect On-Demand Price ------
     start_time = datetime.now(timezone.utc)
+    s3 = session.client('s3')
     try:
-        print("Collecting On-Demand Price...")
-        ondemand_price_df = get_ondemand_price()
-        print(f"Collected {len(ondemand_price_df)} rows of On-Demand Price data")
+        ondemand_price_df, price_list_version, failed_regions = collect_ondemand_price(session, s3, timestamp_utc, args.refresh_ondemand)
     except Exception as e:
         send_slack_message(f"Error during on-demand price collection\n{e}")
         raise e
@@ -162,35 +252,17 @@ def main():
     # ------ Save Raw Data in S3 ------
     start_time = datetime.now(timezone.utc)
     try:
-        s3 = session.client('s3')
-
         # Save Spot Price
-        buffer = io.BytesIO()
-        pickle.dump(spot_price_df, buffer)
-        buffer.seek(0)
-
-        compressed_buffer = io.BytesIO()
-        with gzip.GzipFile(fileobj=compressed_buffer, mode='wb') as gz:
-            gz.write(buffer.getvalue())
-        compressed_buffer.seek(0)
-        
-        key = f"{S3_PATH_PREFIX}/spot_price/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_price.pkl.gz"
-        s3.upload_fileobj(compressed_buffer, BUCKET_NAME, key)
-        print(f"Uploaded Spot Price data to s3://{BUCKET_NAME}/{key}")
-
-        # Save On-Demand Price
-        buffer = io.BytesIO()
-        pickle.dump(ondemand_price_df, buffer)
-        buffer.seek(0)
-
-        compressed_buffer = io.BytesIO()
-        with gzip.GzipFile(fileobj=compressed_buffer, mode='wb') as gz:
-            gz.write(buffer.getvalue())
-        compressed_buffer.seek(0)
-        
-        key = f"{S3_PATH_PREFIX}/ondemand_price/{S3_DIR_NAME}/ondemand_price.pkl.gz"
-        s3.upload_fileobj(compressed_buffer, BUCKET_NAME, key)
-        print(f"Uploaded On-Demand Price data to s3://{BUCKET_NAME}/{key}")
+        key, uploaded = save_spot_price(s3, spot_price_df, timestamp_utc)
+        if uploaded:
+            print(f"Uploaded Spot Price data to s3://{BUCKET_NAME}/{key}")
+        else:
+            print(f"Spot Price is unchanged, pointing to s3://{BUCKET_NAME}/{key}")
+
+        # Save On-Demand Price, then its manifest
+        if ondemand_price_df is not None:
+            key = save_ondemand_price(s3, ondemand_price_df, timestamp_utc, price_list_version, failed_regions)
+            print(f"Uploaded On-Demand Price data to s3://{BUCKET_NAME}/{key}")
         
     except Exception as e:
         send_slack_message(f"Store spot price data to be stored in the cloud in memory\n{e}")
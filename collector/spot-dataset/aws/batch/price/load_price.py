@@ -1,5 +1,7 @@
 # ------ import module ------
 import boto3.session
+from array import array
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, timezone
 
@@ -14,54 +16,46 @@ def get_regions(session: boto3.session.Session, region='us-east-1') -> list:
 
 
 # get spot price by all availability zone in single region
-def get_spot_price_region(session: boto3.session.Session, region: str, start=None, end=None) -> tuple: # type: ignore
-    client = session.client('ec2', region)
-    describe_args = {
-        'MaxResults': 300,
-        'StartTime': start,
-        'EndTime': end
-    }
-    while True:
-        response = client.describe_spot_price_history(**describe_args)
+# `client` is an EC2 client of `region`; pages are read with the boto3 paginator and only Linux/UNIX records are yielded
+def get_spot_price_region(client, region: str, start=None, end=None):
+    paginator = client.get_paginator('describe_spot_price_history')
+    pages = paginator.paginate(
+        StartTime=start,
+        EndTime=end,
+        PaginationConfig={'PageSize': 300}
+    )
+    for response in pages:
         for obj in response['SpotPriceHistory']:
-            az = obj['AvailabilityZone']
-            it = obj['InstanceType']
-            os = obj['ProductDescription']
-            price = obj['SpotPrice']
-            timestamp = obj['Timestamp']
             # get only Linux price
-            if os != 'Linux/UNIX':
-                continue
-            yield it, az, float(price), timestamp
-        if not response['NextToken']:
-            break
-        describe_args['NextToken'] = response['NextToken']
+            if obj['ProductDescription'] == 'Linux/UNIX':
+                yield obj
 
 
-# get all spot price with regions
-def get_spot_price(region):
-    session = boto3.session.Session()
-    
+# get spot price of a region as (InstanceType, AZ, SpotPrice)
+# records are encoded into typed buffers while paging: InstanceType and AZ become categorical codes and prices float64,
+# so no per-record Python lists are kept, and AZ names are mapped to AZ IDs once per category
+def get_spot_price(client, region):
     end_date = datetime.now(timezone.utc).replace(microsecond=0)
     start_date = end_date - timedelta(microseconds=1)
 
-    spotprice_dict = {"InstanceType": [], "AZ": [], "SpotPrice": []}
-    
-    for it, az, price, _ in get_spot_price_region(session, region, start_date, end_date):
-        spotprice_dict["InstanceType"].append(it)
-        spotprice_dict["AZ"].append(az)
-        spotprice_dict["SpotPrice"].append(price)
-    
-    spot_price_df = pd.DataFrame(spotprice_dict)
+    instance_type_index = {}
+    az_index = {}
+    instance_type_codes = array('i')
+    az_codes = array('i')
+    prices = array('d')
+    for obj in get_spot_price_region(client, region, start_date, end_date):
+        instance_type_codes.append(instance_type_index.setdefault(obj['InstanceType'], len(instance_type_index)))
+        az_codes.append(az_index.setdefault(obj['AvailabilityZone'], len(az_index)))
+        prices.append(float(obj['SpotPrice']))
 
     # filter to change az-name to az-id
-    az_map = dict()
-    ec2 = session.client('ec2', region_name=region)
-    response = ec2.describe_availability_zones()
+    response = client.describe_availability_zones()
+    az_map = {val['ZoneName']: val['ZoneId'] for val in response['AvailabilityZones']}
+
+    spot_price_df = pd.DataFrame({
+        "InstanceType": pd.Categorical.from_codes(np.frombuffer(instance_type_codes, dtype=np.int32), categories=list(instance_type_index)),
+        "AZ": pd.Categorical.from_codes(np.frombuffer(az_codes, dtype=np.int32), categories=[az_map.get(name, name) for name in az_index]),
+        "SpotPrice": np.frombuffer(prices, dtype=np.float64),
+    })
 
-    for val in response['AvailabilityZones']:
-        az_map[val['ZoneName']] = val['ZoneId']
-    
-    spot_price_df = spot_price_df.replace({"AZ":az_map})
-    
     return spot_price_df
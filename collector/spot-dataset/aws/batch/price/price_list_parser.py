@@ -0,0 +1,69 @@
+# ------ import module ------
+import re
+import json
+import numpy as np
+
+# orjson decodes whole product documents several times faster than the standard library; it is optional
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# A Pricing API product document is ~6 KB of JSON, but only two small values are needed from it:
+#   product.attributes.instanceType and terms.OnDemand.<term>.priceDimensions.<dimension>.pricePerUnit.USD
+# Both keys are unique in the document ("OnDemand" also appears as the marketoption value, which is never followed by
+# ':'), so the fast path locates them with str.find and decodes only the value behind each key, like simdjson's
+# on-demand API. A document the scan cannot read is fully decoded instead.
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+# decode the value of the first `"key":` in a JSON document without decoding the rest of it
+def _value_of(document, key):
+    quoted_key = f'"{key}"'
+    pos = document.find(quoted_key)
+    while pos != -1:
+        i = _whitespace.match(document, pos + len(quoted_key)).end()
+        if document.startswith(':', i):
+            i = _whitespace.match(document, i + 1).end()
+            return _decoder.raw_decode(document, i)[0]
+        pos = document.find(quoted_key, pos + 1)
+    raise KeyError(key)
+
+
+# hourly price of the first price dimension of the first OnDemand term
+def _on_demand_price(on_demand_terms):
+    on_demand_term = next(iter(on_demand_terms.values()))
+    return float(next(iter(on_demand_term['priceDimensions'].values()))['pricePerUnit']['USD'])
+
+
+# return (instance type, on-demand price) of one product document
+def parse_product(price_info, loads=None):
+    if isinstance(price_info, str):
+        try:
+            return _value_of(price_info, 'instanceType'), _on_demand_price(_value_of(price_info, 'OnDemand'))
+        except (KeyError, ValueError, TypeError, AttributeError, StopIteration):
+            pass
+    product = (loads or _loads)(price_info)
+    return product['product']['attributes']['instanceType'], _on_demand_price(product['terms']['OnDemand'])
+
+
+# parse the PriceList of a Pricing API get_products response
+# products with a price of 0.0 (instance type not available in the region) are skipped
+# return (instance_types, prices) where prices is a float64 numpy array
+def parse_price_list(price_list, loads=None):
+    instance_types = []
+    prices = []
+    for price_info in price_list:
+        instance_type, price = parse_product(price_info, loads)
+
+        # case of instance-region is not available
+        if price == 0.0:
+            continue
+
+        instance_types.append(instance_type)
+        prices.append(price)
+
+    return instance_types, np.array(prices, dtype=np.float64)
@@ -0,0 +1,141 @@
+# ------ import module ------
+import os
+import sys
+import argparse
+import concurrent.futures
+from datetime import datetime, timezone
+import boto3.session
+
+# stage directories are imported flat, as each stage script does when it is run on its own
+# (the `if` directory can not be imported as a package)
+BATCH_DIR = os.path.dirname(os.path.abspath(__file__))
+for stage in ["sps", "if", "price", "merge"]:
+    sys.path.insert(0, os.path.join(BATCH_DIR, stage))
+
+# ------ import user module ------
+from utility.slack_msg_sender import send_slack_message
+from utility.spot_advisor import SPOT_ADVISOR_URL
+from collect_sps import collect_sps, save_sps, parse_timestamp
+from collect_if import collect_spot_if, save_spot_if
+from collect_price import collect_spot_price, collect_ondemand_price, save_spot_price, save_ondemand_price
+from merge_data import merge_and_upload
+
+# Single-process AWS collection: SPS, IF and price are collected concurrently and their DataFrames are handed to the
+# merge stage in memory, while the raw artifacts are written to S3 in the background.
+# The stage scripts (collect_sps.py, collect_if.py, collect_price.py, merge_data.py) still run on their own and write
+# the same S3 keys, so both modes can be used interchangeably for a cycle.
+UPLOAD_WORKERS = 4
+
+
+def minutes_since(start_time):
+    return (datetime.now(timezone.utc) - start_time).total_seconds() * 1000 / 60000
+
+
+def collect_price(session, s3_client, timestamp_utc, refresh_ondemand):
+    spot_price_df = collect_spot_price(session)
+    if spot_price_df is None:
+        raise RuntimeError("No spot price data collected")
+    print(f"Collected {len(spot_price_df)} rows of Spot Price data")
+    return spot_price_df, collect_ondemand_price(session, s3_client, timestamp_utc, refresh_ondemand)
+
+
+# wait for the background uploads and report every failed one
+def wait_uploads(upload_futures):
+    failed = []
+    for name, future in upload_futures.items():
+        try:
+            result = future.result()
+            print(f"Saved {name}: {result}")
+        except Exception as e:
+            print(f"Failed to save {name}: {e}")
+            failed.append(f"{name}: {e}")
+    if failed:
+        message = "Error during raw data upload of the pipeline\n" + "\n".join(failed)
+        send_slack_message(message)
+        raise RuntimeError(message)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--timestamp', dest='timestamp', action='store', help='Timestamp in format YYYY-MM-DDTHH:MM')
+    parser.add_argument('--engine', dest='engine', action='store', choices=['thread', 'async'], default='thread',
+                        help='SPS query engine: thread (8 threads) or async')
+    parser.add_argument('--refresh_ondemand', dest='refresh_ondemand', action='store_true',
+                        help='collect on-demand price even when the cached price of the day is fresh')
+    parser.add_argument('--advisor_url', dest='advisor_url', action='store', default=SPOT_ADVISOR_URL,
+                        help='URL of the spot advisor feed')
+    parser.add_argument('--stats_file', dest='stats_file', action='store',
+                        help='file to append the collection and merge durations to')
+    args = parser.parse_args()
+
+    timestamp_utc = parse_timestamp(args.timestamp)
+    # the merge stage works on the minute of the cycle, like the timestamp it parses from the SPS key
+    TIMESTAMP = timestamp_utc.replace(tzinfo=timezone.utc, second=0, microsecond=0)
+    print(f"Starting in-process collection for timestamp: {TIMESTAMP}")
+
+    session = boto3.session.Session()
+    s3_client = session.client("s3", region_name="us-west-2")
+
+    # ------ Collect SPS, IF and Price concurrently ------
+    collection_start_time = datetime.now(timezone.utc)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        sps_future = executor.submit(collect_sps, timestamp_utc, args.engine)
+        if_future = executor.submit(collect_spot_if, s3_client, args.advisor_url)
+        price_future = executor.submit(collect_price, session, s3_client, timestamp_utc, args.refresh_ondemand)
+
+        failed = []
+        for name, future in [("SPS", sps_future), ("IF", if_future), ("Price", price_future)]:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"{name} collection failed: {e}")
+                failed.append(f"{name}: {e}")
+    if failed:
+        message = "Error during in-process collection, merge is skipped\n" + "\n".join(failed)
+        send_slack_message(message)
+        raise RuntimeError(message)
+
+    sps_df, target_capacity = sps_future.result()
+    spotinfo_df = if_future.result()
+    spot_price_df, (ondemand_price_df, price_list_version, failed_regions) = price_future.result()
+    collection_minutes = minutes_since(collection_start_time)
+    print(f"Collection time is {collection_minutes:.2f} min")
+
+    # ------ Save Raw Data in the background ------
+    uploader = concurrent.futures.ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+    upload_futures = {
+        "SPS": uploader.submit(save_sps, s3_client, sps_df, timestamp_utc, target_capacity),
+        "Spot IF": uploader.submit(save_spot_if, s3_client, spotinfo_df, timestamp_utc),
+        "Spot Price": uploader.submit(save_spot_price, s3_client, spot_price_df, timestamp_utc),
+    }
+    # a fresh on-demand price of the day is not collected again, the merge stage loads it from S3
+    if ondemand_price_df is not None:
+        upload_futures["On-Demand Price"] = uploader.submit(save_ondemand_price, s3_client, ondemand_price_df, timestamp_utc, price_list_version, failed_regions)
+
+    # ------ Merge the in-memory DataFrames ------
+    merge_start_time = datetime.now(timezone.utc)
+    try:
+        merge_and_upload(TIMESTAMP, target_capacity, sps_df=sps_df, spotinfo_df=spotinfo_df,
+                         ondemand_price_df=ondemand_price_df, spot_price_df=spot_price_df)
+    except Exception:
+        # the raw artifacts are kept even when the merge failed; a failed upload is reported by wait_uploads, and the
+        # merge error is the one raised
+        try:
+            wait_uploads(upload_futures)
+        except RuntimeError as e:
+            print(f"Raw data upload failed after the merge failed: {e}")
+        raise
+    finally:
+        uploader.shutdown()
+    wait_uploads(upload_futures)
+    merge_minutes = minutes_since(merge_start_time)
+    print(f"Merge & Upload time is {merge_minutes:.2f} min")
+
+    if args.stats_file:
+        with open(args.stats_file, "a") as f:
+            f.write(f"Collection Duration (sec): {int(collection_minutes * 60)}\n")
+            f.write(f"Merge & Upload Duration (sec): {int(merge_minutes * 60)}\n")
+
+
+if __name__ == "__main__":
+    main()
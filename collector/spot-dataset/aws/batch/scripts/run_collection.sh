@@ -43,11 +43,84 @@ monitor_memory() {
     done
 }
 
+# Function to monitor memory of the single-process pipeline (PIPELINE_MODE=inprocess)
+monitor_memory_pipeline() {
+    local pipeline_pid=$1
+    local out_file=$2
+
+    echo "Timestamp,Service,PID,Memory_MB" > "$out_file"
+
+    while ps -p $pipeline_pid > /dev/null 2>&1; do
+        current_ts=$(date "+%Y-%m-%d %H:%M:%S")
+        mem=$(ps -o rss= -p $pipeline_pid | awk '{print $1/1024}')
+        echo "$current_ts,Pipeline,$pipeline_pid,$mem" >> "$out_file"
+        sleep 10
+    done
+}
+
+# Upload execution time, memory usage and instance type of this run
+upload_stats() {
+    # Upload to S3 with date-based path structure
+    # Extract date components from TIMESTAMP (supports "YYYY-MM-DD HH:MM:SS" and "YYYY-MM-DDTHH:MM:SSZ" formats)
+    YEAR=$(echo "$TIMESTAMP" | cut -d'-' -f1)
+    MONTH=$(echo "$TIMESTAMP" | cut -d'-' -f2)
+    DAY=$(echo "$TIMESTAMP" | cut -d'-' -f3 | cut -d'T' -f1 | cut -d' ' -f1)
+
+    MONITORING_BASE_PATH="s3://spotlake/rawdata/aws/monitoring"
+    DATE_PATH="${YEAR}/${MONTH}/${DAY}"
+
+    # Get instance type using EC2 Instance Metadata Service (IMDSv2)
+    IMDS_TOKEN=$(curl -s -X PUT "http://169.254.169.254/latest/api/token" -H "X-aws-ec2-metadata-token-ttl-seconds: 21600" 2>/dev/null || echo "")
+    if [ -n "$IMDS_TOKEN" ]; then
+        INSTANCE_TYPE=$(curl -s -H "X-aws-ec2-metadata-token: $IMDS_TOKEN" http://169.254.169.254/latest/meta-data/instance-type 2>/dev/null || echo "unknown")
+    else
+        # Fallback to IMDSv1
+        INSTANCE_TYPE=$(curl -s http://169.254.169.254/latest/meta-data/instance-type 2>/dev/null || echo "unknown")
+    fi
+
+    echo "Instance Type: $INSTANCE_TYPE"
+    echo "Timestamp: $TIMESTAMP" > "$INSTANCE_TYPE_FILE"
+    echo "Instance Type: $INSTANCE_TYPE" >> "$INSTANCE_TYPE_FILE"
+
+    # Compress CSV files with gzip
+    gzip -f "$MEMORY_FILE"
+    MEMORY_FILE_GZ="${MEMORY_FILE}.gz"
+
+    echo "Uploading stats to S3..."
+    aws s3 cp "$EXECUTION_FILE" "${MONITORING_BASE_PATH}/executionTime/${DATE_PATH}/"
+    aws s3 cp "$MEMORY_FILE_GZ" "${MONITORING_BASE_PATH}/memory/${DATE_PATH}/"
+    aws s3 cp "$INSTANCE_TYPE_FILE" "${MONITORING_BASE_PATH}/instanceType/${DATE_PATH}/"
+}
+
 echo "Starting SpotLake Data Collection for timestamp: $TIMESTAMP"
 
+# PIPELINE_MODE=inprocess runs SPS, IF, Price and Merge in one process (run_pipeline.py),
+# handing the collected DataFrames to the merge stage without reading them back from S3
+if [ "${PIPELINE_MODE:-process}" = "inprocess" ]; then
+    echo "Starting In-Process Pipeline..."
+    echo "Start Time: $START_TIME_READABLE" > "$EXECUTION_FILE"
+    python3 collector/spot-dataset/aws/batch/run_pipeline.py --timestamp "$TIMESTAMP" --engine "${SPS_ENGINE:-thread}" --stats_file "$EXECUTION_FILE" &
+    PID_PIPELINE=$!
+
+    monitor_memory_pipeline $PID_PIPELINE "$MEMORY_FILE" &
+    MONITOR_PID=$!
+
+    STATUS_PIPELINE=0
+    wait $PID_PIPELINE || STATUS_PIPELINE=$?
+    kill $MONITOR_PID 2>/dev/null || true
+
+    if [ $STATUS_PIPELINE -ne 0 ]; then
+        echo "In-process pipeline failed with status $STATUS_PIPELINE"
+        exit 1
+    fi
+
+    upload_stats
+    exit 0
+fi
+
 # Run collection scripts in parallel
 echo "Starting SPS Collection..."
-python3 collector/spot-dataset/aws/batch/sps/collect_sps.py --timestamp "$TIMESTAMP" &
+python3 collector/spot-dataset/aws/batch/sps/collect_sps.py --timestamp "$TIMESTAMP" --engine "${SPS_ENGINE:-thread}" &
 PID_SPS=$!
 
 echo "Starting IF Collection..."
@@ -96,36 +169,7 @@ if [ $STATUS_SPS -eq 0 ] && [ $STATUS_IF -eq 0 ] && [ $STATUS_PRICE -eq 0 ]; the
         echo "Collection Duration (sec): $COLLECTION_DURATION" >> "$EXECUTION_FILE"
         echo "Merge & Upload Duration (sec): $MERGE_DURATION" >> "$EXECUTION_FILE"
         
-        # Upload to S3 with date-based path structure
-        # Extract date components from TIMESTAMP (supports "YYYY-MM-DD HH:MM:SS" and "YYYY-MM-DDTHH:MM:SSZ" formats)
-        YEAR=$(echo "$TIMESTAMP" | cut -d'-' -f1)
-        MONTH=$(echo "$TIMESTAMP" | cut -d'-' -f2)
-        DAY=$(echo "$TIMESTAMP" | cut -d'-' -f3 | cut -d'T' -f1 | cut -d' ' -f1)
-        
-        MONITORING_BASE_PATH="s3://spotlake/rawdata/aws/monitoring"
-        DATE_PATH="${YEAR}/${MONTH}/${DAY}"
-        
-        # Get instance type using EC2 Instance Metadata Service (IMDSv2)
-        IMDS_TOKEN=$(curl -s -X PUT "http://169.254.169.254/latest/api/token" -H "X-aws-ec2-metadata-token-ttl-seconds: 21600" 2>/dev/null || echo "")
-        if [ -n "$IMDS_TOKEN" ]; then
-            INSTANCE_TYPE=$(curl -s -H "X-aws-ec2-metadata-token: $IMDS_TOKEN" http://169.254.169.254/latest/meta-data/instance-type 2>/dev/null || echo "unknown")
-        else
-            # Fallback to IMDSv1
-            INSTANCE_TYPE=$(curl -s http://169.254.169.254/latest/meta-data/instance-type 2>/dev/null || echo "unknown")
-        fi
-        
-        echo "Instance Type: $INSTANCE_TYPE"
-        echo "Timestamp: $TIMESTAMP" > "$INSTANCE_TYPE_FILE"
-        echo "Instance Type: $INSTANCE_TYPE" >> "$INSTANCE_TYPE_FILE"
-        
-        # Compress CSV files with gzip
-        gzip -f "$MEMORY_FILE"
-        MEMORY_FILE_GZ="${MEMORY_FILE}.gz"
-        
-        echo "Uploading stats to S3..."
-        aws s3 cp "$EXECUTION_FILE" "${MONITORING_BASE_PATH}/executionTime/${DATE_PATH}/"
-        aws s3 cp "$MEMORY_FILE_GZ" "${MONITORING_BASE_PATH}/memory/${DATE_PATH}/"
-        aws s3 cp "$INSTANCE_TYPE_FILE" "${MONITORING_BASE_PATH}/instanceType/${DATE_PATH}/"
+        upload_stats
     else
         echo "Error: /tmp/sps_key.txt not found. SPS collection might have failed to write the key."
         exit 1
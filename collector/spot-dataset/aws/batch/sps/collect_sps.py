@@ -1,17 +1,22 @@
 # ------ import module ------
 from datetime import datetime, timezone
-import boto3.session, botocore
-import os, argparse
+import boto3.session
+import argparse
 import pickle, gzip, json, yaml
 import pandas as pd
 from io import StringIO
 import threading
+import asyncio
 import concurrent.futures
 
 # ------ import user module ------
 from utility.slack_msg_sender import send_slack_message
+from utility.artifact_io import upload_df
+from utility.client_pool import CredentialClientPool
+from utility.utils import get_region
 
-from sps_query_api import query_sps
+from sps_query_api import query_sps, CredentialAllocator, discover_credential_mapping
+from sps_async_engine import SpsAsyncEngine
 
 # ------ S3 File Helper Functions ------
 def read_metadata(s3_client, bucket_name, s3_key, default_value=None):
@@ -52,7 +57,9 @@ def write_metadata(s3_client, bucket_name, s3_key, metadata):
         print(f"S3에 파일 쓰기 실패 ({s3_key}): {e}")
         raise e
 
-def main():
+# SPS를 수집하고 (sps_df, target_capacity)를 반환합니다.
+# credential/target capacity 메타데이터와 workload-credential 매핑은 S3에 갱신되며, sps_df의 업로드는 save_sps가 담당합니다.
+def collect_sps(timestamp_utc, sps_engine='thread'):
     # ------ Setting Constants ------
     BUCKET_NAME = "spotlake"
     S3_PATH_PREFIX = "rawdata/aws"
@@ -68,31 +75,11 @@ def main():
     s3 = session.resource("s3")
     s3_client = session.client("s3", region_name="us-west-2")
 
-    # ------ Receive UTC Time Data ------
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--timestamp', dest='timestamp', action='store', help='Timestamp in format YYYY-MM-DDTHH:MM')
-    args = parser.parse_args()
-    
-    if args.timestamp:
-        # Handle EventBridge timestamp format (YYYY-MM-DDTHH:MM:SSZ)
-        if args.timestamp.endswith('Z'):
-            timestamp_utc = datetime.strptime(args.timestamp, "%Y-%m-%dT%H:%M:%SZ")
-        else:
-            try:
-                timestamp_utc = datetime.strptime(args.timestamp, "%Y-%m-%dT%H:%M:%S")
-            except ValueError:
-                timestamp_utc = datetime.strptime(args.timestamp, "%Y-%m-%dT%H:%M")
-    else:
-        timestamp_utc = datetime.now(timezone.utc)
-        # Round down to nearest 10 minutes
-        timestamp_utc = timestamp_utc.replace(minute=((timestamp_utc.minute // 10) * 10), second=0, microsecond=0)
-
     print(f"스크립트 실행 시작 시간 (UTC) : {timestamp_utc}")
 
     # ------ Modify Date Data Format ------
     date = timestamp_utc.strftime("%Y-%m-%d")
     S3_DIR_NAME = timestamp_utc.strftime("%Y/%m/%d")
-    S3_OBJECT_PREFIX = timestamp_utc.strftime("%H-%M")
     execution_time_start = datetime.now(timezone.utc)
 
     # ------ Save Value of Credential Start Index ------
@@ -190,8 +177,10 @@ def main():
     tc_key = str(target_capacity)
     is_first_collection = tc_key not in workload_credential_mapping
     
-    if is_first_collection:
-        print(f"Target Capacity {target_capacity}에 대한 첫 수집입니다. 순차 실행 모드로 진행합니다.")
+    if sps_engine == 'async':
+        print(f"Target Capacity {target_capacity}에 대해 asyncio 실행 모드로 진행합니다. (첫 수집 : {is_first_collection})")
+    elif is_first_collection:
+        print(f"Target Capacity {target_capacity}에 대한 첫 수집입니다. 멀티쓰레드로 매핑을 탐색합니다.")
     else:
         print(f"Target Capacity {target_capacity}에 대한 매핑이 존재합니다. 멀티쓰레드 실행 모드로 진행합니다.")
 
@@ -202,80 +191,81 @@ def main():
     start_time = datetime.now(timezone.utc)
     start_credential_index = current_credential_index
 
+    # EC2 clients are cached per credential and shared by the threaded and async modes
+    client_pool = CredentialClientPool('ec2', region_name=get_region())
+
     try:
         df_list = []
         
+        if is_first_collection and sps_engine == 'async':
+            # ------ asyncio 실행 모드 (첫 수집) ------
+            # MaxConfigLimitExceeded가 발생한 묶음만 다음 credential로 넘어가고 나머지는 동시에 진행합니다.
+            allocator = CredentialAllocator(init_credential_index, current_credential_index, credential_range_end)
+            engine = SpsAsyncEngine(client_pool, credentials, target_capacity)
+            df_list, current_mapping = asyncio.run(engine.run_first_collection(workload, allocator))
+            current_credential_index = allocator.current
+
+        elif is_first_collection:
+            # ------ 멀티쓰레드 실행 모드 (첫 수집) ------
+            # 쓰레드마다 allocator에서 credential을 받아 조회하고, MaxConfigLimitExceeded이면 새 credential로 재시도합니다.
+            allocator = CredentialAllocator(init_credential_index, current_credential_index, credential_range_end)
+
+            def query_with_credential(credential_index, scenarios):
+                credential = credentials.iloc[credential_index]
+                ec2 = client_pool.get(credential_index, credential)
+                return query_sps((ec2, scenarios, target_capacity))
+
+            df_list, current_mapping = discover_credential_mapping(workload, allocator, query_with_credential, max_workers=8)
+            current_credential_index = allocator.current
+
         if is_first_collection:
-            # ------ 순차 실행 모드 (첫 수집) ------
-            current_mapping = {}
-            for idx, scenarios in enumerate(workload):
-                while True:
-                    try:
-                        credential = credentials.iloc[current_credential_index]
-                        args = (credential, scenarios, target_capacity)
-                        df = query_sps(args)
-                        # 성공한 경우에만 매핑 기록 및 index 증가
-                        current_mapping[idx] = current_credential_index
-                        current_credential_index += 1
-                        if current_credential_index >= credential_range_end:
-                            current_credential_index = init_credential_index
-                        df_list.append(df)
-                        break
-                    except botocore.exceptions.ClientError as e:
-                        if e.response['Error']['Code'] == 'MaxConfigLimitExceeded':
-                            print(f"MaxConfigLimitExceeded for credential index {current_credential_index}. Retrying with next credential.")
-                            current_credential_index += 1
-                            if current_credential_index >= credential_range_end:
-                                current_credential_index = init_credential_index
-                            continue
-                        else:
-                            print(f"ClientError: {e}")
-                            raise e
-                    except Exception as e:
-                        print(f"Error in sequential processing: {e}")
-                        raise e
-            
-            # 매핑 저장
+            # 모든 묶음이 성공한 뒤 매핑을 한 번에 저장
             workload_credential_mapping[tc_key] = current_mapping
             write_metadata(s3_client, BUCKET_NAME, WORKLOAD_CREDENTIAL_MAPPING_S3_KEY, workload_credential_mapping)
             print(f"Target Capacity {target_capacity}에 대한 매핑을 저장했습니다. (총 {len(current_mapping)}개 항목)")
         
         else:
-            # ------ 멀티쓰레드 실행 모드 (매핑 기반) ------
+            # ------ 매핑 기반 실행 모드 ------
             tc_mapping = workload_credential_mapping[tc_key]
             
             # YAML 로드 시 key 타입이 int 또는 str일 수 있으므로 통일
             # tc_mapping의 key를 int로 변환
             tc_mapping_int_keys = {int(k): v for k, v in tc_mapping.items()}
+
+            if sps_engine == 'async':
+                # ------ asyncio 실행 모드 (매핑 기반) ------
+                engine = SpsAsyncEngine(client_pool, credentials, target_capacity)
+                df_list = asyncio.run(engine.run_mapped(workload, tc_mapping_int_keys))
+            else:
+                def process_scenario_with_mapping(idx, scenario, credential_index, target_capacity):
+                    """매핑된 credential을 사용하여 시나리오 처리"""
+                    credential = credentials.iloc[credential_index]
+                    ec2 = client_pool.get(credential_index, credential)
+                    args = (ec2, scenario, target_capacity)
+                    return query_sps(args)
             
-            def process_scenario_with_mapping(idx, scenario, credential_index, target_capacity):
-                """매핑된 credential을 사용하여 시나리오 처리"""
-                credential = credentials.iloc[credential_index]
-                args = (credential, scenario, target_capacity)
-                return query_sps(args)
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                future_to_idx = {
-                    executor.submit(
-                        process_scenario_with_mapping, 
-                        idx, 
-                        scenario, 
-                        tc_mapping_int_keys[idx],  # int key 사용
-                        target_capacity
-                    ): idx 
-                    for idx, scenario in enumerate(workload)
-                }
+                with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+                    future_to_idx = {
+                        executor.submit(
+                            process_scenario_with_mapping, 
+                            idx, 
+                            scenario, 
+                            tc_mapping_int_keys[idx],  # int key 사용
+                            target_capacity
+                        ): idx 
+                        for idx, scenario in enumerate(workload)
+                    }
                 
-                for future in concurrent.futures.as_completed(future_to_idx):
-                    try:
-                        df = future.result()
-                        df_list.append(df)
-                    except Exception as e:
-                        message = f"Error processing scenario: {e}"
-                        print(message)
-                        raise e
-            
-            # 멀티쓰레드 모드에서도 사용한 credential 범위 갱신
+                    for future in concurrent.futures.as_completed(future_to_idx):
+                        try:
+                            df = future.result()
+                            df_list.append(df)
+                        except Exception as e:
+                            message = f"Error processing scenario: {e}"
+                            print(message)
+                            raise e
+
+            # 매핑 기반 모드에서도 사용한 credential 범위 갱신
             # 매핑에서 최대 credential index + 1을 사용
             max_used_credential_index = max(tc_mapping_int_keys.values())
             current_credential_index = max_used_credential_index + 1
@@ -307,39 +297,6 @@ def main():
     print(f"Target Capacity {target_capacity} query time is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
     print(f"사용한 credential range : {(start_credential_index, current_credential_index)}")
 
-    start_time = datetime.now(timezone.utc)
-    # ------ Save Dataframe File ------
-    try:
-        object_name = f"{S3_OBJECT_PREFIX}_sps_{target_capacity}.pkl"
-        # Use /tmp for temporary files in Batch/Lambda
-        saved_filename = f"/tmp/{object_name}"
-        gz_filename = f"{saved_filename}.gz"
-
-        with open(saved_filename, "wb") as f:
-            pickle.dump(sps_df, f)
-
-        with open(saved_filename, "rb") as f_in, gzip.open(gz_filename, "wb") as f_out:
-            f_out.writelines(f_in)
-
-        with open(gz_filename, "rb") as f:
-            s3_client.upload_fileobj(f, BUCKET_NAME, f"{S3_PATH_PREFIX}/sps/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_sps_{target_capacity}.pkl.gz")
-
-        os.remove(saved_filename)
-        os.remove(gz_filename)
-
-        # Save S3 key to a file for the merge script
-        s3_key = f"{S3_PATH_PREFIX}/sps/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_sps_{target_capacity}.pkl.gz"
-        with open("/tmp/sps_key.txt", "w") as f:
-            f.write(s3_key)
-        print(f"SPS Key saved to /tmp/sps_key.txt: {s3_key}")
-
-    except Exception as e:
-        send_slack_message(e)
-        print(f"파일 저장 및 업로드 중 오류 발생: {e}")
-        raise e
-    end_time = datetime.now(timezone.utc)
-    print(f"Saving time of DF File is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
-
     # ------ Monitoring for total execution time ------
     execution_time_end = datetime.now(timezone.utc)
     total_execution_time = (execution_time_end - execution_time_start).total_seconds()
@@ -373,6 +330,62 @@ def main():
         # Don't raise here
     print(f"수집된 DataFrame 행 수 : {sps_df.shape[0]}")
 
+    return sps_df, target_capacity
+
+
+# sps_df를 S3에 저장하고 key를 반환합니다.
+def save_sps(s3_client, sps_df, timestamp_utc, target_capacity):
+    BUCKET_NAME = "spotlake"
+    S3_PATH_PREFIX = "rawdata/aws"
+    S3_DIR_NAME = timestamp_utc.strftime("%Y/%m/%d")
+    S3_OBJECT_PREFIX = timestamp_utc.strftime("%H-%M")
+    return upload_df(s3_client, sps_df, BUCKET_NAME, f"{S3_PATH_PREFIX}/sps/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_sps_{target_capacity}")
+
+
+# EventBridge/CLI timestamp 문자열을 datetime으로 변환합니다. 값이 없으면 현재 시각을 10분 단위로 내림합니다.
+def parse_timestamp(timestamp):
+    if timestamp:
+        # Handle EventBridge timestamp format (YYYY-MM-DDTHH:MM:SSZ)
+        if timestamp.endswith('Z'):
+            return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+        try:
+            return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
+        except ValueError:
+            return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M")
+    timestamp_utc = datetime.now(timezone.utc)
+    # Round down to nearest 10 minutes
+    return timestamp_utc.replace(minute=((timestamp_utc.minute // 10) * 10), second=0, microsecond=0)
+
+
+def main():
+    # ------ Receive UTC Time Data ------
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--timestamp', dest='timestamp', action='store', help='Timestamp in format YYYY-MM-DDTHH:MM')
+    parser.add_argument('--engine', dest='engine', action='store', choices=['thread', 'async'], default='thread',
+                        help='SPS query engine: thread (8 threads) or async')
+    args = parser.parse_args()
+
+    timestamp_utc = parse_timestamp(args.timestamp)
+    sps_df, target_capacity = collect_sps(timestamp_utc, args.engine)
+
+    s3_client = boto3.session.Session().client("s3", region_name="us-west-2")
+    start_time = datetime.now(timezone.utc)
+    # ------ Save Dataframe File ------
+    try:
+        s3_key = save_sps(s3_client, sps_df, timestamp_utc, target_capacity)
+
+        # Save S3 key to a file for the merge script
+        with open("/tmp/sps_key.txt", "w") as f:
+            f.write(s3_key)
+        print(f"SPS Key saved to /tmp/sps_key.txt: {s3_key}")
+
+    except Exception as e:
+        send_slack_message(e)
+        print(f"파일 저장 및 업로드 중 오류 발생: {e}")
+        raise e
+    end_time = datetime.now(timezone.utc)
+    print(f"Saving time of DF File is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
+
 if __name__ == "__main__":
     start_time = datetime.now(timezone.utc)
     main()
@@ -0,0 +1,144 @@
+import time
+import random
+import asyncio
+import functools
+import concurrent.futures
+import botocore.exceptions
+import pandas as pd
+
+from sps_query_api import IDX_INSTANCE_TYPE, IDX_REGION_NAMES, new_sps_dict, append_scores
+from sps_query_api import rotate_credentials, is_max_config_limit_exceeded
+
+DEFAULT_MAX_IN_FLIGHT = 128
+DEFAULT_PER_CREDENTIAL_CONCURRENCY = 1
+
+
+# RequestLimitExceeded 발생 시 모든 요청이 함께 대기하도록 공유하는 backoff 상태입니다.
+# 쓰로틀이 반복될수록 대기 시간이 지수적으로 늘어나고, 성공하면 단계가 줄어듭니다.
+class SharedBackoff:
+    def __init__(self, base_delay=1.0, max_delay=60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.level = 0
+        self.resume_at = 0.0
+
+    async def wait(self):
+        while True:
+            delay = self.resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def throttled(self):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** self.level)))
+        self.level = min(self.level + 1, 16)
+        self.resume_at = max(self.resume_at, time.monotonic() + delay)
+        return delay
+
+    def succeeded(self):
+        if self.level > 0:
+            self.level -= 1
+
+
+# asyncio 기반 SPS 쿼리 엔진입니다.
+# - 동시에 최대 max_in_flight개의 GetSpotPlacementScores 호출을 유지합니다.
+# - 한 credential(계정)에는 per_credential_concurrency개까지만 동시에 호출합니다.
+# - RequestLimitExceeded는 SharedBackoff로 전체 요청이 함께 대기합니다.
+# - 첫 수집 모드에서는 MaxConfigLimitExceeded가 발생한 묶음만 다음 credential로 넘어가며, 나머지 묶음은 계속 진행됩니다.
+# boto3 client 호출은 blocking이므로 max_in_flight 크기의 thread pool에서 실행합니다.
+# client_pool의 max_clients는 max_in_flight보다 커야 사용 중인 client가 evict되지 않습니다.
+class SpsAsyncEngine:
+    def __init__(self, client_pool, credentials, target_capacity, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 per_credential_concurrency=DEFAULT_PER_CREDENTIAL_CONCURRENCY, max_retries=10):
+        if client_pool.max_clients < max_in_flight:
+            raise ValueError("client_pool.max_clients must be at least max_in_flight")
+        self.client_pool = client_pool
+        self.credentials = credentials
+        self.target_capacity = target_capacity
+        self.max_in_flight = max_in_flight
+        self.per_credential_concurrency = per_credential_concurrency
+        self.max_retries = max_retries
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def _credential_semaphore(self, credential_index):
+        if credential_index not in self.credential_semaphores:
+            self.credential_semaphores[credential_index] = asyncio.Semaphore(self.per_credential_concurrency)
+        return self.credential_semaphores[credential_index]
+
+    async def _get_scores(self, ec2, credential_index, instance_type, region_names):
+        retries = 0
+        while True:
+            await self.backoff.wait()
+            async with self._credential_semaphore(credential_index):
+                try:
+                    response = await self._run(
+                        ec2.get_spot_placement_scores,
+                        InstanceTypes = [instance_type],
+                        RegionNames = region_names,
+                        SingleAvailabilityZone = True,
+                        TargetCapacity = self.target_capacity
+                    )
+                    self.backoff.succeeded()
+                    return response["SpotPlacementScores"]
+                except botocore.exceptions.ClientError as e:
+                    if e.response['Error']['Code'] != "RequestLimitExceeded" or retries >= self.max_retries:
+                        raise e
+            retries += 1
+            wait_time = self.backoff.throttled()
+            print(f"RequestLimitExceeded! {wait_time:.1f}초 후 재시도합니다.")
+
+    # 한 credential로 시나리오 묶음 하나를 조회합니다. query_sps와 같은 DataFrame을 반환합니다.
+    # 묶음 안의 시나리오는 순서대로 조회하므로, 동시에 진행되는 묶음 수가 곧 in-flight 호출 수입니다.
+    async def _query_chunk(self, credential_index, scenarios):
+        async with self.in_flight:
+            credential = self.credentials.iloc[credential_index]
+            ec2 = await self._run(self.client_pool.get, credential_index, credential)
+
+            sps_dict = new_sps_dict()
+            for scenario in scenarios:
+                instance_type = scenario[IDX_INSTANCE_TYPE]
+                scores = await self._get_scores(ec2, credential_index, instance_type, scenario[IDX_REGION_NAMES])
+                append_scores(sps_dict, instance_type, scores, self.target_capacity)
+            return pd.DataFrame(sps_dict)
+
+    # 첫 수집: 묶음마다 allocator에서 credential을 받고, MaxConfigLimitExceeded이면 다음 credential로 재시도합니다.
+    # 재시도 규칙은 thread pool 모드(query_with_credential_rotation)와 같은 rotate_credentials를 사용합니다.
+    async def _query_chunk_with_allocator(self, idx, scenarios, allocator):
+        for credential_index in rotate_credentials(idx, allocator):
+            try:
+                return idx, credential_index, await self._query_chunk(credential_index, scenarios)
+            except botocore.exceptions.ClientError as e:
+                if not is_max_config_limit_exceeded(e, credential_index):
+                    raise e
+
+    async def _gather(self, coroutines):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self.in_flight = asyncio.Semaphore(self.max_in_flight)
+        self.credential_semaphores = {}
+        self.backoff = SharedBackoff()
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # 첫 수집 모드: (df_list, {workload index: credential index}) 반환
+    async def run_first_collection(self, workload, allocator):
+        results = await self._gather(
+            self._query_chunk_with_allocator(idx, scenarios, allocator) for idx, scenarios in enumerate(workload)
+        )
+        mapping = {idx: credential_index for idx, credential_index, _ in results}
+        return [df for _, _, df in results], mapping
+
+    # 매핑 기반 모드: {workload index: credential index} 매핑대로 조회하여 df_list 반환
+    async def run_mapped(self, workload, mapping):
+        return await self._gather(
+            self._query_chunk(mapping[idx], scenarios) for idx, scenarios in enumerate(workload)
+        )
@@ -1,32 +1,16 @@
-import boto3
-import botocore
+import botocore.exceptions
 import time
+import threading
+import concurrent.futures
 import pandas as pd
 
 IDX_INSTANCE_TYPE = 0
 IDX_REGION_NAMES = 1
 IDX_NUMBER_RESPONSE = 2
 
-from utility.utils import get_region
-
-# SPS 점수를 계정별로 받아오는 함수입니다.
-# args는 다음과 같이 구성된 튜플이어야 합니다
-# (credential, scenarios, target_capacity)
-# credential은 dataframe의 행 형태로 주어져야 합니다.
-# scenarios는 쿼리 시나리오 50개 묶음이어야 합니다.
-def query_sps(args):
-    credential = args[0]
-    scenarios = args[1]
-    target_capacity = args[2]
-    region = get_region()
-    
-    session = boto3.session.Session(
-        aws_access_key_id = credential["AccessKeyId"],
-        aws_secret_access_key = credential["SecretAccessKey"]
-    )
-    ec2 = session.client('ec2', region_name = region)
-    
-    sps_dict = {
+# 쿼리 결과를 모으는 빈 dict를 생성합니다.
+def new_sps_dict():
+    return {
         "InstanceType" : [],
         "Region" : [],
         "AZ" : [],
@@ -35,7 +19,38 @@ def query_sps(args):
         "T3": [],
         "T2": []
     }
-    
+
+# get_spot_placement_scores 응답의 점수를 sps_dict에 추가합니다.
+def append_scores(sps_dict, instance_type, scores, target_capacity):
+    for score in scores:
+        sps_dict["InstanceType"].append(instance_type)
+        sps_dict["Region"].append(score["Region"])
+        sps_dict["AZ"].append(score['AvailabilityZoneId'])
+        sps_dict["SPS"].append(int(score["Score"]))
+        sps_dict["TargetCapacity"].append(target_capacity)
+
+        if score['Score'] >= 3:
+            sps_dict["T3"].append(target_capacity)
+        else:
+            sps_dict["T3"].append(0)
+
+        if score['Score'] == 2:
+            sps_dict["T2"].append(target_capacity)
+        else:
+            sps_dict["T2"].append(0)
+
+# SPS 점수를 계정별로 받아오는 함수입니다.
+# args는 다음과 같이 구성된 튜플이어야 합니다
+# (ec2, scenarios, target_capacity)
+# ec2는 해당 계정의 EC2 client로, CredentialClientPool.get()으로 얻습니다.
+# scenarios는 쿼리 시나리오 50개 묶음이어야 합니다.
+def query_sps(args):
+    ec2 = args[0]
+    scenarios = args[1]
+    target_capacity = args[2]
+
+    sps_dict = new_sps_dict()
+
     for scenario in scenarios:
         instance_type = scenario[IDX_INSTANCE_TYPE]
         region_names = scenario[IDX_REGION_NAMES]
@@ -61,22 +76,76 @@ def query_sps(args):
                     retries += 1
                 else:
                     raise e
-                
-        for score in scores:
-            sps_dict["InstanceType"].append(instance_type)
-            sps_dict["Region"].append(score["Region"])
-            sps_dict["AZ"].append(score['AvailabilityZoneId'])
-            sps_dict["SPS"].append(int(score["Score"]))
-            sps_dict["TargetCapacity"].append(target_capacity)
-            
-            if score['Score'] >= 3:
-                sps_dict["T3"].append(target_capacity)
-            else:
-                sps_dict["T3"].append(0)
-
-            if score['Score'] == 2:
-                sps_dict["T2"].append(target_capacity)
-            else:
-                sps_dict["T2"].append(0)
-    
+
+        append_scores(sps_dict, instance_type, scores, target_capacity)
+
     return pd.DataFrame(sps_dict)
+
+# credential index를 순서대로 할당하는 thread-safe 할당기입니다.
+# [init_index, end_index) 범위를 순환하며, 순차 실행 모드와 같은 순서로 index를 내어줍니다.
+class CredentialAllocator:
+    def __init__(self, init_index, start_index, end_index):
+        self.init_index = init_index
+        self.end_index = end_index
+        self.current = start_index
+        self.lock = threading.Lock()
+
+    # 다음 credential index를 할당합니다.
+    def next(self):
+        with self.lock:
+            index = self.current
+            self.current += 1
+            if self.current >= self.end_index:
+                self.current = self.init_index
+            return index
+
+    def size(self):
+        return self.end_index - self.init_index
+
+# 첫 수집에서 workload 묶음 idx 하나에 쓸 credential index를 allocator에서 차례로 내어줍니다.
+# allocator를 한 바퀴 돌 때까지 모든 credential이 MaxConfigLimitExceeded이면 예외를 발생시킵니다.
+# thread pool(query_with_credential_rotation)과 asyncio 엔진이 같은 재시도 규칙으로 함께 사용합니다.
+def rotate_credentials(idx, allocator):
+    for _ in range(allocator.size()):
+        yield allocator.next()
+    raise Exception(f"All credentials returned MaxConfigLimitExceeded for workload index {idx}")
+
+# MaxConfigLimitExceeded ClientError이면 True를 반환합니다. 이 경우 다음 credential로 재시도합니다.
+def is_max_config_limit_exceeded(e, credential_index):
+    if e.response['Error']['Code'] == 'MaxConfigLimitExceeded':
+        print(f"MaxConfigLimitExceeded for credential index {credential_index}. Retrying with next credential.")
+        return True
+    return False
+
+# 첫 수집에서 workload 묶음 idx 하나를 조회합니다.
+# rotate_credentials에서 credential을 받아 query(credential_index)를 호출하고, MaxConfigLimitExceeded이면 다음
+# credential로 재시도합니다. (query 결과, credential index)를 반환합니다.
+def query_with_credential_rotation(idx, allocator, query):
+    for credential_index in rotate_credentials(idx, allocator):
+        try:
+            return query(credential_index), credential_index
+        except botocore.exceptions.ClientError as e:
+            if not is_max_config_limit_exceeded(e, credential_index):
+                raise e
+
+# 첫 수집 시 workload 묶음마다 allocator에서 credential을 받아 병렬로 조회하고 매핑을 찾습니다.
+# query_func(credential_index, scenarios)는 DataFrame을 반환해야 하며,
+# MaxConfigLimitExceeded ClientError가 발생하면 해당 묶음만 새 credential로 재시도합니다 (query_with_credential_rotation).
+# 모든 묶음이 성공한 경우에만 (df_list, {workload index: credential index})를 반환합니다.
+def discover_credential_mapping(workload, allocator, query_func, max_workers=8):
+    def query_chunk(idx, scenarios):
+        return query_with_credential_rotation(idx, allocator, lambda credential_index: query_func(credential_index, scenarios))
+
+    results = [None] * len(workload)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        future_to_idx = {executor.submit(query_chunk, idx, scenarios): idx for idx, scenarios in enumerate(workload)}
+        for future in concurrent.futures.as_completed(future_to_idx):
+            results[future_to_idx[future]] = future.result()
+    except Exception:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+
+    mapping = {idx: credential_index for idx, (_, credential_index) in enumerate(results)}
+    return [df for df, _ in results], mapping
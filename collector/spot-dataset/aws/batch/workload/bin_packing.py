@@ -0,0 +1,186 @@
+# ------ import module ------
+import math
+import heapq
+
+# Items are (region, number of AZs) pairs and a bin is one SPS query, which accepts up to 10 AZs.
+# Weights are small integers, so bins are bucketed by remaining capacity and every item is placed in O(capacity).
+
+
+# lower bound of the number of bins: ceil(sum(weights) / capacity)
+def lower_bound(weights, capacity):
+    return math.ceil(sum(weights) / capacity)
+
+
+# first-fit decreasing / best-fit decreasing
+# return [(bin_items, bin_weight), ...] where bin_items are indices into weights
+def fit_decreasing(weights, capacity, best_fit=True):
+    for weight in weights:
+        if weight > capacity:
+            raise ValueError(f"item weight {weight} exceeds bin capacity {capacity}")
+
+    order = sorted(range(len(weights)), key=lambda i: weights[i], reverse=True)
+    bins = []
+    remaining = []
+    # open_bins[r] : heap of indices of bins whose remaining capacity is r
+    open_bins = [[] for _ in range(capacity + 1)]
+
+    for i in order:
+        weight = weights[i]
+        fitting = [r for r in range(weight, capacity + 1) if open_bins[r]]
+        if not fitting:
+            target = len(bins)
+            bins.append([])
+            remaining.append(capacity)
+        elif best_fit:
+            # tightest bin that still fits
+            target = heapq.heappop(open_bins[fitting[0]])
+        else:
+            # lowest-index bin that fits
+            r = min(fitting, key=lambda r: open_bins[r][0])
+            target = heapq.heappop(open_bins[r])
+
+        bins[target].append(i)
+        remaining[target] -= weight
+        if remaining[target] > 0:
+            heapq.heappush(open_bins[remaining[target]], target)
+
+    return [(items, capacity - remaining[b]) for b, items in enumerate(bins)]
+
+
+# exact bin packing for small integer weights
+# memoized search over the multiset of remaining weights; each bin holds the largest remaining item and is
+# filled with a maximal multiset of the others, so the state space is the product of (count + 1) per weight
+# return None when more than `max_states` states are visited or a weight is not positive
+def exact_bin_packing(weights, capacity, max_states=200000):
+    for weight in weights:
+        if weight > capacity:
+            raise ValueError(f"item weight {weight} exceeds bin capacity {capacity}")
+    if any(weight < 1 for weight in weights):
+        return None
+
+    memo = {}
+
+    def fillings(cap, max_weight, counts, chosen):
+        placed = False
+        for w in range(min(cap, max_weight), 0, -1):
+            if counts[w]:
+                placed = True
+                counts[w] -= 1
+                chosen.append(w)
+                yield from fillings(cap - w, w, counts, chosen)
+                chosen.pop()
+                counts[w] += 1
+        if not placed:
+            yield tuple(counts), tuple(chosen)
+
+    def best(counts):
+        if counts in memo:
+            return memo[counts][0]
+        if len(memo) >= max_states:
+            raise OverflowError
+        top = next((w for w in range(capacity, 0, -1) if counts[w]), 0)
+        if top == 0:
+            memo[counts] = (0, ())
+            return 0
+        rest = list(counts)
+        rest[top] -= 1
+        result = None
+        for next_counts, chosen in fillings(capacity - top, capacity, rest, [top]):
+            bins = 1 + best(next_counts)
+            if result is None or bins < result[0]:
+                result = (bins, chosen)
+        memo[counts] = result
+        return result[0]
+
+    counts = [0] * (capacity + 1)
+    for weight in weights:
+        counts[weight] += 1
+    try:
+        best(tuple(counts))
+    except OverflowError:
+        return None
+
+    # rebuild bins from the memoized choices and map weights back to item indices
+    items_by_weight = {}
+    for i, weight in enumerate(weights):
+        items_by_weight.setdefault(weight, []).append(i)
+    bin_index_list = []
+    state = tuple(counts)
+    while memo[state][1]:
+        chosen = memo[state][1]
+        bin_index_list.append(([items_by_weight[w].pop() for w in chosen], sum(chosen)))
+        next_counts = list(state)
+        for w in chosen:
+            next_counts[w] -= 1
+        state = tuple(next_counts)
+    return bin_index_list
+
+
+# bounded-time ILP over at most `max_bins` bins, None when OR-Tools is missing or no better solution is found
+def ilp_bin_packing(weights, capacity, max_bins, time_limit_sec, algorithm='CBC'):
+    try:
+        from ortools.linear_solver import pywraplp
+    except ImportError:
+        return None
+
+    solver = pywraplp.Solver.CreateSolver(algorithm)
+    if solver is None:
+        return None
+    solver.SetTimeLimit(int(time_limit_sec * 1000))
+
+    items = range(len(weights))
+    bins = range(max_bins)
+    x = {(i, j): solver.IntVar(0, 1, 'x_%i_%i' % (i, j)) for i in items for j in bins}
+    y = {j: solver.IntVar(0, 1, 'y[%i]' % j) for j in bins}
+
+    for i in items:
+        solver.Add(sum(x[i, j] for j in bins) == 1)
+    for j in bins:
+        solver.Add(sum(x[(i, j)] * weights[i] for i in items) <= y[j] * capacity)
+    # symmetry breaking: use bins in order
+    for j in range(1, max_bins):
+        solver.Add(y[j] <= y[j - 1])
+
+    solver.Minimize(solver.Sum([y[j] for j in bins]))
+    status = solver.Solve()
+    if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        return None
+
+    bin_index_list = []
+    for j in bins:
+        bin_items = [i for i in items if x[i, j].solution_value() > 0.5]
+        if bin_items:
+            bin_index_list.append((bin_items, sum(weights[i] for i in bin_items)))
+    return bin_index_list
+
+
+# pack weights into bins of `capacity`
+# algorithm : 'exact' (falls back to best-fit decreasing on large inputs), 'bfd' (best-fit decreasing) or 'ffd' (first-fit decreasing)
+# ilp_time_limit : seconds for an optional ILP refinement, only tried when the heuristic is above the lower bound
+# return (bin_index_list, report) where report has the bin count, the lower bound and the gap between them
+def pack(weights, capacity, algorithm='bfd', ilp_time_limit=0):
+    bin_index_list = None
+    if algorithm == 'exact':
+        bin_index_list = exact_bin_packing(weights, capacity)
+    exact = bin_index_list is not None
+    if bin_index_list is None:
+        bin_index_list = fit_decreasing(weights, capacity, best_fit=(algorithm != 'ffd'))
+    bound = lower_bound(weights, capacity)
+    refined = False
+
+    if ilp_time_limit and not exact and len(bin_index_list) > bound:
+        # search for a packing with at least one bin less than the heuristic
+        ilp_result = ilp_bin_packing(weights, capacity, len(bin_index_list) - 1, ilp_time_limit)
+        if ilp_result is not None and len(ilp_result) < len(bin_index_list):
+            bin_index_list = ilp_result
+            refined = True
+
+    report = {
+        'items': len(weights),
+        'bins': len(bin_index_list),
+        'lower_bound': bound,
+        'gap': len(bin_index_list) - bound,
+        'exact': exact,
+        'refined': refined,
+    }
+    return bin_index_list, report
@@ -1,92 +1,30 @@
-# reference
-# https://developers.google.com/optimization/bin/bin_packing
-
 # ------ import module ------
 import boto3
 import botocore
 import pickle
 import gzip
 from datetime import datetime, timezone, timedelta
-from ortools.linear_solver import pywraplp
 import io
 import argparse
 
 # ------ import user module ------
 from utility.slack_msg_sender import send_slack_message
-from load_metadata import num_az_by_region
-
-
-# create object of bin packing input data
-def create_data_model(weights, capacity):
-    data = {}
-    data['weights'] = weights
-    data['items'] = list(range(len(weights)))
-    data['bins'] = data['items']
-    data['bin_capacity'] = capacity
-    return data
-
-
-# run bin packing with algorithm name
-def bin_packing(weights, capacity, algorithm):
-    bin_index_list = []
-    data = create_data_model(weights, capacity)
-    solver = pywraplp.Solver.CreateSolver(algorithm)
-
-    x = {}
-    for i in data['items']:
-        for j in data['bins']:
-            x[(i, j)] = solver.IntVar(0, 1, 'x_%i_%i' % (i, j))
-
-    y = {}
-    for j in data['bins']:
-        y[j] = solver.IntVar(0, 1, 'y[%i]' % j)
-
-    for i in data['items']:
-        solver.Add(sum(x[i, j] for j in data['bins']) == 1)
-
-    for j in data['bins']:
-        solver.Add(
-            sum(x[(i, j)] * data['weights'][i] for i in data['items']) <= y[j] *
-            data['bin_capacity'])
-
-    solver.Minimize(solver.Sum([y[j] for j in data['bins']]))
-    status = solver.Solve()
-    if status == pywraplp.Solver.OPTIMAL:
-        for j in data['bins']:
-            if y[j].solution_value() == 1:
-                bin_items = []
-                bin_weight = 0
-                for i in data['items']:
-                    if x[i, j].solution_value() > 0:
-                        bin_items.append(i)
-                        bin_weight += data['weights'][i]
-                if bin_weight > 0:
-                    bin_index_list.append((bin_items, bin_weight))
-        return bin_index_list
-    else:
-        send_slack_message("The problem does not have an optimal solution.")
-        print('The problem does not have an optimal solution.')
+from load_metadata import cached_num_az_by_region
+from workload_planner import plan_workload
 
-
-# run bin packing algorithm to instance-region workloads
-def workload_bin_packing(query, capacity, algorithm):
-    weights = [weight for instance, weight in query]
-    bin_index_list = bin_packing(weights, 10, algorithm)
-    
-    binpacked = []
-    
-    for bin_index, bin_weight in bin_index_list:
-        binpacked.append([(query[x][0], query[x][1]) for x in bin_index])
-    
-    return binpacked
+METADATA_CACHE_KEY = "rawdata/aws/workloads/cache/num_az_by_region.pkl"
+METADATA_CACHE_TTL_SEC = 12 * 60 * 60
 
 
-def get_binpacked_workload(filedate):
+def get_binpacked_workload(filedate, algorithm='exact', ilp_time_limit=0, metadata_ttl=METADATA_CACHE_TTL_SEC):
     s3_client = boto3.client('s3')
     s3_resource = boto3.resource('s3')
     
     print("Collecting metadata (num_az_by_region)...")
-    workloads = num_az_by_region()
+    start_time = datetime.now(timezone.utc)
+    workloads = cached_num_az_by_region(s3_client, "spotlake", METADATA_CACHE_KEY, metadata_ttl)
+    end_time = datetime.now(timezone.utc)
+    print(f"Metadata time is {(end_time - start_time).total_seconds():.2f} sec")
 
     start_time = datetime.now(timezone.utc)
     # Upload raw workloads to monitoring path
@@ -103,27 +41,15 @@ def get_binpacked_workload(filedate):
     print(f"Upload time used for monitoring is {(end_time - start_time).total_seconds() * 1000 / 60000:.2f} min")
 
     print("Starting bin packing...")
-    result_binpacked = {}
-    
-    for instance, query in workloads.items():
-        result_binpacked[instance] = workload_bin_packing(query, 10, 'CBC')
-    
-    user_queries_list = []
-    user_queries = []
-    for instance, queries in result_binpacked.items():
-        for query in queries:
-            new_query = [instance, [], 0]
-            for tup in query:
-                new_query[1].append(tup[0])
-                new_query[2] += tup[1]
-            user_queries.append(new_query)
-            if len(user_queries) == 50:
-                user_queries_list.append(user_queries)
-                user_queries = []
-
-    if len(user_queries) != 0:
-        user_queries_list.append(user_queries)
-    
+    start_time = datetime.now(timezone.utc)
+    user_queries_list, stats = plan_workload(workloads, algorithm, ilp_time_limit)
+
+    end_time = datetime.now(timezone.utc)
+    print(f"Bin packing ({algorithm}) time is {(end_time - start_time).total_seconds():.2f} sec")
+    print(f"Bin packing report : {stats['queries']} queries on {stats['credentials']} credentials, "
+          f"AZ fill ratio {stats['fill_ratio']:.4f}, lower bound {stats['lower_bound']}, gap {stats['gap']} "
+          f"({stats['gap_instance_types']} of {stats['instance_types']} instance types above the lower bound)")
+
     start_time = datetime.now(timezone.utc)
     try:
         buffer = io.BytesIO()
@@ -158,6 +84,12 @@ def main():
     # ------ Parse Arguments ------
     parser = argparse.ArgumentParser()
     parser.add_argument('--timestamp', dest='timestamp', action='store', help='Timestamp in format YYYY-MM-DDTHH:MM')
+    parser.add_argument('--packer', dest='packer', action='store', choices=['exact', 'bfd', 'ffd'], default='exact',
+                        help='bin packing algorithm: exact (best-fit decreasing on oversized instance types), best-fit decreasing or first-fit decreasing')
+    parser.add_argument('--ilp_time_limit', dest='ilp_time_limit', action='store', type=float, default=0,
+                        help='seconds of OR-Tools ILP refinement per instance type left above the lower bound by bfd/ffd (0 disables)')
+    parser.add_argument('--metadata_ttl', dest='metadata_ttl', action='store', type=float, default=METADATA_CACHE_TTL_SEC,
+                        help='seconds to reuse the cached region/AZ offerings in S3 (0 always crawls every region)')
     args = parser.parse_args()
 
     # ------ Set time data ------
@@ -184,7 +116,7 @@ def main():
     
     # ------ Collect Spot Price ------
     try:
-        workload = get_binpacked_workload(S3_DIR_NAME)
+        workload = get_binpacked_workload(S3_DIR_NAME, args.packer, args.ilp_time_limit, args.metadata_ttl)
     except botocore.exceptions.ClientError as e:
         send_slack_message(e)
         print(e)
@@ -1,5 +1,10 @@
 import boto3
+import pickle
+import concurrent.futures
 from collections import Counter
+from datetime import datetime, timezone
+
+DEFAULT_MAX_WORKERS = 16
 
 
 # get all available regions
@@ -12,42 +17,58 @@ def get_regions(session: boto3.session.Session, region='us-east-1') -> list:
 
 
 # get instance-az information by region
-def get_region_instances(session: boto3.session.Session, region: str):
-    client = session.client('ec2', region_name=region)
-    describe_args = {
-        'LocationType': 'availability-zone',
-    }
+# `client` is an EC2 client of `region`; one (region, instance type) pair is returned per AZ offering
+def get_region_instances(client, region: str):
+    paginator = client.get_paginator('describe_instance_type_offerings')
     region_instances = []
-    while True:
-        response = client.describe_instance_type_offerings(**describe_args)
+    for response in paginator.paginate(LocationType='availability-zone'):
         for obj in response['InstanceTypeOfferings']:
-            it, _, az = obj.values()
-            region_instances.append((region, it))
-        if 'NextToken' not in response:
-            break
-        describe_args['NextToken'] = response['NextToken']
-    
+            region_instances.append((region, obj['InstanceType']))
+
     return region_instances
 
 
 # calculate number of az by region
 # first, get region information using get_regions
-# second, get az information by region using get_region_instances
-def num_az_by_region():
+# second, get az information of every region in parallel using get_region_instances
+# regions are merged into one counter in get_regions order, so the result is the same as a serial crawl
+def num_az_by_region(max_workers=DEFAULT_MAX_WORKERS):
     session = boto3.session.Session()
-    
+
     regions = get_regions(session)
-    
+    # boto3 sessions are not thread-safe, so clients are created here and only used in the workers
+    clients = [session.client('ec2', region_name=region) for region in regions]
+
     total_counter = Counter()
-    for idx, region in enumerate(regions):
-        region_counter = Counter(get_region_instances(session, region))
-        total_counter += region_counter
-    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for region_instances in executor.map(get_region_instances, clients, regions):
+            total_counter.update(region_instances)
+
     workloads = dict()
     for key, cnt in total_counter.items():
         region, it = key
         if it not in workloads:
             workloads[it] = []
         workloads[it].append((region, cnt))
-    
+
+    return workloads
+
+
+# num_az_by_region with a pickle cache in S3
+# the cached result is reused while it is younger than `ttl_sec`, so a re-run within the TTL does not crawl every region
+# ttl_sec <= 0 disables the cache
+def cached_num_az_by_region(s3_client, bucket, key, ttl_sec, max_workers=DEFAULT_MAX_WORKERS):
+    if ttl_sec > 0:
+        try:
+            response = s3_client.get_object(Bucket=bucket, Key=key)
+            age = (datetime.now(timezone.utc) - response['LastModified']).total_seconds()
+            if age < ttl_sec:
+                print(f"Using cached metadata s3://{bucket}/{key} ({age / 60:.1f} min old)")
+                return pickle.loads(response['Body'].read())
+        except s3_client.exceptions.NoSuchKey:
+            pass
+
+    workloads = num_az_by_region(max_workers)
+    if ttl_sec > 0:
+        s3_client.put_object(Bucket=bucket, Key=key, Body=pickle.dumps(workloads))
     return workloads
@@ -0,0 +1,56 @@
+# ------ import module ------
+import math
+
+# ------ import user module ------
+from bin_packing import pack
+
+# One SPS query (GetSpotPlacementScores) covers a single instance type and up to 10 regions, and returns one score per AZ
+# of those regions. Scores are computed for the requested instance types as one fleet, so two instance types can never
+# share a query: the minimum number of queries for a cycle is the sum of the per-instance-type packing optima.
+# Queries are then laid out back to back in chunks of `queries_per_credential` (one chunk per credential), so only the
+# last chunk of the whole cycle can be partially filled.
+
+QUERY_AZ_CAPACITY = 10
+QUERY_REGION_LIMIT = 10
+QUERIES_PER_CREDENTIAL = 50
+
+
+# plan the SPS queries of one collection cycle
+# workloads : {instance type: [(region, number of AZs), ...]} from load_metadata.num_az_by_region()
+# return (user_queries_list, stats)
+#   user_queries_list : [[[instance type, [regions], total AZs], ...], ...], one inner list per credential
+#   stats : number of queries, credentials, AZ fill ratio and the gap to the lower bound
+def plan_workload(workloads, algorithm='exact', ilp_time_limit=0, capacity=QUERY_AZ_CAPACITY,
+                  region_limit=QUERY_REGION_LIMIT, queries_per_credential=QUERIES_PER_CREDENTIAL):
+    queries = []
+    total_az = 0
+    total_lower_bound = 0
+    gap_instances = []
+
+    for instance, query in workloads.items():
+        weights = [num_az for region, num_az in query]
+        bin_index_list, report = pack(weights, capacity, algorithm, ilp_time_limit)
+        total_az += sum(weights)
+        total_lower_bound += report['lower_bound']
+        if report['gap'] > 0:
+            gap_instances.append(instance)
+
+        for bin_index, bin_weight in bin_index_list:
+            regions = [query[x][0] for x in bin_index]
+            if len(regions) > region_limit:
+                raise ValueError(f"{instance} query has {len(regions)} regions, over the limit of {region_limit}")
+            queries.append([instance, regions, bin_weight])
+
+    user_queries_list = [queries[i:i + queries_per_credential] for i in range(0, len(queries), queries_per_credential)]
+
+    stats = {
+        'instance_types': len(workloads),
+        'queries': len(queries),
+        'credentials': len(user_queries_list),
+        'lower_bound': total_lower_bound,
+        'gap': len(queries) - total_lower_bound,
+        'gap_instance_types': len(gap_instances),
+        'fill_ratio': total_az / (len(queries) * capacity) if queries else 0.0,
+        'credential_lower_bound': math.ceil(total_lower_bound / queries_per_credential),
+    }
+    return user_queries_list, stats
@@ -10,7 +10,8 @@ from io import StringIO
 # memo: change the path
 sys.path.append("/home/ubuntu/spotlake/utility")
 from slack_msg_sender import send_slack_message
-from sps_query_api import query_sps
+from client_pool import CredentialClientPool
+from sps_query_api import query_sps, get_region
 
 # ------ S3 File Helper Functions ------
 def read_metadata(s3_client, bucket_name, s3_key, local_fallback_path=None, default_value=None):
@@ -193,12 +194,16 @@ def main():
     start_time = datetime.now(timezone.utc)
     start_credential_index = current_credential_index
 
+    # EC2 clients are cached per credential, region is resolved once
+    client_pool = CredentialClientPool('ec2', region_name=get_region())
+
     try:
         df_list = []
         for scenarios in workload:
             while True:
                 try:
-                    args = (credentials.iloc[current_credential_index], scenarios, target_capacity)
+                    ec2 = client_pool.get(current_credential_index, credentials.iloc[current_credential_index])
+                    args = (ec2, scenarios, target_capacity)
                     current_credential_index += 1
                     df = query_sps(args)
                     df_list.append(df)
@@ -2,12 +2,11 @@
 from datetime import datetime, timezone
 import boto3
 import os, pickle, gzip
-import subprocess
-import pandas as pd
 import io
 
 # ------ import user module ------
 from slack_msg_sender import send_slack_message
+from spot_advisor import load_spot_advisor
 
 def main():
     # ------ Set time data ------
@@ -16,34 +15,14 @@ def main():
     S3_DIR_NAME = timestamp.strftime('%Y/%m/%d')
     S3_OBJECT_PREFIX = timestamp.strftime('%H-%M')
 
+    s3 = boto3.client('s3')
     try:
-        # ------ Load Spot Info System ------
-        EXECUTABLE_PATH = "/opt/spotinfo"
-
-        command = [f"{EXECUTABLE_PATH} --output csv --region all"]
-
-        # ------ Execute a Command ------
-        result = subprocess.Popen(command[0].split(' '), stdout=subprocess.PIPE)
-        stdout, _ = result.communicate()
-
         # ------ Collect Spot IF ------
-        spotinfo_string = stdout.decode('utf-8')
-        spotinfo_list = [row.split(',') for row in spotinfo_string.split('\n')]
-
-        spotinfo_dict = {'Region' : [],
-                        'InstanceType' : [],
-                        'IF' : []}
-        
-        # remove column name from data using indexing
-        for spotinfo in spotinfo_list[2:-1]:
-            spotinfo_dict['Region'].append(spotinfo[0])
-            spotinfo_dict['InstanceType'].append(spotinfo[1])
-            spotinfo_dict['IF'].append(spotinfo[5])
-        
-        spotinfo_df = pd.DataFrame(spotinfo_dict)
-
-        frequency_map = {'<5%': 3.0, '5-10%': 2.5, '10-15%': 2.0, '15-20%': 1.5, '>20%': 1.0}
-        spotinfo_df = spotinfo_df.replace({'IF': frequency_map})
+        # the spot advisor feed is downloaded only when it changed since the copy cached in S3
+        cache_key = f"{os.environ.get('PARENT_PATH')}/spot_if/cache/spot-advisor-data.json"
+        spotinfo_df, changed = load_spot_advisor(s3, os.environ.get('S3_BUCKET'), cache_key)
+        if not changed:
+            print("Spot advisor data is not modified, using the cached copy")
     except Exception as e:
         send_slack_message(f"Error during spot if collection\n{e}")
     end_time = datetime.now(timezone.utc)
@@ -63,7 +42,6 @@ def main():
     except Exception as e:
         send_slack_message(f"Store spot if data to be stored in the cloud in memory\n{e}")
 
-    s3 = boto3.client('s3')
     try:
         s3.upload_fileobj(compressed_buffer, os.environ.get('S3_BUCKET'), f"{os.environ.get('PARENT_PATH')}/spot_if/{S3_DIR_NAME}/{S3_OBJECT_PREFIX}_spot_if.pkl.gz")
     except Exception as e:
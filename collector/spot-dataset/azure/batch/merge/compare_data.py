@@ -1,5 +1,6 @@
 import pandas as pd
-import numpy as np
+
+from utility.max_instance import SCORE_DTYPE, COUNT_DTYPE, align_previous, take_previous, int_values, max_instance_values
 
 # compare previous collected workload with current collected workload
 # return changed workload
@@ -65,60 +66,40 @@ def compare_sps(previous_df, current_df, workload_cols, feature_cols):
 
     return changed_df if not changed_df.empty else pd.DataFrame(columns=current_df.columns)
 
+# previous state는 merge 대신 정수 key code로 정렬하고, T3/T2는 int8/int16 배열로 계산합니다 (utility/max_instance.py)
 def compare_max_instance(previous_df, new_df, target_capacity):
-    fallback_dict = {50:45, 45:40, 40:35, 35:30, 30:25, 25:20, 20:15, 15:10, 10:5, 5:1, 1:0}
-    fallback_val = fallback_dict.get(target_capacity, 0)
-    
     # Ensure T2/T3 columns exist in previous_df for legacy compatibility
     for col in ["T2", "T3"]:
         if col not in previous_df.columns:
             previous_df[col] = 0
 
-    merged_df = pd.merge(
-        new_df,
-        previous_df[["InstanceType", "Region", "AvailabilityZone", "DesiredCount", "Score", "T3", "T2"]],
-        on=["InstanceType", "Region", "AvailabilityZone", "DesiredCount"],
-        how="left",
-        suffixes=("", "_prev")
+    current_positions, previous_positions = align_previous(
+        previous_df, new_df, ["InstanceType", "Region", "AvailabilityZone", "DesiredCount"]
     )
+    if len(current_positions) == len(new_df):
+        merged_df = new_df.reset_index(drop=True)
+    else:
+        # previous_df에 중복된 key가 있으면 left merge와 같이 new_df의 행을 반복합니다
+        merged_df = new_df.take(current_positions).reset_index(drop=True)
 
-    if target_capacity == 1:
-        merged_df["Score"] = merged_df["Score"].combine_first(merged_df["Score_prev"])
-    
-    merged_df["Score"] = pd.to_numeric(merged_df["Score"], errors='coerce').fillna(-1)
-    merged_df["Score_prev"] = pd.to_numeric(merged_df["Score_prev"], errors='coerce').fillna(-1)
-    merged_df["T3"] = pd.to_numeric(merged_df["T3"], errors='coerce').fillna(0)
-    merged_df["T3_prev"] = pd.to_numeric(merged_df["T3_prev"], errors='coerce').fillna(0)
-    merged_df["T2"] = pd.to_numeric(merged_df["T2"], errors='coerce').fillna(0)
-    merged_df["T2_prev"] = pd.to_numeric(merged_df["T2_prev"], errors='coerce').fillna(0)
-
-    merged_df.loc[(merged_df["Score"] > merged_df["Score_prev"]), "Score_prev"] = merged_df["Score"]
-
-    merged_df["T3"] = np.where(
-        merged_df["Score"] >= 3,
-        np.maximum(merged_df["T3"], merged_df["T3_prev"]),
-        np.minimum(fallback_val, merged_df["T3_prev"])
-    )
+    score_prev = take_previous(int_values(previous_df["Score"], SCORE_DTYPE, -1), previous_positions, -1)
+    t3_prev = take_previous(int_values(previous_df["T3"], COUNT_DTYPE, 0), previous_positions, 0)
+    t2_prev = take_previous(int_values(previous_df["T2"], COUNT_DTYPE, 0), previous_positions, 0)
 
-    merged_df["T2"] = np.where(
-        merged_df["Score"] >= 2,
-        np.maximum(merged_df["T2"], merged_df["T2_prev"]),
-        np.minimum(fallback_val, merged_df["T2_prev"])
-    )
-    
+    score = int_values(merged_df["Score"], SCORE_DTYPE, -1)
     if target_capacity == 1:
-        merged_df.loc[merged_df["Score"] <= 2, "T3"] = 0
-        merged_df.loc[merged_df["Score"] < 2, "T2"] = 0
-    else:
-        merged_df.loc[merged_df["Score_prev"] <= 2, "T3"] = 0
-        merged_df.loc[merged_df["Score_prev"] < 2, "T2"] = 0
-        merged_df["Score"] = merged_df["Score_prev"].fillna(merged_df["Score"])
-
-    for col in ["T2", "T3"]:
-        merged_df[col] = merged_df[col].astype(int)
-    
-    merged_df["Score"] = pd.to_numeric(merged_df["Score"], errors='coerce').astype("Int64")
+        missing = merged_df["Score"].isna().to_numpy()
+        score[missing] = score_prev[missing]
+
+    score, t3, t2 = max_instance_values(
+        score, score_prev,
+        int_values(merged_df["T3"], COUNT_DTYPE, 0), t3_prev,
+        int_values(merged_df["T2"], COUNT_DTYPE, 0), t2_prev,
+        target_capacity
+    )
 
-    merged_df.drop(columns=["T3_prev", "T2_prev", "Score_prev"], errors='ignore', inplace=True)
+    merged_df["T3"] = t3.astype(int)
+    merged_df["T2"] = t2.astype(int)
+    merged_df["Score"] = pd.array(score, dtype="Int64")
 
     return merged_df
@@ -12,6 +12,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.common import CW, S3, TimestreamWrite, Logger
 from utils.constants import AZURE_CONST, STORAGE_CONST
+from utils.slack_msg_sender import send_slack_message
+from utility.timestream_records import iter_record_batches, AZURE_RECORD_SPEC
+from utility.timestream_writer import TimestreamBatchWriter, table_records_per_second
 
 session = boto3.session.Session(region_name='us-west-2')
 
@@ -119,30 +122,6 @@ def query_selector(data):
         print(f"query_selector failed. error: {e}")
         return False
 
-# Submit Batch To Timestream
-def submit_batch(records, counter, recursive):
-    try:
-        common_attrs = {'MeasureName': 'azure_values','MeasureValueType': 'MULTI'}
-        TimestreamWrite.write_records(
-            records=records,
-            common_attrs=common_attrs,
-            database_name=STORAGE_CONST.DATABASE_NAME,
-            table_name=STORAGE_CONST.TABLE_NAME
-        )
-
-    except TimestreamWrite.client.exceptions.RejectedRecordsException as err:
-        print(f"RejectedRecords Details: {err.response['RejectedRecords']}")
-        re_records = []
-        for rr in err.response["RejectedRecords"]:
-            re_records.append(records[rr["RecordIndex"]])
-        if recursive == 10:
-            raise
-        else:
-            submit_batch(re_records, counter, recursive + 1)
-    except Exception as err:
-        raise
-
-
 # Check Database And Table Are Exist and Upload Data to Timestream
 def upload_timestream(data, time_datetime):
     Logger.info("Executing upload_timestream!")
@@ -170,66 +149,19 @@ def upload_timestream(data, time_datetime):
 
         time_value = str(int(round(time_datetime.timestamp() * 1000)))
 
-        # Prepare all records first
-        all_records = []
-        for idx, row in data.iterrows():
-            dimensions = []
-            for column in ['InstanceTier', 'InstanceType', 'Region', 'AvailabilityZone']:
-                dimensions.append({'Name': column, 'Value': str(row[column])})
-
-            submit_data = {
-                'Dimensions': dimensions,
-                'MeasureValues': [],
-                'Time': time_value,
-                'Version': int(time.time() * 1000)
-            }
-
-            measure_columns = [
-                ('DesiredCount', 'DOUBLE'),
-                ('OndemandPrice', 'DOUBLE'),
-                ('SpotPrice', 'DOUBLE'),
-                ('IF', 'DOUBLE'),
-                ('Score', 'VARCHAR'),
-                ('Time', 'VARCHAR'),
-                ('T2', 'DOUBLE'),
-                ('T3', 'DOUBLE')
-            ]
+        # Records are built column-wise; one Version per upload run
+        writer = TimestreamBatchWriter(
+            TimestreamWrite.client,
+            STORAGE_CONST.DATABASE_NAME,
+            STORAGE_CONST.TABLE_NAME,
+            common_attributes={'MeasureName': 'azure_values', 'MeasureValueType': 'MULTI'},
+            records_per_second=table_records_per_second(STORAGE_CONST.TABLE_NAME, STORAGE_CONST.TABLE_RECORDS_PER_SECOND),
+            notify=send_slack_message
+        )
+        writer.write(iter_record_batches(data, AZURE_RECORD_SPEC, time_value, fields={'Version': int(time.time() * 1000)}))
+        report = writer.close()
 
-            for column, value_type in measure_columns:
-                submit_data['MeasureValues'].append({
-                    'Name': column,
-                    'Value': str(row[column]),
-                    'Type': value_type
-                })
-
-            all_records.append(submit_data)
-
-        # Split into batches of 100
-        all_batches = []
-        batch = []
-        for record in all_records:
-            batch.append(record)
-            if len(batch) == 100:
-                all_batches.append(batch)
-                batch = []
-        
-        if batch:  # Add remaining records
-            all_batches.append(batch)
-        
-        Logger.info(f"Uploading {len(all_records)} records in {len(all_batches)} batches using 10 threads")
-        
-        # Submit batches in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(submit_batch, batch, i, 0) for i, batch in enumerate(all_batches)]
-            
-            # Wait for all to complete and check for errors
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    Logger.error(f"Error submitting batch: {e}")
-                    # Continue with other batches even if one fails
-        
+        Logger.info(f"Uploaded {report.get('records_written', 0)} of {len(data)} records in {report.get('batches', 0)} batches")
         Logger.info("Timestream upload completed")
         return True
 
@@ -47,7 +47,7 @@ echo "Starting SpotLake Azure Data Collection for timestamp: $TIMESTAMP"
 
 # Run collection scripts in parallel
 echo "Starting SPS Collection..."
-python3 collector/spot-dataset/azure/batch/sps/collect_sps.py --timestamp "$TIMESTAMP" &
+python3 collector/spot-dataset/azure/batch/sps/collect_sps.py --timestamp "$TIMESTAMP" --engine "${SPS_ENGINE:-thread}" &
 PID_SPS=$!
 
 echo "Starting IF Collection..."
@@ -13,6 +13,7 @@ import load_sps
 from utils.common import S3, Logger
 from utils.constants import AZURE_CONST
 from utils.slack_msg_sender import send_slack_message
+from utility.s3_stream import S3StreamWriter
 
 SPS_METADATA_S3_KEY = f"{AZURE_CONST.S3_RAW_DATA_PATH}/localfile/sps_metadata.yaml"
 DESIRED_COUNTS = [1, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50]
@@ -38,7 +39,16 @@ def write_metadata(metadata):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--timestamp', dest='timestamp', action='store')
+    parser.add_argument('--http2', dest='http2', action='store_true',
+                        help='call the SPS API over HTTP/2 (requires the httpx and h2 packages)')
+    parser.add_argument('--engine', dest='engine', action='store', choices=['thread', 'async'], default='thread',
+                        help='SPS query engine: thread (len(locations) * 2 threads) or async (adaptive concurrency)')
+    parser.add_argument('--endpoint', dest='endpoint', action='store', default=load_sps.SS_Resources.management_endpoint,
+                        help='Azure Resource Manager endpoint of the SPS API (e.g. a local fake ARM server)')
     args = parser.parse_args()
+    load_sps.SS_Resources.http2 = args.http2
+    load_sps.SS_Resources.sps_engine = args.engine
+    load_sps.SS_Resources.management_endpoint = args.endpoint.rstrip('/')
 
     if args.timestamp:
         if args.timestamp.endswith('Z'):
@@ -135,20 +145,15 @@ def main():
         
         Logger.info(f"Saving to S3: {s3_key}")
         
-        local_path = f"/tmp/sps_data.pkl.gz"
-        sps_df.to_pickle(local_path, compression='gzip')
-        
         s3_client = boto3.client('s3')
-        with open(local_path, 'rb') as f:
-            s3_client.upload_fileobj(f, BUCKET_NAME, s3_key)
+        with S3StreamWriter(s3_client, BUCKET_NAME, s3_key) as f:
+            sps_df.to_pickle(f, compression='gzip')
             
         print(f"Uploaded SPS data to S3: {s3_key}")
         
         # Write S3 Key to /tmp/sps_key.txt for downstream processing
         with open("/tmp/sps_key.txt", "w") as f:
             f.write(s3_key)
-            
-        os.remove(local_path)
 
     except Exception as e:
         send_slack_message(f"Error in collect_sps.py: {e}")
@@ -1,5 +1,6 @@
 import re
 import random
+import asyncio
 import requests
 import traceback
 import time
@@ -17,6 +18,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from price import collect_price as load_price
 from sps_module import sps_location_manager
 from sps_module import sps_shared_resources
+from sps_module import sps_http_client
+from sps_module import sps_async_engine
+from sps_module import sps_request_planner
 from sps_module import sps_prepare_parameters
 from utils.azure_auth import get_sps_token_and_subscriptions
 from utils.common import S3, Logger
@@ -98,7 +102,7 @@ def collect_spot_placement_score_first_time(desired_counts):
 
         start_time = time.time()
         regions_and_instance_types_filtered_df = sps_prepare_parameters.filter_invalid_parameter(regions_and_instance_types_df)
-        df_greedy_clustering_filtered_df = sps_prepare_parameters.greedy_clustering_to_create_optimized_request_list(regions_and_instance_types_filtered_df)
+        df_greedy_clustering_filtered_df = sps_prepare_parameters.lazy_greedy_to_create_optimized_request_list(regions_and_instance_types_filtered_df)
 
         S3.upload_file(df_greedy_clustering_filtered_df, f"{AZURE_CONST.S3_DF_TO_USE_TODAY_PKL_FILENAME}", "pkl")
 
@@ -163,49 +167,36 @@ def collect_spot_placement_score(desired_counts, instance_types=None):
 
 
 def execute_spot_placement_score_task_by_parameter_pool_df(api_calls_df, desired_counts):
-    Logger.info(f"Executing: execute_spot_placement_score_task_by_parameter_pool_df. desired_counts={desired_counts}, availability_zones={availability_zones}")
-    results = []
+    Logger.info(f"Executing: execute_spot_placement_score_task_by_parameter_pool_df. desired_counts={desired_counts}, availability_zones={availability_zones}, engine={SS_Resources.sps_engine}")
     locations = list(SS_Resources.locations_call_history_tmp[list(SS_Resources.locations_call_history_tmp.keys())[0]].keys())
+    plan = plan_spot_placement_score_calls(api_calls_df, desired_counts)
+    if SS_Resources.sps_engine == "async":
+        return sps_results_to_df(execute_spot_placement_score_task_async(plan, locations))
+
+    results = []
+    collected = []
     no_available_locations_flag = False
+    max_workers = int(len(locations) * 2)
+    # one keep-alive connection per worker thread
+    sps_http_client.configure_http_client(max_workers)
 
-    with ThreadPoolExecutor(max_workers=int(len(locations) * 2)) as executor:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = []
-        future_to_desired_count = {}
 
-        for row in api_calls_df.itertuples(index=False):
-            for desired_count in desired_counts:
-                future = executor.submit(
-                    execute_spot_placement_score_api,
-                    row.Regions, row.InstanceTypes, desired_count, max_retries=50
-                )
-                futures.append(future)
-                future_to_desired_count[future] = desired_count
+        for call in plan.calls:
+            future = executor.submit(
+                execute_spot_placement_score_api,
+                call.regions, call.instance_types, call.desired_count, max_retries=50
+            )
+            futures.append(future)
 
         try:
-            for future in futures:
+            for index, future in enumerate(futures):
                 try:
                     result = future.result()
-                    desired_count = future_to_desired_count[future]
                     if result and result != "NO_AVAILABLE_LOCATIONS":
-                        for score in result["placementScores"]:
-                            score_data = {
-                                "DesiredCount": desired_count,
-                                "RegionCodeSPS": score.get("region"),
-                                "Region": SS_Resources.region_map_and_instance_map_tmp['region_map'].get(
-                                    score.get("region", ""), ""),
-                                "InstanceTypeSPS": score.get("sku"),
-                                "InstanceTier": SS_Resources.region_map_and_instance_map_tmp['instance_map'].get(
-                                    score.get("sku", ""), {}).get("InstanceTier"),
-                                "InstanceType": SS_Resources.region_map_and_instance_map_tmp['instance_map'].get(
-                                    score.get("sku", ""), {}).get("InstanceTypeOld"),
-                                "Score": map_score_to_int(score.get("score")),
-                                "T3": desired_count if map_score_to_int(score.get("score")) == 3 else 0,
-                                "T2": desired_count if map_score_to_int(score.get("score")) >= 2 else 0
-                            }
-                            if availability_zones is True:
-                                score_data["AvailabilityZone"] = score.get("availabilityZone", "Single")
-
-                            results.append(score_data)
+                        results.extend(sps_result_rows(result, plan.calls[index]))
+                        collected.append(index)
 
                     elif result == "NO_AVAILABLE_LOCATIONS":
                         no_available_locations_flag = True
@@ -223,13 +214,99 @@ def execute_spot_placement_score_task_by_parameter_pool_df(api_calls_df, desired
                     print(traceback.format_exc())
                     raise
         finally:
-            save_tmp_files_to_s3()
-            if no_available_locations_flag:
-                current_utc_time = datetime.now(timezone.utc).strftime("%Y_%m_%dT%H_%M_%S")
-                S3.upload_file(SS_Resources.locations_call_history_tmp,
-                               f"{AZURE_CONST.ERROR_LOCATIONS_CALL_HISTORY_JSON_PATH}/{current_utc_time}.json", "json")
-                print("No available locations found. Cancelling remaining tasks. ")
+            update_last_collected(plan, collected)
+            save_task_state_to_s3(no_available_locations_flag)
+
+    return sps_results_to_df(results)
+
+
+# pack the (row, desired count) requests into calls and keep the ones the location quota can take, stalest first
+# (sps_module/sps_request_planner.py)
+def plan_spot_placement_score_calls(api_calls_df, desired_counts):
+    plan = sps_request_planner.plan_sps_calls(
+        zip(api_calls_df["Regions"], api_calls_df["InstanceTypes"]),
+        desired_counts,
+        SS_Resources.location_scheduler.remaining_calls(),
+        SS_Resources.sps_last_collected_tmp,
+    )
+    if plan.covers_full_sweep():
+        Logger.info(plan.report())
+    else:
+        Logger.warning(plan.report())
+    return plan
 
+
+def update_last_collected(plan, collected):
+    SS_Resources.sps_last_collected_tmp = plan.last_collected_after(
+        SS_Resources.sps_last_collected_tmp, collected, SL_Manager.utc_now().isoformat())
+
+
+# asyncio engine (collect_sps.py --engine async): same calls and result rows as the thread pool above, with the
+# concurrency of every subscription adapted to its throttling answers (sps_module/sps_async_engine.py)
+def execute_spot_placement_score_task_async(plan, locations):
+    engine = sps_async_engine.SpsAsyncEngine(
+        SS_Resources.subscriptions,
+        initial_concurrency=max(1, len(locations) * 2 // len(SS_Resources.subscriptions)),
+        max_in_flight=int(len(locations) * 2),
+    )
+    sps_http_client.configure_http_client(engine.max_in_flight)
+
+    results = []
+    collected = []
+    try:
+        responses = asyncio.run(engine.run(
+            execute_spot_placement_score_api_async(engine, call.regions, call.instance_types, call.desired_count, max_retries=50)
+            for call in plan.calls
+        ))
+        for index, (call, result) in enumerate(zip(plan.calls, responses)):
+            if result and result != sps_async_engine.NO_AVAILABLE_LOCATIONS:
+                results.extend(sps_result_rows(result, call))
+                collected.append(index)
+    finally:
+        print(f"Concurrency limit per subscription: {engine.limits()}")
+        update_last_collected(plan, collected)
+        save_task_state_to_s3(engine.no_available_locations)
+    return results
+
+
+def save_task_state_to_s3(no_available_locations_flag):
+    save_tmp_files_to_s3()
+    if no_available_locations_flag:
+        current_utc_time = datetime.now(timezone.utc).strftime("%Y_%m_%dT%H_%M_%S")
+        S3.upload_file(SS_Resources.locations_call_history_tmp,
+                       f"{AZURE_CONST.ERROR_LOCATIONS_CALL_HISTORY_JSON_PATH}/{current_utc_time}.json", "json")
+        print("No available locations found. Cancelling remaining tasks. ")
+
+
+# rows of the placementScores answer of a planned call
+def sps_result_rows(result, call):
+    desired_count = call.desired_count
+    rows = []
+    for score in result["placementScores"]:
+        if not call.requested(score.get("region", ""), score.get("sku", "")):
+            continue
+        score_data = {
+            "DesiredCount": desired_count,
+            "RegionCodeSPS": score.get("region"),
+            "Region": SS_Resources.region_map_and_instance_map_tmp['region_map'].get(
+                score.get("region", ""), ""),
+            "InstanceTypeSPS": score.get("sku"),
+            "InstanceTier": SS_Resources.region_map_and_instance_map_tmp['instance_map'].get(
+                score.get("sku", ""), {}).get("InstanceTier"),
+            "InstanceType": SS_Resources.region_map_and_instance_map_tmp['instance_map'].get(
+                score.get("sku", ""), {}).get("InstanceTypeOld"),
+            "Score": map_score_to_int(score.get("score")),
+            "T3": desired_count if map_score_to_int(score.get("score")) == 3 else 0,
+            "T2": desired_count if map_score_to_int(score.get("score")) >= 2 else 0
+        }
+        if availability_zones is True:
+            score_data["AvailabilityZone"] = score.get("availabilityZone", "Single")
+
+        rows.append(score_data)
+    return rows
+
+
+def sps_results_to_df(results):
     sps_res_df = pd.DataFrame(results)
 
     if availability_zones is True:
@@ -282,13 +359,13 @@ def execute_spot_placement_score_api(region_chunk, instance_type_chunk, desired_
             else:
                 subscription_id, location = res
 
-        url = f"https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.Compute/locations/{location}/placementScores/spot/generate?api-version=2025-06-05"
+        url = sps_http_client.placement_scores_url(subscription_id, location)
         headers = {
             "Authorization": f"Bearer {sps_shared_resources.sps_token}",
             "Content-Type": "application/json",
         }
         try:
-            response = requests.post(url, headers=headers, json=request_body, timeout=50)
+            response = sps_http_client.post(url, headers=headers, json=request_body)
             response.raise_for_status()
             SS_Resources.succeed_to_get_sps_count += 1
             return response.json()
@@ -297,55 +374,150 @@ def execute_spot_placement_score_api(region_chunk, instance_type_chunk, desired_
             retries = handle_retry("Timeout", retries, max_retries)
 
         except requests.exceptions.HTTPError as http_err:
-            error_message = http_err.response.text
-            match_res = extract_invalid_values(error_message)
-            if match_res:
-                if match_res["invalid_region"]:
-                    region_chunk = del_invalid_chunk(region_chunk, match_res["invalid_region"], "invalid_region")
-                    if region_chunk is None:
-                        print(f"This retry will not execute because, after filtering, the region_chunk becomes empty.")
-                        break
-                    retries = handle_retry("InvalidRegion", retries, max_retries)
-
-                if match_res["invalid_instanceType"]:
-                    instance_type_chunk = del_invalid_chunk(instance_type_chunk, match_res["invalid_instanceType"],"invalid_instanceType")
-                    if instance_type_chunk is None:
-                        print(f"This retry will not execute because, after filtering, the instance_type_chunk becomes empty.")
-                        break
-                    retries = handle_retry("InvalidInstanceType", retries, max_retries)
-
-            if "BadGatewayConnection" in error_message:
-                print(f"[DEBUG_ERROR] BadGatewayConnection occurred!")
-                print(f"URL: {url}")
-                retries = handle_retry("BadGatewayConnection", retries, max_retries)
-
-            elif "InvalidParameter" in error_message:
-                print(f"HTTP error occurred: {error_message}")
-                retries = handle_retry("InvalidParameter", retries, max_retries)
-
-            elif "You have reached the maximum number of requests allowed." in error_message:
-                if SS_Resources.too_many_requests_count == 0:
-                    print(f"HTTP error occurred: {error_message}")
-                SL_Manager.update_over_limit_locations(subscription_id, location)
-                retries = handle_retry("Too Many Requests", retries, max_retries)
-
-            elif "Max retries exceeded with url" in error_message:
-                print(f"HTTP error occurred: {error_message}")
-                SL_Manager.update_over_limit_locations(subscription_id, location)
-                retries = handle_retry("Too Many Requests(2)", retries, max_retries)
+            error_types, region_chunk, instance_type_chunk = classify_http_error(
+                http_err, region_chunk, instance_type_chunk, subscription_id, location)
+            if region_chunk is None or instance_type_chunk is None:
+                break
+            for error_type in error_types:
+                retries = handle_retry(error_type, retries, max_retries)
+                if retries is None:
+                    break
 
         except Exception as e:
             print(f"execute_spot_placement_score_api. An unexpected error occurred: {e}")
             break
 
-        if retries:
-            continue
+        if retries is None:
+            break
 
     if retries is None:
         print(f"Max retries-> ({max_retries}) reached.")
     return None
 
 
+# asyncio version of execute_spot_placement_score_api
+# Invalid regions / instance types are dropped and retried at once, and no retry sleeps: the throttling and gateway
+# answers lower the concurrency of the subscription in the engine instead, and a "maximum number of requests" answer
+# parks its (subscription, location) pair in the location scheduler for the Retry-After of the answer.
+async def execute_spot_placement_score_api_async(engine, region_chunk, instance_type_chunk, desired_count, max_retries=12):
+    retries = 0
+    while retries <= max_retries:
+        async with engine.in_flight:
+            if retries == 0 and engine.no_available_locations:
+                return sps_async_engine.CANCELLED
+
+            # filtered once the call has a slot, so that it drops the invalid values found while it waited
+            region_chunk = filter_invalid_items(region_chunk, "invalid_regions")
+            instance_type_chunk = filter_invalid_items(instance_type_chunk, "invalid_instance_types")
+
+            if region_chunk is None or instance_type_chunk is None:
+                print(f"execute_spot_placement_score_api_async: Execution skipped as filtered chunks are empty. "
+                      f"region_chunk: {region_chunk}, instance_type_chunk: {instance_type_chunk}")
+                return None
+
+            request_body = {
+                "availabilityZones": availability_zones,
+                "desiredCount": desired_count,
+                'desiredLocations' : region_chunk,
+                'desiredSizes' : [{"sku": instance_type} for instance_type in instance_type_chunk]
+            }
+
+            with SS_Resources.location_lock:
+                res = SL_Manager.get_next_available_location()
+                if res is None:
+                    return sps_async_engine.NO_AVAILABLE_LOCATIONS
+                else:
+                    subscription_id, location = res
+
+            url = sps_http_client.placement_scores_url(subscription_id, location)
+            headers = {
+                "Authorization": f"Bearer {sps_shared_resources.sps_token}",
+                "Content-Type": "application/json",
+            }
+            try:
+                response = await engine.post(subscription_id, url, headers, request_body, still_valid=lambda: not
+                                             SS_Resources.location_scheduler.is_over_limit((subscription_id, location)))
+                if response is None:
+                    continue
+                retries += 1
+                response.raise_for_status()
+                SS_Resources.succeed_to_get_sps_count += 1
+                return response.json()
+
+            except requests.exceptions.Timeout:
+                # the call was sent, so it counts as an attempt like the answered ones
+                retries += 1
+                SS_Resources.count_retry("Timeout")
+
+            except requests.exceptions.HTTPError as http_err:
+                error_types, region_chunk, instance_type_chunk = classify_http_error(
+                    http_err, region_chunk, instance_type_chunk, subscription_id, location)
+                if region_chunk is None or instance_type_chunk is None:
+                    break
+                for error_type in error_types:
+                    SS_Resources.count_retry(error_type)
+
+            except Exception as e:
+                print(f"execute_spot_placement_score_api_async. An unexpected error occurred: {e}")
+                break
+
+    if retries > max_retries:
+        print(f"Max retries-> ({max_retries}) reached.")
+    return None
+
+
+# Classify the HTTP error answer of a placementScores call, for both engines.
+# Invalid regions / instance types are dropped from the chunks, and a "maximum number of requests" answer parks the
+# (subscription, location) pair in the location scheduler for the Retry-After of the answer.
+# return (error types to retry for, region_chunk, instance_type_chunk); a chunk is None once nothing is left of it
+def classify_http_error(http_err, region_chunk, instance_type_chunk, subscription_id, location):
+    error_message = http_err.response.text
+    error_types = []
+    match_res = extract_invalid_values(error_message)
+    if match_res:
+        if match_res["invalid_region"]:
+            region_chunk = del_invalid_chunk(region_chunk, match_res["invalid_region"], "invalid_region")
+            if region_chunk is None:
+                print("This retry will not execute because, after filtering, the region_chunk becomes empty.")
+                return error_types, region_chunk, instance_type_chunk
+            error_types.append("InvalidRegion")
+
+        if match_res["invalid_instanceType"]:
+            instance_type_chunk = del_invalid_chunk(instance_type_chunk, match_res["invalid_instanceType"], "invalid_instanceType")
+            if instance_type_chunk is None:
+                print("This retry will not execute because, after filtering, the instance_type_chunk becomes empty.")
+                return error_types, region_chunk, instance_type_chunk
+            error_types.append("InvalidInstanceType")
+
+    if "BadGatewayConnection" in error_message:
+        print(f"BadGatewayConnection occurred. Location: {location}")
+        error_types.append("BadGatewayConnection")
+
+    elif "InvalidParameter" in error_message:
+        print(f"HTTP error occurred: {error_message}")
+        error_types.append("InvalidParameter")
+
+    elif sps_async_engine.MAXIMUM_REQUESTS_MESSAGE in error_message:
+        if SS_Resources.too_many_requests_count == 0:
+            print(f"HTTP error occurred: {error_message}")
+        SL_Manager.update_over_limit_locations(subscription_id, location,
+                                               sps_async_engine.parse_retry_after(http_err.response.headers))
+        error_types.append("Too Many Requests")
+
+    elif "Max retries exceeded with url" in error_message:
+        print(f"HTTP error occurred: {error_message}")
+        SL_Manager.update_over_limit_locations(subscription_id, location)
+        error_types.append("Too Many Requests(2)")
+
+    elif http_err.response.status_code == 429:
+        error_types.append("Too Many Requests(2)")
+
+    elif not match_res:
+        print(f"HTTP error occurred: {error_message}")
+
+    return error_types, region_chunk, instance_type_chunk
+
+
 def extract_invalid_values(error_message):
     region_match = re.search(
         r"The value '([a-zA-Z0-9-_]+)' provided for the input parameter 'desiredLocations' is not valid",
@@ -405,19 +577,7 @@ def del_invalid_chunk(chunk, invalid_value, value_type):
 
 
 def handle_retry(error_type, retries, max_retries):
-    if error_type == "Timeout":
-        SS_Resources.time_out_retry_count += 1
-    elif error_type == "BadGatewayConnection":
-        SS_Resources.bad_request_retry_count += 1
-    elif error_type == "Too Many Requests":
-        SS_Resources.too_many_requests_count += 1
-    elif error_type == "Too Many Requests(2)":
-        SS_Resources.too_many_requests_count_2 += 1
-    elif error_type == "InvalidRegion":
-        SS_Resources.found_invalid_region_retry_count += 1
-    elif error_type == "InvalidInstanceType":
-        SS_Resources.found_invalid_instance_type_retry_count += 1
-
+    SS_Resources.count_retry(error_type)
 
     if retries < max_retries:
         sleep_time = round(random.uniform(0.5, 1.5), 1)
@@ -451,6 +611,7 @@ def initialize_sps_count_resources():
     SS_Resources.succeed_to_get_next_available_location_count = 0
 
 def save_tmp_files_to_s3():
+    SL_Manager.sync_location_history()
     az_str = f"availability-zones-{str(availability_zones).lower()}"
     base_path = AZURE_CONST.S3_SAVED_VARIABLE_PATH
     files_to_upload = {
@@ -458,7 +619,8 @@ def save_tmp_files_to_s3():
         f"{base_path}/{az_str}/{AZURE_CONST.S3_INVALID_INSTANCE_TYPES_JSON_FILENAME}": SS_Resources.invalid_instance_types_tmp,
         f"{base_path}/{az_str}/{AZURE_CONST.S3_LOCATIONS_CALL_HISTORY_JSON_FILENAME}": SS_Resources.locations_call_history_tmp,
         f"{base_path}/{az_str}/{AZURE_CONST.S3_LAST_SUBSCRIPTION_ID_AND_LOCATION_JSON_FILENAME}": SS_Resources.last_subscription_id_and_location_tmp,
-        f"{base_path}/{az_str}/{AZURE_CONST.S3_LOCATIONS_OVER_LIMIT_JSON_FILENAME}": SS_Resources.locations_over_limit_tmp
+        f"{base_path}/{az_str}/{AZURE_CONST.S3_LOCATIONS_OVER_LIMIT_JSON_FILENAME}": SS_Resources.locations_over_limit_tmp,
+        f"{base_path}/{az_str}/{AZURE_CONST.S3_SPS_LAST_COLLECTED_JSON_FILENAME}": SS_Resources.sps_last_collected_tmp
     }
 
     for file_path, file_data in files_to_upload.items():
@@ -476,6 +638,7 @@ def get_variable_from_s3():
         over_limit_data = S3.read_file(f"{base_path}/{az_str}/{AZURE_CONST.S3_LOCATIONS_OVER_LIMIT_JSON_FILENAME}", 'json')
         last_subscription_id_and_location = S3.read_file(f"{base_path}/{az_str}/{AZURE_CONST.S3_LAST_SUBSCRIPTION_ID_AND_LOCATION_JSON_FILENAME}", 'json')
         region_map_and_instance_map = S3.read_file(f"{base_path}/{az_str}/{AZURE_CONST.S3_REGION_MAP_AND_INSTANCE_MAP_JSON_FILENAME}", 'json')
+        sps_last_collected = S3.read_file(f"{base_path}/{az_str}/{AZURE_CONST.S3_SPS_LAST_COLLECTED_JSON_FILENAME}", 'json')
 
         SS_Resources.invalid_regions_tmp = invalid_regions_data
         SS_Resources.invalid_instance_types_tmp = instance_types_data
@@ -486,6 +649,8 @@ def get_variable_from_s3():
             "region_map": region_map_and_instance_map.get('region_map'),
             "instance_map": region_map_and_instance_map.get('instance_map')
         }
+        # optional: a missing file only means every row is equally stale
+        SS_Resources.sps_last_collected_tmp = sps_last_collected or {}
 
         if all(data is not None for data in [
             SS_Resources.invalid_regions_tmp,
@@ -0,0 +1,168 @@
+import time
+import asyncio
+import functools
+import concurrent.futures
+import email.utils
+from datetime import datetime, timezone
+import requests
+
+from sps_module import sps_http_client
+
+MAXIMUM_REQUESTS_MESSAGE = "You have reached the maximum number of requests allowed."
+NO_AVAILABLE_LOCATIONS = "NO_AVAILABLE_LOCATIONS"
+CANCELLED = "CANCELLED"
+
+# AIMD: every successful call raises the concurrency of its subscription by 1 / limit (about +1 per round of `limit`
+# calls), a throttled call halves it and a timeout or gateway error cuts it by a fifth
+THROTTLED_DECREASE = 0.5
+CONGESTED_DECREASE = 0.8
+MIN_CONCURRENCY = 1
+
+# a subscription-wide 429 pauses the subscription for its Retry-After, at most this many seconds
+MAX_SUBSCRIPTION_PAUSE = 300
+
+
+# seconds to wait from a Retry-After header (delta-seconds or HTTP-date), None when missing or unreadable
+def parse_retry_after(headers):
+    value = headers.get("Retry-After") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Concurrency limit of one subscription, adjusted AIMD-style from the outcome of its calls.
+# A burst of calls that were all in flight when the subscription got throttled reports the same congestion, so only
+# calls that started after the last decrease can decrease the limit again.
+class AdaptiveConcurrency:
+    def __init__(self, initial, maximum, minimum=MIN_CONCURRENCY, clock=time.monotonic):
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.maximum = maximum
+        self.minimum = minimum
+        self.clock = clock
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self.decreased_at = float("-inf")
+        self.condition = asyncio.Condition()
+
+    # wait for a free slot, return the start time of the call
+    async def acquire(self):
+        async with self.condition:
+            while True:
+                delay = self.resume_at - self.clock()
+                if delay <= 0 and self.in_flight < int(self.limit):
+                    break
+                try:
+                    await asyncio.wait_for(self.condition.wait(), timeout=delay if delay > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+            return self.clock()
+
+    # outcome: "succeeded", "throttled", "congested" or None (an answer that says nothing about the load)
+    async def release(self, started_at, outcome=None, pause=None):
+        async with self.condition:
+            self.in_flight -= 1
+            if outcome == "succeeded":
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif outcome in ("throttled", "congested") and started_at >= self.decreased_at:
+                decrease = THROTTLED_DECREASE if outcome == "throttled" else CONGESTED_DECREASE
+                self.limit = max(self.minimum, self.limit * decrease)
+                self.decreased_at = self.clock()
+            if pause:
+                self.resume_at = max(self.resume_at, self.clock() + min(pause, MAX_SUBSCRIPTION_PAUSE))
+            self.condition.notify(max(0, int(self.limit) - self.in_flight))
+
+
+# asyncio SPS engine of the Azure collector.
+# - Every subscription has its own AdaptiveConcurrency limit, starting at `initial_concurrency` and growing up to
+#   `max_in_flight` while its calls succeed.
+# - "maximum number of requests" and 429 answers halve the limit of the subscription; a 429 that is not about a single
+#   (subscription, location) pair also pauses the whole subscription for its Retry-After.
+# - At most `max_in_flight` calls run at once: a call takes a slot of `in_flight` before it takes a (subscription,
+#   location) pair, so pairs are not handed out to calls that can not be sent yet. The HTTP calls go through the blocking
+#   shared client (sps_http_client), run on a thread pool of the same size.
+# - Once no location is available, calls that have not been sent yet return CANCELLED instead of being sent, and the run
+#   fails, like the thread pool engine cancelling its queued futures. Calls already sent finish their retries.
+class SpsAsyncEngine:
+    def __init__(self, subscriptions, initial_concurrency, max_in_flight):
+        self.subscriptions = subscriptions
+        self.initial_concurrency = initial_concurrency
+        self.max_in_flight = max_in_flight
+        self.no_available_locations = False
+
+    def limiter(self, subscription_id):
+        if subscription_id not in self.limiters:
+            self.limiters[subscription_id] = AdaptiveConcurrency(self.initial_concurrency, self.max_in_flight)
+        return self.limiters[subscription_id]
+
+    # POST through the limiter of `subscription_id`; the response (or the requests exception) is handed to the caller
+    # `still_valid` is checked once the limiter let the call through: the pair may have been marked over limit while
+    # the call waited, and then None is returned without sending it
+    async def post(self, subscription_id, url, headers, json, still_valid=None):
+        limiter = self.limiter(subscription_id)
+        started_at = await limiter.acquire()
+        outcome, pause = None, None
+        try:
+            if still_valid is not None and not still_valid():
+                return None
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                self.executor, functools.partial(sps_http_client.post, url, headers=headers, json=json))
+            outcome, pause = self.classify(response)
+            return response
+        except requests.exceptions.Timeout:
+            outcome = "congested"
+            raise
+        finally:
+            await limiter.release(started_at, outcome, pause)
+
+    # (outcome, subscription pause) of an answer
+    def classify(self, response):
+        status_code = response.status_code
+        if 200 <= status_code < 300:
+            return "succeeded", None
+        # the limit of a single (subscription, location) pair is handled by the location scheduler
+        if MAXIMUM_REQUESTS_MESSAGE in response.text:
+            return "throttled", None
+        if status_code == 429:
+            return "throttled", parse_retry_after(response.headers)
+        if status_code in (502, 503, 504) or "BadGatewayConnection" in response.text:
+            return "congested", None
+        return None, None
+
+    # run the coroutine of every call and return their results in order
+    async def run(self, coroutines):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self.in_flight = asyncio.Semaphore(self.max_in_flight)
+        self.limiters = {subscription_id: AdaptiveConcurrency(self.initial_concurrency, self.max_in_flight)
+                         for subscription_id in self.subscriptions}
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                if await finished == NO_AVAILABLE_LOCATIONS:
+                    self.no_available_locations = True
+            results = [task.result() for task in tasks]
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+        cancelled = results.count(CANCELLED)
+        if cancelled:
+            raise RuntimeError(f"No available locations, cancelled {cancelled} SPS calls")
+        return results
+
+    def limits(self):
+        return {subscription_id: round(limiter.limit, 1) for subscription_id, limiter in self.limiters.items()}
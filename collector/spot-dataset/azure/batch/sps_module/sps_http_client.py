@@ -0,0 +1,150 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from sps_module import sps_shared_resources
+
+# httpx (with the h2 package) multiplexes the calls over HTTP/2 connections; it is optional
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+SS_Resources = sps_shared_resources
+
+# Timeouts of the management.azure.com calls, in seconds
+CONNECT_TIMEOUT = 10
+SPS_READ_TIMEOUT = 50
+LOCATION_READ_TIMEOUT = 15
+
+# pool size used before the SPS thread pool sized the client (collect_available_locations)
+DEFAULT_POOL_SIZE = 10
+
+# a kept-alive connection may have been closed by the server between two calls; placementScores is a query, so a call
+# that failed on the connection (not a timeout) is sent again on a new connection
+CONNECTION_RETRIES = 1
+
+
+# Shared HTTP client of the placementScores calls.
+# Every call used to go through the module-level requests.post, which opens (and TLS handshakes) a new connection to
+# management.azure.com per attempt. Here all threads share one connection pool that is sized to the number of worker
+# threads, so a connection is kept alive and reused by the next call of any thread.
+# requests backend: one HTTPAdapter (a thread-safe urllib3 pool) mounted on a requests.Session per thread, so no
+#   Session state (cookies, adapters) is shared between threads.
+# httpx backend (http2=True): one HTTP/2 httpx.Client per thread. A single HTTP/2 connection shared by all threads
+#   corrupted its streams under load (httpcore's sync HTTP/2 connection is not safe for concurrent senders), so the
+#   threads do not multiplex onto one connection. Its errors are raised as the requests exceptions, so callers handle
+#   both backends the same way.
+class SPSHttpClient:
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, http2=False):
+        self.pool_size = pool_size
+        self.http2 = http2 and http2_available()
+        if http2 and not self.http2:
+            print("HTTP/2 requires the httpx and h2 packages, falling back to the requests connection pool")
+
+        if not self.http2:
+            self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.local = threading.local()
+        self.sessions = []
+        self.sessions_lock = threading.Lock()
+
+    # session (requests.Session or httpx.Client) of the calling thread
+    def session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            if self.http2:
+                session = httpx.Client(http2=True, limits=httpx.Limits(max_connections=1, max_keepalive_connections=1))
+            else:
+                session = requests.Session()
+                session.mount("https://", self.adapter)
+                session.mount("http://", self.adapter)
+            self.local.session = session
+            with self.sessions_lock:
+                self.sessions.append(session)
+        return session
+
+    def post(self, url, headers, json, read_timeout=SPS_READ_TIMEOUT):
+        for attempt in range(CONNECTION_RETRIES + 1):
+            try:
+                return self.send(url, headers, json, read_timeout)
+            except requests.exceptions.Timeout:
+                raise
+            except requests.exceptions.ConnectionError:
+                if attempt == CONNECTION_RETRIES:
+                    raise
+
+    def send(self, url, headers, json, read_timeout):
+        if not self.http2:
+            return self.session().post(url, headers=headers, json=json, timeout=(CONNECT_TIMEOUT, read_timeout))
+
+        try:
+            response = self.session().post(url, headers=headers, json=json,
+                                        timeout=httpx.Timeout(read_timeout, connect=CONNECT_TIMEOUT))
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        return HttpxResponse(response)
+
+    def close(self):
+        with self.sessions_lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions.clear()
+        if not self.http2:
+            self.adapter.close()
+
+
+# httpx response with the requests interface used by the callers (raise_for_status raises requests' HTTPError)
+class HttpxResponse:
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.text = response.text
+
+    def json(self):
+        return self.response.json()
+
+    def raise_for_status(self):
+        if self.response.is_error:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error: {self.response.reason_phrase} for url: {self.response.url}", response=self)
+
+
+def http2_available():
+    if httpx is None:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# (re)build the shared client with a pool of `pool_size` connections, closing the previous one
+def configure_http_client(pool_size):
+    with SS_Resources.lock:
+        previous = SS_Resources.http_client
+        SS_Resources.http_client = SPSHttpClient(pool_size=pool_size, http2=SS_Resources.http2)
+    if previous is not None:
+        previous.close()
+    return SS_Resources.http_client
+
+
+def get_http_client():
+    with SS_Resources.lock:
+        if SS_Resources.http_client is None:
+            SS_Resources.http_client = SPSHttpClient(http2=SS_Resources.http2)
+        return SS_Resources.http_client
+
+
+def post(url, headers, json, read_timeout=SPS_READ_TIMEOUT):
+    return get_http_client().post(url, headers=headers, json=json, read_timeout=read_timeout)
+
+
+# placementScores URL of a (subscription, location) pair; sps_shared_resources.management_endpoint can point to a
+# fake ARM server (collect_sps.py --endpoint)
+def placement_scores_url(subscription_id, location):
+    return (f"{SS_Resources.management_endpoint}/subscriptions/{subscription_id}/providers/Microsoft.Compute"
+            f"/locations/{location}/placementScores/spot/generate?api-version=2025-06-05")
@@ -3,17 +3,159 @@ import requests
 import traceback
 import sys
 import os
+import time
+import heapq
+from collections import deque
 from datetime import datetime, timedelta, timezone
 
 # Add parent directory to path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sps_module import sps_shared_resources
+from sps_module import sps_http_client
 from utils.common import S3
 from utils.constants import AZURE_CONST
 
 SS_Resources = sps_shared_resources
 
+# Each (subscription, location) pair accepts CALL_LIMIT_PER_WINDOW calls per CALL_WINDOW, and a pair that answered
+# "maximum number of requests" is not used for a CALL_WINDOW
+CALL_LIMIT_PER_WINDOW = 10
+CALL_WINDOW = timedelta(minutes=62)
+
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Hands out (subscription, location) pairs in round-robin order while respecting the per-pair call limit.
+# Pairs that can be called now wait in a FIFO ready queue; a pair that reached its limit or is over limit moves to a
+# heap keyed by the time it becomes available again, and returns to the back of the ready queue once that time passed.
+# Call history is kept per pair in a deque of monotonic timestamps and expired lazily when the pair is looked at,
+# so handing out a pair is O(log n) instead of a scan over every pair and timestamp.
+# The persisted form (locations_call_history_tmp / locations_over_limit_tmp, naive UTC ISO strings) is converted once
+# when the scheduler is built and once when it is exported.
+class LocationScheduler:
+    def __init__(self, subscriptions, locations, call_history=None, over_limit=None, last_pair=None,
+                 clock=time.monotonic, wall_clock=utc_now):
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.window = CALL_WINDOW.total_seconds()
+        self.limit = CALL_LIMIT_PER_WINDOW
+        self.lock = SS_Resources.location_lock
+
+        pairs = [(subscription_id, location) for subscription_id in subscriptions for location in locations]
+        # continue after the pair handed out last, like the previous run did
+        if last_pair in pairs:
+            start = pairs.index(last_pair) + 1
+            pairs = pairs[start:] + pairs[:start]
+
+        now = self.clock()
+        wall_now = self.wall_clock()
+        call_history = call_history or {}
+        over_limit = over_limit or {}
+        self.calls = {}
+        self.over_limit_until = {}
+        for subscription_id, location in pairs:
+            timestamps = call_history.get(subscription_id, {}).get(location, [])
+            self.calls[(subscription_id, location)] = deque(
+                sorted(self.to_monotonic(t, now, wall_now) for t in timestamps))
+            marked_at = over_limit.get(subscription_id, {}).get(location)
+            if marked_at:
+                self.over_limit_until[(subscription_id, location)] = self.to_monotonic(marked_at, now, wall_now) + self.window
+
+        self.ready = deque(pairs)
+        self.waiting = []
+        self.sequence = 0
+
+    def to_monotonic(self, iso_timestamp, now, wall_now):
+        return now - (wall_now - datetime.fromisoformat(iso_timestamp)).total_seconds()
+
+    def to_iso(self, monotonic_timestamp, now, wall_now):
+        return (wall_now - timedelta(seconds=now - monotonic_timestamp)).isoformat()
+
+    # time from which `pair` can be called, expiring its old calls on the way
+    def available_at(self, pair, now):
+        calls = self.calls[pair]
+        while calls and calls[0] <= now - self.window:
+            calls.popleft()
+        available_at = self.over_limit_until.get(pair, now)
+        if len(calls) >= self.limit:
+            available_at = max(available_at, calls[0] + self.window)
+        return available_at
+
+    def wait(self, pair, available_at):
+        self.sequence += 1
+        heapq.heappush(self.waiting, (available_at, self.sequence, pair))
+
+    # return the next (subscription_id, location) that can be called, or None when every pair is at its limit
+    def acquire(self):
+        with self.lock:
+            now = self.clock()
+            while self.waiting and self.waiting[0][0] <= now:
+                _, _, pair = heapq.heappop(self.waiting)
+                available_at = self.available_at(pair, now)
+                if available_at > now:
+                    self.wait(pair, available_at)
+                else:
+                    self.ready.append(pair)
+
+            while self.ready:
+                pair = self.ready.popleft()
+                available_at = self.available_at(pair, now)
+                if available_at > now:
+                    self.wait(pair, available_at)
+                    continue
+
+                calls = self.calls[pair]
+                calls.append(now)
+                if len(calls) >= self.limit:
+                    self.wait(pair, calls[0] + self.window)
+                else:
+                    self.ready.append(pair)
+                return pair
+            return None
+
+    # the pair is left where it is and skipped when it is looked at next
+    # `retry_after` (seconds, from the Retry-After header) replaces the default wait of a CALL_WINDOW
+    def mark_over_limit(self, pair, retry_after=None):
+        with self.lock:
+            self.over_limit_until[pair] = self.clock() + (self.window if retry_after is None else retry_after)
+
+    # calls the pairs can take now without waiting for a call to expire; over limit pairs take none
+    def remaining_calls(self):
+        with self.lock:
+            now = self.clock()
+            remaining = 0
+            for pair, calls in self.calls.items():
+                self.available_at(pair, now)
+                if self.over_limit_until.get(pair, now) <= now:
+                    remaining += max(0, self.limit - len(calls))
+            return remaining
+
+    # whether `pair` is over limit now, e.g. marked by another call after it was handed out
+    def is_over_limit(self, pair):
+        with self.lock:
+            return self.over_limit_until.get(pair, float("-inf")) > self.clock()
+
+    # return (call_history, over_limit) of the pairs in the window, in the persisted format
+    def export(self):
+        with self.lock:
+            now = self.clock()
+            wall_now = self.wall_clock()
+            call_history = {}
+            over_limit = {}
+            for pair in self.calls:
+                self.available_at(pair, now)
+                subscription_id, location = pair
+                call_history.setdefault(subscription_id, {})[location] = [
+                    self.to_iso(t, now, wall_now) for t in self.calls[pair]]
+                until = self.over_limit_until.get(pair)
+                over_limit.setdefault(subscription_id, {})
+                if until is not None and until > now:
+                    over_limit[subscription_id][location] = self.to_iso(until - self.window, now, wall_now)
+            return call_history, over_limit
+
 def check_and_add_available_locations(az):
     try:
         SS_Resources.available_locations = collect_available_locations()
@@ -43,6 +185,14 @@ def check_and_add_available_locations(az):
                     SS_Resources.locations_call_history_tmp[subscription_id][location] = []
                     updated = True
 
+        SS_Resources.location_scheduler = LocationScheduler(
+            SS_Resources.subscriptions,
+            SS_Resources.available_locations,
+            SS_Resources.locations_call_history_tmp,
+            SS_Resources.locations_over_limit_tmp,
+            last_pair_of(SS_Resources.last_subscription_id_and_location_tmp),
+        )
+
         if updated:
             print("Updated available locations to locations_call_history_tmp or locations_call_history_tmp successfully.")
             return True
@@ -55,75 +205,35 @@ def check_and_add_available_locations(az):
         return False
 
 
-def validation_can_call(subscription_id, location):
-    if SS_Resources.locations_over_limit_tmp.get(subscription_id):
-        if ((location not in SS_Resources.locations_over_limit_tmp.get(subscription_id))
-                and (len(SS_Resources.locations_call_history_tmp[subscription_id][location]) < 10)):
-            return True
-    else:
-        if len(SS_Resources.locations_call_history_tmp[subscription_id][location]) < 10:
-            return True
-    return False
+def last_pair_of(last_subscription_id_and_location):
+    last_pair = last_subscription_id_and_location or {}
+    return last_pair.get("last_subscription_id"), last_pair.get("last_location")
 
 
 def get_next_available_location():
     try:
-        if SS_Resources.locations_call_history_tmp is None or SS_Resources.locations_over_limit_tmp is None:
+        scheduler = SS_Resources.location_scheduler
+        if scheduler is None:
             return None
 
-        clean_expired_over_limit_locations()
-        clean_expired_over_call_history_locations()
-
-        subs = SS_Resources.subscriptions
-        locs = SS_Resources.available_locations
-        if not subs or not locs:
+        res = scheduler.acquire()
+        if res is None:
             return None
 
-        n, m = len(subs), len(locs)
-
-        last_pair = getattr(SS_Resources, "last_subscription_id_and_location_tmp", None) or {}
-        last_sub_id = last_pair.get("last_subscription_id")
-        last_loc = last_pair.get("last_location")
-
-        if last_sub_id in subs and last_loc in locs:
-            s_idx = subs.index(last_sub_id)
-            l_idx = locs.index(last_loc)
-            l_idx = (l_idx + 1) % m
-            if l_idx == 0:
-                s_idx = (s_idx + 1) % n
-        else:
-            s_idx, l_idx = 0, 0
-
-        attempts = 0
-        while attempts < n * m:
-            sub_id = subs[s_idx]
-            loc = locs[l_idx]
-
-            if validation_can_call(sub_id, loc):
-                SS_Resources.succeed_to_get_next_available_location_count += 1
-                SS_Resources.succeed_to_get_next_available_location_count_all += 1
-
-                SS_Resources.locations_call_history_tmp[sub_id][loc].append(
-                    datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
-
-                SS_Resources.last_subscription_id_and_location_tmp = {
-                    "last_subscription_id": sub_id,
-                    "last_location": loc,
-                }
-                return sub_id, loc
-
-            l_idx = (l_idx + 1) % m
-            if l_idx == 0:
-                s_idx = (s_idx + 1) % n
-
-            attempts += 1
+        sub_id, loc = res
+        SS_Resources.succeed_to_get_next_available_location_count += 1
+        SS_Resources.succeed_to_get_next_available_location_count_all += 1
+        SS_Resources.last_subscription_id_and_location_tmp = {
+            "last_subscription_id": sub_id,
+            "last_location": loc,
+        }
+        return sub_id, loc
 
     except Exception as e:
         print("\n[ERROR] Exception occurred in get_next_available_location:")
         print(traceback.format_exc())
         print(f"\n[ERROR] Failed to get_next_available_location: {e}")
         return None
-    return None
 
 
 def collect_available_locations():
@@ -132,7 +242,7 @@ def collect_available_locations():
     location = "ERROR_LOCATION"
 
     try:
-        url = f"https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.Compute/locations/{location}/placementScores/spot/generate?api-version=2025-06-05"
+        url = sps_http_client.placement_scores_url(subscription_id, location)
         headers = {
             "Authorization": f"Bearer {sps_shared_resources.sps_token}",
             "Content-Type": "application/json"
@@ -144,7 +254,7 @@ def collect_available_locations():
                 "desiredSizes": [{"sku": "Standard_D2_v3"}],
             }
 
-        response = requests.post(url, headers=headers, json=request_body, timeout=15)
+        response = sps_http_client.post(url, headers=headers, json=request_body, read_timeout=sps_http_client.LOCATION_READ_TIMEOUT)
         response.raise_for_status()
 
     except requests.exceptions.HTTPError as http_err:
@@ -158,48 +268,33 @@ def collect_available_locations():
         return None
     return None
 
-def clean_expired_over_limit_locations():
-    if SS_Resources.locations_over_limit_tmp:
-        for subscription_id in SS_Resources.subscriptions:
-            one_hour_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=62)
-            for location_key, location_value in list(
-                    SS_Resources.locations_over_limit_tmp[subscription_id].items()):
-                dt = datetime.fromisoformat(location_value)
-                if dt <= one_hour_ago:
-                    del SS_Resources.locations_over_limit_tmp[subscription_id][location_key]
-
-
-def clean_expired_over_call_history_locations():
-    if SS_Resources.locations_call_history_tmp:
-        one_hour_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=62)
-        for subscription_id in SS_Resources.subscriptions:
-            subscription_data = SS_Resources.locations_call_history_tmp.get(subscription_id, {})
-
-            new_subscription_data = {
-                location: [
-                    t for t in timestamps if datetime.fromisoformat(t) > one_hour_ago
-                ]
-                for location, timestamps in subscription_data.items()
-            }
-            SS_Resources.locations_call_history_tmp[subscription_id] = new_subscription_data
+# write the scheduler state back to locations_call_history_tmp / locations_over_limit_tmp before they are saved
+# entries of pairs the scheduler does not manage are kept as they are
+def sync_location_history():
+    scheduler = SS_Resources.location_scheduler
+    if scheduler is None:
+        return
+    call_history, over_limit = scheduler.export()
+    for subscription_id, locations in call_history.items():
+        SS_Resources.locations_call_history_tmp.setdefault(subscription_id, {}).update(locations)
+    for subscription_id, locations in over_limit.items():
+        SS_Resources.locations_over_limit_tmp[subscription_id] = locations
 
 
 def update_call_history(subscription_id, location):
     try:
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        current_timestamp = now.isoformat()
-        SS_Resources.locations_call_history_tmp[subscription_id][location].append(current_timestamp)
+        with SS_Resources.location_lock:
+            SS_Resources.location_scheduler.calls[(subscription_id, location)].append(SS_Resources.location_scheduler.clock())
         return True
 
     except Exception as e:
         print(f"Failed to update_call_history: {e}")
         return False
 
-def update_over_limit_locations(subscription_id, location):
+def update_over_limit_locations(subscription_id, location, retry_after=None):
     try:
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        current_timestamp = now.isoformat()
-        SS_Resources.locations_over_limit_tmp[subscription_id][location] = current_timestamp
+        now = utc_now()
+        SS_Resources.location_scheduler.mark_over_limit((subscription_id, location), retry_after)
 
         print("Successfully update_over_limit_locations. Subscription ID:" + subscription_id.split('-')[
             0] + ", Location:", location + ", Time:", now.strftime('%Y-%m-%d %H:%M:%S'))
@@ -1,3 +1,4 @@
+import heapq
 import numpy as np
 import pandas as pd
 from sklearn.cluster import KMeans
@@ -9,6 +10,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sps_module import sps_shared_resources
+from sps_module.sps_request_planner import MAX_REGIONS_PER_CALL, MAX_INSTANCE_TYPES_PER_CALL
 
 SS_Resources = sps_shared_resources
 
@@ -33,6 +35,113 @@ def greedy_clustering_to_create_optimized_request_list(regions_and_instance_type
     return df_greedy_clustered
 
 
+def lazy_greedy_to_create_optimized_request_list(regions_and_instance_types_df):
+    support_set, regions, instancetypes = load_support_data_from_df(regions_and_instance_types_df)
+
+    queries = lazy_greedy_cover(support_set, regions, instancetypes)
+    print_cover_statistics(support_set, queries)
+
+    return pd.DataFrame(
+        [{'Regions': list(regions), 'InstanceTypes': list(instancetypes)} for regions, instancetypes in queries]
+    )
+
+
+# regions tried as the seed of every request of lazy_greedy_cover
+SEED_REGIONS = 3
+
+
+# Set cover of the (region, instance type) support with requests of at most 8 regions x 5 instance types.
+# The uncovered pairs are a boolean region x instance type matrix whose row and column counts are updated as requests
+# cover pairs. The seeds of a request are the SEED_REGIONS regions with the most uncovered pairs, taken from a lazy
+# max-heap of the row counts (counts only decrease, so a stale entry is re-pushed with its count when popped), and the
+# instance types with the most uncovered pairs. From every seed the request alternates between the 5 instance types and
+# the 8 regions that cover the most uncovered pairs for the other side until it stops growing; the largest one is kept.
+def lazy_greedy_cover(support_set, regions, instancetypes):
+    region_to_idx = {r: idx for idx, r in enumerate(regions)}
+    inst_to_idx = {i: idx for idx, i in enumerate(instancetypes)}
+
+    uncovered = np.zeros((len(regions), len(instancetypes)), dtype=bool)
+    for (r, i) in support_set:
+        uncovered[region_to_idx[r], inst_to_idx[i]] = True
+    region_counts = uncovered.sum(axis=1)
+    inst_counts = uncovered.sum(axis=0)
+
+    region_heap = [(-count, idx) for idx, count in enumerate(region_counts) if count]
+    heapq.heapify(region_heap)
+
+    queries = []
+    while True:
+        seeds = []
+        while region_heap and len(seeds) < SEED_REGIONS:
+            count, idx = heapq.heappop(region_heap)
+            if -count == region_counts[idx]:
+                seeds.append(idx)
+            elif region_counts[idx]:
+                heapq.heappush(region_heap, (-region_counts[idx], idx))
+        if not seeds:
+            break
+
+        # instance types of a seed region that the most regions still need
+        seed_insts = []
+        for seed in seeds:
+            insts = np.flatnonzero(uncovered[seed])
+            seed_insts.append(insts[np.argsort(-inst_counts[insts], kind='stable')[:MAX_INSTANCE_TYPES_PER_CALL]])
+        seed_insts.append(np.argsort(-inst_counts, kind='stable')[:MAX_INSTANCE_TYPES_PER_CALL])
+        sel_regions, sel_insts, _ = max((_grow_request(uncovered, insts) for insts in seed_insts),
+                                        key=lambda request: request[2])
+
+        block = uncovered[np.ix_(sel_regions, sel_insts)]
+        sel_regions = sel_regions[block.any(axis=1)]
+        sel_insts = sel_insts[block.any(axis=0)]
+        block = uncovered[np.ix_(sel_regions, sel_insts)]
+        region_counts[sel_regions] -= block.sum(axis=1)
+        inst_counts[sel_insts] -= block.sum(axis=0)
+        uncovered[np.ix_(sel_regions, sel_insts)] = False
+        queries.append(({regions[idx] for idx in sel_regions}, {instancetypes[idx] for idx in sel_insts}))
+
+        for seed in seeds:
+            if region_counts[seed]:
+                heapq.heappush(region_heap, (-region_counts[seed], seed))
+
+    return queries
+
+
+def _grow_request(uncovered, sel_insts):
+    covered = 0
+    while True:
+        region_gain = uncovered[:, sel_insts].sum(axis=1)
+        sel_regions = np.argsort(-region_gain, kind='stable')[:MAX_REGIONS_PER_CALL]
+        inst_gain = uncovered[sel_regions].sum(axis=0)
+        new_insts = np.argsort(-inst_gain, kind='stable')[:MAX_INSTANCE_TYPES_PER_CALL]
+        gain = int(inst_gain[new_insts].sum())
+        if gain <= covered:
+            return sel_regions, sel_insts, covered
+        sel_insts, covered = new_insts, gain
+
+
+def print_cover_statistics(support_set, queries):
+    region_counts = defaultdict(int)
+    inst_counts = defaultdict(int)
+    for (r, i) in support_set:
+        region_counts[r] += 1
+        inst_counts[i] += 1
+    # every request covers at most 5 instance types of a region and 8 regions of an instance type
+    lower_bound = max([-(-len(support_set) // (MAX_REGIONS_PER_CALL * MAX_INSTANCE_TYPES_PER_CALL))] +
+                      [-(-count // MAX_INSTANCE_TYPES_PER_CALL) for count in region_counts.values()] +
+                      [-(-count // MAX_REGIONS_PER_CALL) for count in inst_counts.values()])
+
+    covered = set()
+    answered = 0
+    for regions, instancetypes in queries:
+        covered |= {(r, i) for r in regions for i in instancetypes if (r, i) in support_set}
+        answered += len(regions) * len(instancetypes)
+    coverage = len(covered) / len(support_set) * 100 if support_set else 100.0
+    pairs_per_request = len(covered) / len(queries) if queries else 0.0
+    print(f"Request cover: {len(queries)} requests (lower bound {lower_bound}) for {len(support_set)} pairs, "
+          f"coverage {coverage:.1f}%, {pairs_per_request:.1f} pairs per request, "
+          f"{answered - len(covered)} answered pairs outside the support")
+
+
 def load_support_data_from_df(df):
     support_set = set()
     regions = set()
@@ -0,0 +1,144 @@
+# Plans the placementScores calls of a collection before any of them is sent.
+# Pure Python on plain lists and dicts, so it runs without S3, Azure or the location scheduler:
+#   rows            : [(regions, instance_types), ...] of the request DataFrame (df_to_use_today)
+#   desired_counts  : desired counts of the sweep, one call per (row, desired count)
+#   available_calls : calls the (subscription, location) pairs can still take (LocationScheduler.remaining_calls)
+#   last_collected  : {desired count: {row key: ISO time}} of the rows collected by the previous runs
+# Rows of the same desired count are packed into shared calls while the union of their regions and instance types
+# fits in one call, the calls are ordered from the stalest row to the freshest, and only the calls the quota can cover
+# are scheduled. The calls left over are the stalest of the next run.
+
+MAX_REGIONS_PER_CALL = 8
+MAX_INSTANCE_TYPES_PER_CALL = 5
+
+# share of the available calls kept for retries (invalid parameters, gateway errors, throttled calls)
+RETRY_RESERVE = 0.1
+
+
+def row_key(regions, instance_types):
+    return f"{','.join(sorted(regions))}|{','.join(sorted(instance_types))}"
+
+
+# one placementScores call; `rows` are the (regions, instance_types) rows it collects
+class PlannedCall:
+    def __init__(self, desired_count, regions, instance_types, last_collected):
+        self.desired_count = desired_count
+        self.regions = list(regions)
+        self.instance_types = list(instance_types)
+        self.rows = [(tuple(regions), tuple(instance_types))]
+        self.last_collected = last_collected
+        self.covered = None
+        self.known = None
+
+    def merged_size(self, regions, instance_types):
+        region_count = len(set(self.regions).union(regions))
+        instance_type_count = len(set(self.instance_types).union(instance_types))
+        if region_count > MAX_REGIONS_PER_CALL or instance_type_count > MAX_INSTANCE_TYPES_PER_CALL:
+            return None
+        return region_count * instance_type_count
+
+    def merge(self, regions, instance_types, last_collected):
+        self.regions += [region for region in regions if region not in self.regions]
+        self.instance_types += [instance_type for instance_type in instance_types if instance_type not in self.instance_types]
+        self.rows.append((tuple(regions), tuple(instance_types)))
+        self.last_collected = min(self.last_collected, last_collected)
+
+    # whether a row of the call asked for (region, instance_type); a packed call also answers the other combinations of
+    # its regions and instance types, which are not part of the collection. Answers outside the requested regions and
+    # instance types are kept.
+    def requested(self, region, instance_type):
+        if len(self.rows) == 1:
+            return True
+        if self.covered is None:
+            self.covered = {(r.lower(), i.lower()) for regions, instance_types in self.rows
+                            for r in regions for i in instance_types}
+            self.known = ({r.lower() for r in self.regions}, {i.lower() for i in self.instance_types})
+        region, instance_type = region.lower(), instance_type.lower()
+        if region not in self.known[0] or instance_type not in self.known[1]:
+            return True
+        return (region, instance_type) in self.covered
+
+
+class SpsPlan:
+    def __init__(self, calls, deferred, request_count, available_calls, budget):
+        self.calls = calls
+        self.deferred = deferred
+        self.request_count = request_count
+        self.available_calls = available_calls
+        self.budget = budget
+
+    def covers_full_sweep(self):
+        return not self.deferred
+
+    def report(self):
+        planned = len(self.calls) + len(self.deferred)
+        report = (f"SPS plan: {self.request_count} (row, desired count) requests packed into {planned} calls, "
+                  f"{self.available_calls} calls available ({self.budget} after the retry reserve)")
+        if self.covers_full_sweep():
+            return f"{report}. The quota covers the full sweep."
+        oldest = self.deferred[0].last_collected or "never"
+        return (f"{report}. Partial run: {len(self.calls)} calls scheduled, {len(self.deferred)} deferred "
+                f"(stalest deferred row last collected: {oldest}).")
+
+    # last_collected state after the run: rows of the calls in `collected` (indexes of self.calls) get `collected_at`,
+    # the other rows of the plan keep their time, and rows that are no longer requested are dropped. Only the desired
+    # counts of the plan are replaced; the times of the other desired counts are kept for their next run.
+    def last_collected_after(self, last_collected, collected, collected_at):
+        collected = set(collected)
+        state = {desired_count: dict(times) for desired_count, times in (last_collected or {}).items()}
+        for desired_count in {str(call.desired_count) for call in self.calls + self.deferred}:
+            state[desired_count] = {}
+        for index, call in enumerate(self.calls + self.deferred):
+            times = state[str(call.desired_count)]
+            previous = (last_collected or {}).get(str(call.desired_count), {})
+            for regions, instance_types in call.rows:
+                key = row_key(regions, instance_types)
+                if index in collected:
+                    times[key] = collected_at
+                elif key in previous:
+                    times[key] = previous[key]
+        return state
+
+
+# pack the rows of one desired count, stalest first; a row joins the call that grows least by taking it
+def pack_rows(rows, desired_count):
+    calls = []
+    open_calls = []
+    for regions, instance_types, collected_at in sorted(rows, key=lambda row: row[2]):
+        best_call, best_growth = None, None
+        for call in open_calls:
+            size = call.merged_size(regions, instance_types)
+            if size is None:
+                continue
+            growth = size - len(call.regions) * len(call.instance_types)
+            if best_growth is None or growth < best_growth:
+                best_call, best_growth = call, growth
+        if best_call is None:
+            best_call = PlannedCall(desired_count, regions, instance_types, collected_at)
+            calls.append(best_call)
+            open_calls.append(best_call)
+        else:
+            best_call.merge(regions, instance_types, collected_at)
+        if len(best_call.regions) == MAX_REGIONS_PER_CALL and len(best_call.instance_types) == MAX_INSTANCE_TYPES_PER_CALL:
+            open_calls.remove(best_call)
+    return calls
+
+
+def plan_sps_calls(rows, desired_counts, available_calls, last_collected=None, retry_reserve=RETRY_RESERVE):
+    last_collected = last_collected or {}
+    unique_rows = {}
+    for regions, instance_types in rows:
+        unique_rows.setdefault(row_key(regions, instance_types), (list(regions), list(instance_types)))
+
+    calls = []
+    for desired_count in desired_counts:
+        times = last_collected.get(str(desired_count), {})
+        # rows never collected sort first ("" is before every ISO time)
+        count_rows = [(regions, instance_types, times.get(key, ""))
+                      for key, (regions, instance_types) in unique_rows.items()]
+        calls += pack_rows(count_rows, desired_count)
+
+    # stalest calls first; sorted() is stable, so ties keep the desired count and row order
+    calls = sorted(calls, key=lambda call: call.last_collected)
+    budget = max(0, int(available_calls * (1 - retry_reserve)))
+    return SpsPlan(calls[:budget], calls[budget:], len(unique_rows) * len(desired_counts), available_calls, budget)
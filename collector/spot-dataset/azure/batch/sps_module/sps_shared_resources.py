@@ -19,10 +19,33 @@ invalid_instance_types_tmp = None
 locations_call_history_tmp = None
 locations_over_limit_tmp = None
 last_subscription_id_and_location_tmp = None
+sps_last_collected_tmp = None
+location_scheduler = None
+http_client = None
+http2 = False
+sps_engine = "thread"
+management_endpoint = "https://management.azure.com"
 region_map_and_instance_map_tmp = None
 subscriptions = None
 available_locations = None
 
+retry_counters = {
+    "Timeout": "time_out_retry_count",
+    "BadGatewayConnection": "bad_request_retry_count",
+    "Too Many Requests": "too_many_requests_count",
+    "Too Many Requests(2)": "too_many_requests_count_2",
+    "InvalidRegion": "found_invalid_region_retry_count",
+    "InvalidInstanceType": "found_invalid_instance_type_retry_count",
+}
+
+
+def count_retry(error_type):
+    counter = retry_counters.get(error_type)
+    if counter is None:
+        return
+    with lock:
+        globals()[counter] += 1
+
 
 def generate_time_to_desired_count_map():
     start_time = datetime.strptime("00:00", "%H:%M")
@@ -5,14 +5,18 @@ import pickle
 import logging
 import pandas as pd
 import yaml
+from botocore.config import Config
 from utils.constants import STORAGE_CONST
+from utility.s3_stream import S3StreamWriter
+from utility.timestream_writer import WRITER_CLIENT_RETRIES
 
 # Setup Clients
 session = boto3.Session()
 s3_client = session.client('s3', region_name='us-west-2')
 s3_resource = session.resource('s3', region_name='us-west-2')
 cw_client = session.client('logs', region_name='us-west-2')
-timestream_write_client = session.client('timestream-write', region_name='us-west-2')
+# TimestreamBatchWriter owns the retries of the writes
+timestream_write_client = session.client('timestream-write', region_name='us-west-2', config=Config(retries=WRITER_CLIENT_RETRIES))
 
 class S3Handler:
     def __init__(self):
@@ -24,37 +28,29 @@ class S3Handler:
             if file_type not in ['json', 'pkl', 'pkl.gz', 'df_to_csv.gz', 'yaml']:
                 raise ValueError("Unsupported file type")
 
-            if file_type == "json":
-                class PandasJSONEncoder(json.JSONEncoder):
-                    def default(self, obj):
-                        if pd.isna(obj):
-                            return None
-                        return super().default(obj)
-                file = io.BytesIO(json.dumps(data, cls=PandasJSONEncoder).encode("utf-8"))
+            extra_args = {'ACL': 'public-read'} if set_public_read else {}
 
-            elif file_type == "pkl":
-                file = io.BytesIO()
-                pickle.dump(data, file)
-                file.seek(0)
+            # Serialize straight into a multipart upload stream instead of building the whole file in memory
+            with S3StreamWriter(self.client, STORAGE_CONST.BUCKET_NAME, file_path, extra_args=extra_args) as file:
+                if file_type == "json":
+                    class PandasJSONEncoder(json.JSONEncoder):
+                        def default(self, obj):
+                            if pd.isna(obj):
+                                return None
+                            return super().default(obj)
+                    file.write(json.dumps(data, cls=PandasJSONEncoder).encode("utf-8"))
 
-            elif file_type == "pkl.gz":
-                file = io.BytesIO()
-                data.to_pickle(file, compression="gzip")
-                file.seek(0)
-
-            elif file_type == "df_to_csv.gz":
-                file = io.BytesIO()
-                data.to_csv(file, index=False, compression="gzip")
-                file.seek(0)
-            
-            elif file_type == "yaml":
-                file = io.BytesIO(yaml.safe_dump(data).encode("utf-8"))
+                elif file_type == "pkl":
+                    pickle.dump(data, file)
+
+                elif file_type == "pkl.gz":
+                    data.to_pickle(file, compression="gzip")
 
-            self.client.upload_fileobj(file, STORAGE_CONST.BUCKET_NAME, file_path)
+                elif file_type == "df_to_csv.gz":
+                    data.to_csv(file, index=False, compression="gzip")
 
-            if set_public_read:
-                object_acl = self.resource.ObjectAcl(STORAGE_CONST.BUCKET_NAME, file_path)
-                object_acl.put(ACL='public-read')
+                elif file_type == "yaml":
+                    file.write(yaml.safe_dump(data).encode("utf-8"))
 
             print(f"[S3]: Succeed to upload. Filename: [{file_path}]")
 
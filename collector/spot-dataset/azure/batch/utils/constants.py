@@ -23,6 +23,7 @@ class AzureCollector:
         self.S3_LOCATIONS_CALL_HISTORY_JSON_FILENAME = "locations_call_history.json"
         self.S3_LAST_SUBSCRIPTION_ID_AND_LOCATION_JSON_FILENAME = "last_subscription_id_and_location.json"
         self.S3_LOCATIONS_OVER_LIMIT_JSON_FILENAME = "locations_over_limit.json"
+        self.S3_SPS_LAST_COLLECTED_JSON_FILENAME = "sps_last_collected.json"
         
         self.ERROR_LOCATIONS_CALL_HISTORY_JSON_PATH = "sps-collector/azure/saved_variable/error_locations_call_history"
         
@@ -37,6 +38,8 @@ class Storage:
         self.BUCKET_NAME = "spotlake"
         self.DATABASE_NAME = 'spotlake'
         self.TABLE_NAME = 'azure'
+        # write budget of the azure table (records per second), TIMESTREAM_RECORDS_PER_SECOND_AZURE overrides it
+        self.TABLE_RECORDS_PER_SECOND = 5000
         self.SPOT_DATA_COLLECTION_LOG_GROUP_NAME = "Collection-Data-Count"
         self.LOG_STREAM_NAME = "Azure-Count"
 
@@ -1,5 +1,4 @@
 import boto3
-import os
 from botocore.config import Config
 import time
 from datetime import datetime
@@ -8,35 +7,18 @@ import pandas as pd
 import json
 from const_config import Storage, GcpCollector
 from utility import slack_msg_sender
+from utility.s3_stream import S3StreamWriter
+from utility.timestream_records import iter_record_batches, GCP_RECORD_SPEC
+from utility.timestream_writer import TimestreamBatchWriter, table_records_per_second, WRITER_CLIENT_RETRIES
 
 session = boto3.session.Session(region_name='us-west-2')
+# TimestreamBatchWriter owns the retries of the writes
 write_client = session.client('timestream-write',
-                              config=Config(read_timeout=20, max_pool_connections=5000, retries={'max_attempts': 10}))
+                              config=Config(read_timeout=20, max_pool_connections=5000, retries=WRITER_CLIENT_RETRIES))
 
 STORAGE_CONST = Storage()
 LOCAL_PATH = GcpCollector().LOCAL_PATH
 
-# Submit Batch To Timestream
-def submit_batch(records, counter, recursive):
-    if recursive == 10:
-        return
-    try:
-        result = write_client.write_records(DatabaseName=STORAGE_CONST.DATABASE_NAME,
-                                            TableName=STORAGE_CONST.GCP_TABLE_NAME, Records=records,
-                                            CommonAttributes={})
-    except write_client.exceptions.RejectedRecordsException as err:
-        re_records = []
-        for rr in err.response["RejectedRecords"]:
-            slack_msg_sender.send_slack_message({rr['Reason']})
-            print(rr['Reason'])
-            re_records.append(records[rr["RecordIndex"]])
-        submit_batch(re_records, counter, recursive + 1)
-    except Exception as err:
-        slack_msg_sender.send_slack_message(err)
-        print(err)
-        exit()
-
-
 # Check Database And Table Are Exist and Upload Data to Timestream
 def upload_timestream(data, timestamp):
     print(len(data))
@@ -45,34 +27,14 @@ def upload_timestream(data, timestamp):
     time_value = time.mktime(time_value)
     time_value = str(int(round(time_value * 1000)))
 
-    records = []
-    counter = 0
-    for idx, row in data.iterrows():
-
-        dimensions = []
-        for column in data.columns:
-            if column in ['InstanceType', 'Region', 'Ceased']:
-                dimensions.append({'Name': column, 'Value': str(row[column])})
+    writer = TimestreamBatchWriter(write_client, STORAGE_CONST.DATABASE_NAME, STORAGE_CONST.GCP_TABLE_NAME,
+                                   records_per_second=table_records_per_second(
+                                       STORAGE_CONST.GCP_TABLE_NAME, STORAGE_CONST.GCP_TABLE_RECORDS_PER_SECOND),
+                                   notify=slack_msg_sender.send_slack_message)
+    writer.write(iter_record_batches(data, GCP_RECORD_SPEC, time_value))
+    report = writer.close()
 
-        submit_data = {
-            'Dimensions': dimensions,
-            'MeasureName': 'gcp_values',
-            'MeasureValues': [],
-            'MeasureValueType': 'MULTI',
-            'Time': time_value
-        }
-        for column, types in [('OnDemand Price', 'DOUBLE'), ('Spot Price', 'DOUBLE')]:
-            submit_data['MeasureValues'].append({'Name': column, 'Value': str(row[column]), 'Type': types})
-        records.append(submit_data)
-        counter += 1
-        if len(records) == 100:
-            submit_batch(records, counter, 0)
-            records = []
-
-    if len(records) != 0:
-        submit_batch(records, counter, 0)
-
-    print(f"end : {counter}")
+    print(f"end : {report.get('records_written', 0)}")
 
 
 def update_latest(data, timestamp):
@@ -85,19 +47,12 @@ def update_latest(data, timestamp):
     data['time'] = datetime.strftime(timestamp, '%Y-%m-%d %H:%M:%S')
 
     data_dict = data.to_dict(orient='records')
-    with open(f'{LOCAL_PATH}/{filename}', 'w') as f:
-        json.dump(data_dict, f)
 
     s3_path = f'latest_data/{filename}'
     session = boto3.Session()
     s3 = session.client('s3')
-    with open(f"{LOCAL_PATH}/{filename}", 'rb') as f:
-        s3.upload_fileobj(f, STORAGE_CONST.BUCKET_NAME, s3_path)
-
-    ## temporary blocking of access
-    s3 = session.resource('s3')
-    object_acl = s3.ObjectAcl(STORAGE_CONST.BUCKET_NAME, s3_path)
-    response = object_acl.put(ACL='public-read')
+    with S3StreamWriter(s3, STORAGE_CONST.BUCKET_NAME, s3_path, extra_args={'ACL': 'public-read'}) as f:
+        f.write(json.dumps(data_dict).encode('utf-8'))
 
 
 def update_query_selector(changed_df):
@@ -116,25 +71,18 @@ def update_query_selector(changed_df):
 
 
 def save_raw(data, timestamp):
-    SAVE_FILENAME = f"{LOCAL_PATH}/spotlake_" + f"{timestamp}.csv.gz"
     data['Savings'] = round(
         (data['OnDemand Price'] - data['Spot Price']) / data[
             'OnDemand Price'] * 100)
     data['Time'] = datetime.strftime(timestamp, '%Y-%m-%d %H:%M:%S')
     data = data[['Time', 'InstanceType', 'Region', 'OnDemand Price', 'Spot Price', 'Savings']]
     
-    data.to_csv(SAVE_FILENAME, index=False, compression='gzip')
     session = boto3.Session()
     s3 = session.client('s3')
     s3_dir_name = timestamp.strftime("%Y/%m/%d")
     s3_obj_name = timestamp.strftime("%H-%M-%S")
-    with open(SAVE_FILENAME, 'rb') as f:
-        s3.upload_fileobj(
-            f, STORAGE_CONST.BUCKET_NAME, f"rawdata/gcp/{s3_dir_name}/{s3_obj_name}.csv.gz")
-
-    for filename in os.listdir(f"{LOCAL_PATH}/"):
-        if "spotlake_" in filename:
-            os.remove(f"{LOCAL_PATH}/{filename}")
+    with S3StreamWriter(s3, STORAGE_CONST.BUCKET_NAME, f"rawdata/gcp/{s3_dir_name}/{s3_obj_name}.csv.gz") as f:
+        data.to_csv(f, index=False, compression='gzip')
 
 
 def upload_metadata(filename):
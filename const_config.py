@@ -30,6 +30,11 @@ class Storage(object):
     def GCP_TABLE_NAME():
         return "gcp"
 
+    # write budget of the gcp table (records per second), TIMESTREAM_RECORDS_PER_SECOND_GCP overrides it
+    @constant
+    def GCP_TABLE_RECORDS_PER_SECOND():
+        return 5000
+
 
 class AwsCollector(object):
     @constant
@@ -0,0 +1,124 @@
+# Reference implementations for the golden tests of compare_max_instance: the merge-based AWS and Azure functions as
+# they were before the T3/T2 arithmetic moved to utility/max_instance.py, copied unchanged.
+import numpy as np
+import pandas as pd
+
+
+def aws_compare_max_instance(previous_df, new_df, target_capacity):
+    fallback_dict = {50:45, 45:40, 40:35, 35:30, 30:25, 25:20, 20:15, 15:10, 10:5, 5:1, 1:0}
+    fallback_val = fallback_dict.get(target_capacity, 0)
+
+    spotlake_df = new_df.copy()
+
+    merged_df = pd.merge(
+        spotlake_df,
+        previous_df[["InstanceType", "AZ", "SPS", "T3", "T2"]],
+        on=["InstanceType", "AZ"],
+        how="left",
+        suffixes=("", "_prev")
+    )
+
+    # Fill NaN values for _prev columns (new workloads that don't exist in previous data)
+    merged_df["T3_prev"] = merged_df["T3_prev"].fillna(0)
+    merged_df["T2_prev"] = merged_df["T2_prev"].fillna(0)
+    merged_df["SPS_prev"] = merged_df["SPS_prev"].fillna(merged_df["SPS"])
+
+    # Fix SPS when single node SPS
+    if target_capacity == 1:
+        merged_df["SPS"] = merged_df["SPS"].combine_first(merged_df["SPS_prev"])
+
+    # Merge single node SPS with multi node SPS if (multi node SPS) > (single node SPS)
+    merged_df.loc[(merged_df["SPS"] > merged_df["SPS_prev"]), "SPS_prev"] = merged_df["SPS"]
+
+    # Calculate T3
+    merged_df["T3"] = np.where(
+        merged_df["SPS"] >= 3,
+        np.maximum(merged_df["T3"], merged_df["T3_prev"]),
+        np.minimum(fallback_val, merged_df["T3_prev"])
+    )
+
+    # Calculate T2
+    merged_df["T2"] = np.where(
+        merged_df["SPS"] >= 2,
+        np.maximum(merged_df["T2"], merged_df["T2_prev"]),
+        np.minimum(fallback_val, merged_df["T2_prev"])
+    )
+
+    if target_capacity == 1:
+        # When SPS lower than condition, set T3 or T2 to 0
+        merged_df.loc[merged_df["SPS"] <= 2, "T3"] = 0
+        merged_df.loc[merged_df["SPS"] < 2, "T2"] = 0
+    else:
+        # When SPS lower than condition, set T3 or T2 to 0
+        merged_df.loc[merged_df["SPS_prev"] <= 2, "T3"] = 0
+        merged_df.loc[merged_df["SPS_prev"] < 2, "T2"] = 0
+        # Fix SPS to Single node SPS
+        merged_df["SPS"] = merged_df["SPS_prev"]
+
+    # Convert to int
+    for col in ["SPS", "T2", "T3"]:
+        merged_df[col] = merged_df[col].astype("Int64")
+
+    # Drop unnecessary columns
+    merged_df.drop(columns=["T3_prev", "T2_prev", "SPS_prev"], inplace=True)
+
+    return merged_df
+
+
+def azure_compare_max_instance(previous_df, new_df, target_capacity):
+    fallback_dict = {50:45, 45:40, 40:35, 35:30, 30:25, 25:20, 20:15, 15:10, 10:5, 5:1, 1:0}
+    fallback_val = fallback_dict.get(target_capacity, 0)
+
+    # Ensure T2/T3 columns exist in previous_df for legacy compatibility
+    for col in ["T2", "T3"]:
+        if col not in previous_df.columns:
+            previous_df[col] = 0
+
+    merged_df = pd.merge(
+        new_df,
+        previous_df[["InstanceType", "Region", "AvailabilityZone", "DesiredCount", "Score", "T3", "T2"]],
+        on=["InstanceType", "Region", "AvailabilityZone", "DesiredCount"],
+        how="left",
+        suffixes=("", "_prev")
+    )
+
+    if target_capacity == 1:
+        merged_df["Score"] = merged_df["Score"].combine_first(merged_df["Score_prev"])
+
+    merged_df["Score"] = pd.to_numeric(merged_df["Score"], errors='coerce').fillna(-1)
+    merged_df["Score_prev"] = pd.to_numeric(merged_df["Score_prev"], errors='coerce').fillna(-1)
+    merged_df["T3"] = pd.to_numeric(merged_df["T3"], errors='coerce').fillna(0)
+    merged_df["T3_prev"] = pd.to_numeric(merged_df["T3_prev"], errors='coerce').fillna(0)
+    merged_df["T2"] = pd.to_numeric(merged_df["T2"], errors='coerce').fillna(0)
+    merged_df["T2_prev"] = pd.to_numeric(merged_df["T2_prev"], errors='coerce').fillna(0)
+
+    merged_df.loc[(merged_df["Score"] > merged_df["Score_prev"]), "Score_prev"] = merged_df["Score"]
+
+    merged_df["T3"] = np.where(
+        merged_df["Score"] >= 3,
+        np.maximum(merged_df["T3"], merged_df["T3_prev"]),
+        np.minimum(fallback_val, merged_df["T3_prev"])
+    )
+
+    merged_df["T2"] = np.where(
+        merged_df["Score"] >= 2,
+        np.maximum(merged_df["T2"], merged_df["T2_prev"]),
+        np.minimum(fallback_val, merged_df["T2_prev"])
+    )
+
+    if target_capacity == 1:
+        merged_df.loc[merged_df["Score"] <= 2, "T3"] = 0
+        merged_df.loc[merged_df["Score"] < 2, "T2"] = 0
+    else:
+        merged_df.loc[merged_df["Score_prev"] <= 2, "T3"] = 0
+        merged_df.loc[merged_df["Score_prev"] < 2, "T2"] = 0
+        merged_df["Score"] = merged_df["Score_prev"].fillna(merged_df["Score"])
+
+    for col in ["T2", "T3"]:
+        merged_df[col] = merged_df[col].astype(int)
+
+    merged_df["Score"] = pd.to_numeric(merged_df["Score"], errors='coerce').astype("Int64")
+
+    merged_df.drop(columns=["T3_prev", "T2_prev", "Score_prev"], errors='ignore', inplace=True)
+
+    return merged_df
@@ -0,0 +1,23 @@
+import importlib.util
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Import a collector module from its file under a unique name. The AWS and Azure collectors both have modules named
+# compare_data, utils, ... that import their siblings by bare name, so their directories are put on sys.path only while
+# the module is loaded.
+def load_module(name, relative_path, search_paths=()):
+    path = os.path.join(REPO_ROOT, relative_path)
+    added = [os.path.join(REPO_ROOT, search_path) for search_path in search_paths]
+    sys.path[:0] = added
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    finally:
+        for search_path in added:
+            sys.path.remove(search_path)
+    return module
@@ -0,0 +1,103 @@
+import json
+
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from utility import artifact_pointer
+from utility.artifact_io import upload_df
+
+BUCKET = "spotlake-test"
+PREFIX = "rawdata/aws/spot_if"
+
+
+def cycle_key(minute):
+    return f"{PREFIX}/2026/10/18/00-{minute:02d}_spot_if"
+
+
+@pytest.fixture
+def spot_if_df():
+    return pd.DataFrame({
+        "Region": ["us-east-1", "us-west-2", "eu-west-1"] * 100,
+        "InstanceType": [f"m5.{size}" for size in range(300)],
+        "IF": np.tile([3.0, 2.5, 1.0], 100),
+    })
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def read_json(s3_client, key):
+    return json.loads(s3_client.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+
+
+def test_frame_hash_ignores_row_order_index_and_categories(spot_if_df):
+    content_hash = artifact_pointer.frame_hash(spot_if_df)
+
+    assert artifact_pointer.frame_hash(spot_if_df.sample(frac=1, random_state=1)) == content_hash
+    assert artifact_pointer.frame_hash(spot_if_df.set_index(np.arange(300)[::-1])) == content_hash
+    assert artifact_pointer.frame_hash(spot_if_df.astype({"Region": "category", "InstanceType": "category"})) == content_hash
+
+
+def test_frame_hash_changes_with_values_and_columns(spot_if_df):
+    content_hash = artifact_pointer.frame_hash(spot_if_df)
+    changed = spot_if_df.copy()
+    changed.loc[5, "IF"] = 2.0
+
+    assert artifact_pointer.frame_hash(changed) != content_hash
+    assert artifact_pointer.frame_hash(spot_if_df.rename(columns={"IF": "Frequency"})) != content_hash
+
+
+def test_upload_df_if_changed_across_changed_unchanged_changed_cycles(s3_client, spot_if_df):
+    changed = spot_if_df.copy()
+    changed.loc[5, "IF"] = 2.0
+
+    key_1, uploaded_1 = artifact_pointer.upload_df_if_changed(s3_client, spot_if_df, BUCKET, cycle_key(0), PREFIX)
+    key_2, uploaded_2 = artifact_pointer.upload_df_if_changed(
+        s3_client, spot_if_df.sample(frac=1, random_state=2), BUCKET, cycle_key(10), PREFIX)
+    key_3, uploaded_3 = artifact_pointer.upload_df_if_changed(s3_client, changed, BUCKET, cycle_key(20), PREFIX)
+
+    assert (uploaded_1, uploaded_2, uploaded_3) == (True, False, True)
+    assert key_2 == key_1 and key_3 != key_1
+    keys = {item["Key"] for item in s3_client.list_objects_v2(Bucket=BUCKET)["Contents"]}
+    assert {key_1, key_3} <= keys
+    assert not any(key.startswith(cycle_key(10)) and not key.endswith(artifact_pointer.POINTER_SUFFIX) for key in keys)
+
+    pointer = read_json(s3_client, artifact_pointer.pointer_key(cycle_key(10)))
+    assert pointer == {"hash": artifact_pointer.frame_hash(spot_if_df), "key": key_1}
+    assert read_json(s3_client, f"{PREFIX}/latest.json")["key"] == key_3
+
+    df_1, hash_1 = artifact_pointer.load_snapshot(s3_client, BUCKET, cycle_key(0))
+    df_2, hash_2 = artifact_pointer.load_snapshot(s3_client, BUCKET, cycle_key(10))
+    df_3, hash_3 = artifact_pointer.load_snapshot(s3_client, BUCKET, cycle_key(20))
+    pd.testing.assert_frame_equal(df_1, df_2)
+    assert hash_1 == hash_2 != hash_3
+    assert df_3.loc[5, "IF"] == 2.0
+
+
+def test_legacy_artifact_without_pointer_loads_from_its_own_key(s3_client, spot_if_df):
+    key = upload_df(s3_client, spot_if_df, BUCKET, cycle_key(50))
+
+    assert artifact_pointer.resolve_artifact(s3_client, BUCKET, cycle_key(50)) == (cycle_key(50), None)
+    df, content_hash = artifact_pointer.load_snapshot(s3_client, BUCKET, cycle_key(50), columns=["InstanceType", "IF"])
+    assert content_hash is None
+    assert list(df.columns) == ["InstanceType", "IF"] and len(df) == len(spot_if_df)
+    assert key.startswith(cycle_key(50))
+
+
+def test_deleted_snapshot_is_uploaded_again(s3_client, spot_if_df):
+    key_1, _ = artifact_pointer.upload_df_if_changed(s3_client, spot_if_df, BUCKET, cycle_key(0), PREFIX)
+    s3_client.delete_object(Bucket=BUCKET, Key=key_1)
+
+    key_2, uploaded = artifact_pointer.upload_df_if_changed(s3_client, spot_if_df, BUCKET, cycle_key(10), PREFIX)
+
+    assert uploaded and key_2 != key_1 and key_2.startswith(cycle_key(10))
+    df, _ = artifact_pointer.load_snapshot(s3_client, BUCKET, cycle_key(10))
+    assert len(df) == len(spot_if_df)
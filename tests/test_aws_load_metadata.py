@@ -0,0 +1,143 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from moto import mock_aws
+
+from support import load_module
+
+load_metadata = load_module("aws_load_metadata", "collector/spot-dataset/aws/batch/workload/load_metadata.py")
+
+REGIONS = ["us-east-1", "us-west-2", "eu-west-1", "ap-northeast-2", "sa-east-1"]
+PAGE_SIZE = 7
+
+
+def offerings_by_region():
+    rng = random.Random(12)
+    return {
+        region: [{"InstanceType": f"m{rng.randint(0, 30)}.large", "LocationType": "availability-zone",
+                  "Location": f"{region}{rng.choice('abcd')}"} for _ in range(rng.randint(5, 40))]
+        for region in REGIONS
+    }
+
+
+# boto3 session whose EC2 clients are real botocore clients answered by a Stubber: describe_regions on the
+# us-east-1 client, then the describe_instance_type_offerings pages of every region
+class StubbedSession:
+    def __init__(self, offerings):
+        self.offerings = offerings
+        self.stubbers = []
+
+    def client(self, service_name, region_name=None):
+        client = boto3.client(service_name, region_name=region_name, aws_access_key_id="testing",
+                              aws_secret_access_key="testing")
+        stubber = Stubber(client)
+        if self.describe_regions_pending():
+            stubber.add_response("describe_regions", {"Regions": [{"RegionName": region} for region in REGIONS]},
+                                 {"AllRegions": False})
+        else:
+            pages = self.offerings[region_name]
+            for start in range(0, len(pages), PAGE_SIZE):
+                response = {"InstanceTypeOfferings": pages[start:start + PAGE_SIZE]}
+                expected = {"LocationType": "availability-zone"}
+                if start + PAGE_SIZE < len(pages):
+                    response["NextToken"] = str(start + PAGE_SIZE)
+                if start:
+                    expected["NextToken"] = str(start)
+                stubber.add_response("describe_instance_type_offerings", response, expected)
+        stubber.activate()
+        self.stubbers.append(stubber)
+        return client
+
+    def describe_regions_pending(self):
+        return not self.stubbers
+
+
+# the serial crawl num_az_by_region did before it was parallelized, as the reference result
+def serial_num_az_by_region(session):
+    regions = [region["RegionName"] for region in session.client("ec2", region_name="us-east-1")
+               .describe_regions(AllRegions=False)["Regions"]]
+    total_counter = Counter()
+    for region in regions:
+        client = session.client("ec2", region_name=region)
+        describe_args = {"LocationType": "availability-zone"}
+        region_instances = []
+        while True:
+            response = client.describe_instance_type_offerings(**describe_args)
+            for obj in response["InstanceTypeOfferings"]:
+                it, _, az = obj.values()
+                region_instances.append((region, it))
+            if "NextToken" not in response:
+                break
+            describe_args["NextToken"] = response["NextToken"]
+        total_counter += Counter(region_instances)
+
+    workloads = dict()
+    for (region, it), cnt in total_counter.items():
+        workloads.setdefault(it, []).append((region, cnt))
+    return workloads
+
+
+@pytest.fixture
+def stubbed_sessions(monkeypatch):
+    sessions = []
+
+    def session_factory(*args, **kwargs):
+        sessions.append(StubbedSession(offerings_by_region()))
+        return sessions[-1]
+    monkeypatch.setattr(load_metadata.boto3.session, "Session", session_factory)
+    return sessions
+
+
+@pytest.mark.parametrize("max_workers", [1, 4, 16])
+def test_parallel_crawl_matches_the_serial_counter(stubbed_sessions, max_workers):
+    expected = serial_num_az_by_region(StubbedSession(offerings_by_region()))
+
+    workloads = load_metadata.num_az_by_region(max_workers=max_workers)
+
+    assert workloads == expected
+    # same instance type order and region order within each instance type
+    assert list(workloads) == list(expected)
+    for stubber in stubbed_sessions[0].stubbers:
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="spotlake-test")
+        yield client
+
+
+def shift_clock(monkeypatch, delta):
+    class ShiftedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + delta
+    monkeypatch.setattr(load_metadata, "datetime", ShiftedDatetime)
+
+
+def test_cache_is_reused_within_the_ttl_and_refreshed_after_it(stubbed_sessions, s3_client, monkeypatch):
+    key = "rawdata/aws/workloads/metadata_cache.pkl"
+
+    first = load_metadata.cached_num_az_by_region(s3_client, "spotlake-test", key, ttl_sec=3600)
+    second = load_metadata.cached_num_az_by_region(s3_client, "spotlake-test", key, ttl_sec=3600)
+    assert len(stubbed_sessions) == 1
+    assert second == first
+
+    shift_clock(monkeypatch, timedelta(hours=2))
+    third = load_metadata.cached_num_az_by_region(s3_client, "spotlake-test", key, ttl_sec=3600)
+    assert len(stubbed_sessions) == 2
+    assert third == first
+
+
+def test_ttl_zero_always_crawls_and_writes_nothing(stubbed_sessions, s3_client):
+    load_metadata.cached_num_az_by_region(s3_client, "spotlake-test", "metadata.pkl", ttl_sec=0)
+    load_metadata.cached_num_az_by_region(s3_client, "spotlake-test", "metadata.pkl", ttl_sec=0)
+
+    assert len(stubbed_sessions) == 2
+    assert "Contents" not in s3_client.list_objects_v2(Bucket="spotlake-test")
@@ -0,0 +1,126 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from botocore.exceptions import ClientError
+
+from support import load_module
+
+SPS_DIR = "collector/spot-dataset/aws/batch/sps"
+sps_query_api = load_module("sps_query_api", f"{SPS_DIR}/sps_query_api.py")
+sps_async_engine = load_module("aws_sps_async_engine", f"{SPS_DIR}/sps_async_engine.py", search_paths=[SPS_DIR])
+
+TARGET_CAPACITY = 5
+# (instance type, region names, number of responses) scenarios, 3 per workload chunk
+WORKLOAD = [[(f"m{chunk}.{size}", ["us-east-1", "us-west-2"], 2) for size in ("large", "xlarge", "2xlarge")]
+            for chunk in range(6)]
+
+
+# EC2 client of one credential; accounts in `exceeded` have no SPS configuration slot left
+class FakeEC2:
+    def __init__(self, credential_index, exceeded, calls):
+        self.credential_index = credential_index
+        self.exceeded = exceeded
+        self.calls = calls
+
+    def get_spot_placement_scores(self, InstanceTypes, RegionNames, SingleAvailabilityZone, TargetCapacity):
+        self.calls.append(self.credential_index)
+        if self.credential_index in self.exceeded:
+            raise ClientError({"Error": {"Code": "MaxConfigLimitExceeded", "Message": "limit"}},
+                              "GetSpotPlacementScores")
+        return {"SpotPlacementScores": [
+            {"Region": region, "AvailabilityZoneId": f"{region}-az1", "Score": 3} for region in RegionNames]}
+
+
+# fake query_sps input: the real query_sps on the EC2 client of the credential
+def fake_query_func(exceeded, calls):
+    def query_func(credential_index, scenarios):
+        return sps_query_api.query_sps((FakeEC2(credential_index, exceeded, calls), scenarios, TARGET_CAPACITY))
+    return query_func
+
+
+class FakeClientPool:
+    max_clients = 256
+
+    def __init__(self, exceeded, calls):
+        self.exceeded = exceeded
+        self.calls = calls
+
+    def get(self, credential_index, credential):
+        return FakeEC2(credential_index, self.exceeded, self.calls)
+
+
+def run_async_first_collection(allocator, exceeded, calls, credential_count):
+    credentials = pd.DataFrame({"AccessKeyId": [f"key{i}" for i in range(credential_count)]})
+    engine = sps_async_engine.SpsAsyncEngine(FakeClientPool(exceeded, calls), credentials, TARGET_CAPACITY,
+                                             max_in_flight=4)
+    return asyncio.run(engine.run_first_collection(WORKLOAD, allocator))
+
+
+def test_allocator_cycles_from_the_start_index():
+    allocator = sps_query_api.CredentialAllocator(init_index=10, start_index=12, end_index=15)
+
+    assert [allocator.next() for _ in range(7)] == [12, 13, 14, 10, 11, 12, 13]
+    assert allocator.size() == 5
+
+
+def test_rotation_skips_exceeded_credentials_and_reraises_other_errors():
+    allocator = sps_query_api.CredentialAllocator(0, 0, 4)
+    tried = []
+
+    def query(credential_index):
+        tried.append(credential_index)
+        if credential_index < 2:
+            raise ClientError({"Error": {"Code": "MaxConfigLimitExceeded"}}, "GetSpotPlacementScores")
+        if credential_index == 3:
+            raise ClientError({"Error": {"Code": "UnauthorizedOperation"}}, "GetSpotPlacementScores")
+        return "scores"
+
+    assert sps_query_api.query_with_credential_rotation(0, allocator, query) == ("scores", 2)
+    assert tried == [0, 1, 2]
+    with pytest.raises(ClientError):
+        sps_query_api.query_with_credential_rotation(1, allocator, query)
+
+
+def test_serial_mapping_follows_the_allocator_order():
+    calls = []
+    allocator = sps_query_api.CredentialAllocator(0, 0, 8)
+
+    df_list, mapping = sps_query_api.discover_credential_mapping(
+        WORKLOAD, allocator, fake_query_func({0, 3}, calls), max_workers=1)
+
+    assert mapping == {0: 1, 1: 2, 2: 4, 3: 5, 4: 6, 5: 7}
+    assert [df["InstanceType"].iloc[0] for df in df_list] == [chunk[0][0] for chunk in WORKLOAD]
+    assert all(len(df) == 6 for df in df_list)
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_every_chunk_gets_a_credential_with_free_slots(engine):
+    exceeded = {1, 2, 5}
+    calls = []
+    allocator = sps_query_api.CredentialAllocator(0, 0, 10)
+
+    if engine == "thread":
+        df_list, mapping = sps_query_api.discover_credential_mapping(
+            WORKLOAD, allocator, fake_query_func(exceeded, calls), max_workers=4)
+    else:
+        df_list, mapping = run_async_first_collection(allocator, exceeded, calls, 10)
+
+    assert sorted(mapping) == list(range(len(WORKLOAD)))
+    assert not exceeded & set(mapping.values())
+    assert len(set(mapping.values())) == len(WORKLOAD)
+    expected = [sps_query_api.query_sps((FakeEC2(0, set(), []), chunk, TARGET_CAPACITY)) for chunk in WORKLOAD]
+    for df, expected_df in zip(df_list, expected):
+        pd.testing.assert_frame_equal(df, expected_df)
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_all_credentials_exceeded_fails_the_discovery(engine):
+    allocator = sps_query_api.CredentialAllocator(0, 0, 3)
+    exceeded = {0, 1, 2}
+
+    with pytest.raises(Exception, match="All credentials returned MaxConfigLimitExceeded"):
+        if engine == "thread":
+            sps_query_api.discover_credential_mapping(WORKLOAD, allocator, fake_query_func(exceeded, []))
+        else:
+            run_async_first_collection(allocator, exceeded, [], 3)
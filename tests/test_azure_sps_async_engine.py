@@ -0,0 +1,144 @@
+import asyncio
+import email.utils
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from support import load_module
+
+engine = load_module("azure_sps_async_engine", "collector/spot-dataset/azure/batch/sps_module/sps_async_engine.py",
+                     search_paths=["collector/spot-dataset/azure/batch"])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def limiter(initial=8, maximum=16, minimum=1):
+    clock = FakeClock()
+    return engine.AdaptiveConcurrency(initial, maximum, minimum, clock=clock), clock
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_initial_limit_is_clamped():
+    assert engine.AdaptiveConcurrency(50, 16).limit == 16
+    assert engine.AdaptiveConcurrency(0, 16).limit == engine.MIN_CONCURRENCY
+
+
+def test_success_raises_the_limit_up_to_the_maximum():
+    concurrency, _ = limiter(initial=4, maximum=5)
+
+    async def calls(count):
+        for _ in range(count):
+            await concurrency.release(await concurrency.acquire(), "succeeded")
+
+    # about +1 per round of `limit` successful calls
+    run(calls(4))
+    assert 4.9 < concurrency.limit < 5
+    run(calls(10))
+    assert concurrency.limit == 5
+    assert concurrency.in_flight == 0
+
+
+@pytest.mark.parametrize("outcome, decrease", [
+    ("throttled", engine.THROTTLED_DECREASE),
+    ("congested", engine.CONGESTED_DECREASE),
+])
+def test_decrease_down_to_the_minimum(outcome, decrease):
+    concurrency, clock = limiter(initial=8, minimum=2)
+
+    async def call():
+        started_at = await concurrency.acquire()
+        clock.now += 1
+        await concurrency.release(started_at, outcome)
+
+    run(call())
+    assert concurrency.limit == pytest.approx(8 * decrease)
+    for _ in range(20):
+        run(call())
+    assert concurrency.limit == 2
+
+
+def test_calls_in_flight_during_a_decrease_do_not_decrease_again():
+    concurrency, clock = limiter(initial=8)
+
+    async def burst():
+        started = [await concurrency.acquire() for _ in range(4)]
+        clock.now += 1
+        for started_at in started:
+            await concurrency.release(started_at, "throttled")
+        # a call started after the decrease reports new congestion
+        await concurrency.release(await concurrency.acquire(), "throttled")
+
+    run(burst())
+    assert concurrency.limit == pytest.approx(8 * engine.THROTTLED_DECREASE ** 2)
+
+
+def test_acquire_waits_for_a_free_slot():
+    concurrency, _ = limiter(initial=2)
+
+    async def calls():
+        started = [await concurrency.acquire(), await concurrency.acquire()]
+        waiting = asyncio.ensure_future(concurrency.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        await concurrency.release(started[0])
+        await asyncio.wait_for(waiting, timeout=1)
+        assert concurrency.in_flight == 2
+
+    run(calls())
+
+
+def test_pause_holds_new_calls_until_resume_at():
+    concurrency, clock = limiter()
+
+    async def calls():
+        await concurrency.release(await concurrency.acquire(), "throttled", pause=0.05)
+        assert concurrency.resume_at == pytest.approx(clock.now + 0.05)
+        waiting = asyncio.ensure_future(concurrency.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        clock.now += 0.05
+        await asyncio.wait_for(waiting, timeout=1)
+
+    run(calls())
+
+
+def test_pause_is_capped():
+    concurrency, clock = limiter()
+
+    async def call():
+        await concurrency.release(await concurrency.acquire(), "throttled", pause=3600)
+
+    run(call())
+    assert concurrency.resume_at == clock.now + engine.MAX_SUBSCRIPTION_PAUSE
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "17"}, 17.0),
+    ({"Retry-After": "2.5"}, 2.5),
+    ({"Retry-After": "-3"}, 0.0),
+    (CaseInsensitiveDict({"retry-after": "5"}), 5.0),
+    ({"Retry-After": email.utils.format_datetime(datetime(2001, 1, 1, tzinfo=timezone.utc), usegmt=True)}, 0.0),
+    ({"Retry-After": "soon"}, None),
+    ({"Retry-After": ""}, None),
+    ({}, None),
+    (None, None),
+])
+def test_parse_retry_after(headers, expected):
+    assert engine.parse_retry_after(headers) == expected
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+    seconds = engine.parse_retry_after({"Retry-After": email.utils.format_datetime(retry_at, usegmt=True)})
+
+    assert 115 <= seconds <= 120
@@ -0,0 +1,67 @@
+from support import load_module
+
+planner = load_module("azure_sps_request_planner",
+                      "collector/spot-dataset/azure/batch/sps_module/sps_request_planner.py")
+
+# rows of the request pool; none of them can be packed with another (9 instance types in any two)
+ROWS = [([f"region{r}"], [f"sku{r}{i}" for i in range(4)]) for r in range(6)]
+
+
+def planned_keys(calls):
+    return [planner.row_key(*row) for call in calls for row in call.rows]
+
+
+def run(desired_count, available_calls, last_collected, collected_at):
+    plan = planner.plan_sps_calls(ROWS, [desired_count], available_calls, last_collected, retry_reserve=0)
+    state = plan.last_collected_after(last_collected, range(len(plan.calls)), collected_at)
+    return plan, state
+
+
+def test_rows_are_packed_within_the_call_shape():
+    rows = [(["a", "b"], ["x"]), (["a"], ["y"]), (["c"], ["x", "y"])]
+    plan = planner.plan_sps_calls(rows, [5], 100, retry_reserve=0)
+
+    assert len(plan.calls) == 1
+    call = plan.calls[0]
+    assert len(call.regions) <= planner.MAX_REGIONS_PER_CALL
+    assert len(call.instance_types) <= planner.MAX_INSTANCE_TYPES_PER_CALL
+    assert call.requested("A", "x") and call.requested("c", "Y")
+    assert not call.requested("b", "y")
+    assert call.requested("other", "x")
+
+
+def test_partial_plan_defers_the_freshest_calls():
+    plan = planner.plan_sps_calls(ROWS, [5], 4, retry_reserve=0)
+
+    assert not plan.covers_full_sweep()
+    assert len(plan.calls) == 4 and len(plan.deferred) == 2
+    assert "Partial run" in plan.report()
+
+
+def test_history_of_other_desired_counts_survives_a_run():
+    _, state = run(5, 100, {}, "2026-01-01T00:00:00")
+    _, state = run(10, 100, state, "2026-01-01T00:10:00")
+
+    assert set(state) == {"5", "10"}
+    assert set(state["5"].values()) == {"2026-01-01T00:00:00"}
+    assert set(state["10"].values()) == {"2026-01-01T00:10:00"}
+
+
+def test_deferred_rows_come_first_when_their_desired_count_comes_round():
+    first, state = run(5, 4, {}, "2026-01-01T00:00:00")
+    deferred = planned_keys(first.deferred)
+    _, state = run(10, 100, state, "2026-01-01T00:10:00")
+    second, state = run(5, 2, state, "2026-01-01T01:40:00")
+
+    assert planned_keys(second.calls) == deferred
+    assert set(planned_keys(second.deferred)).isdisjoint(deferred)
+    assert all(state["5"][key] == "2026-01-01T01:40:00" for key in deferred)
+    assert set(state["10"].values()) == {"2026-01-01T00:10:00"}
+
+
+def test_rows_no_longer_requested_are_pruned_only_in_the_planned_count():
+    state = {"5": {"gone|row": "2025-12-31T00:00:00"}, "10": {"gone|row": "2025-12-31T00:00:00"}}
+    _, state = run(5, 100, state, "2026-01-01T00:00:00")
+
+    assert "gone|row" not in state["5"]
+    assert state["10"] == {"gone|row": "2025-12-31T00:00:00"}
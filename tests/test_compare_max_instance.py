@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+import pytest
+
+import baseline_max_instance
+from support import load_module
+
+aws = load_module("aws_merge_compare_data", "collector/spot-dataset/aws/batch/merge/compare_data.py")
+azure = load_module("azure_merge_compare_data", "collector/spot-dataset/azure/batch/merge/compare_data.py")
+
+SNAPSHOTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "max_instance")
+TARGET_CAPACITIES = [1, 5, 10, 20, 45, 50, 7]
+
+
+# previous / current collections recorded for the golden tests; the previous snapshots contain duplicated keys, missing
+# scores and workloads that are new in the current snapshot
+def read_snapshot(name):
+    return pd.read_csv(os.path.join(SNAPSHOTS, name), dtype={"AvailabilityZone": str})
+
+
+def aws_snapshots(target_capacity):
+    previous_df = read_snapshot("aws_previous.csv")
+    new_df = read_snapshot("aws_current.csv")
+    new_df["T3"] = target_capacity
+    new_df["T2"] = target_capacity
+    return previous_df, new_df
+
+
+def azure_snapshots(target_capacity):
+    previous_df = read_snapshot("azure_previous.csv")
+    new_df = read_snapshot("azure_current.csv")
+    new_df["DesiredCount"] = target_capacity
+    new_df["T3"] = target_capacity
+    new_df["T2"] = target_capacity
+    return previous_df, new_df
+
+
+@pytest.mark.parametrize("target_capacity", TARGET_CAPACITIES)
+def test_aws_matches_baseline(target_capacity):
+    previous_df, new_df = aws_snapshots(target_capacity)
+    expected = baseline_max_instance.aws_compare_max_instance(previous_df.copy(), new_df.copy(), target_capacity)
+    result = aws.compare_max_instance(previous_df.copy(), new_df.copy(), target_capacity)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize("target_capacity", TARGET_CAPACITIES)
+def test_azure_matches_baseline(target_capacity):
+    previous_df, new_df = azure_snapshots(target_capacity)
+    expected = baseline_max_instance.azure_compare_max_instance(previous_df.copy(), new_df.copy(), target_capacity)
+    result = azure.compare_max_instance(previous_df.copy(), new_df.copy(), target_capacity)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_azure_previous_without_t2_t3_matches_baseline():
+    previous_df, new_df = azure_snapshots(5)
+    previous_df = previous_df.drop(columns=["T2", "T3"])
+    expected_previous, result_previous = previous_df.copy(), previous_df.copy()
+    expected = baseline_max_instance.azure_compare_max_instance(expected_previous, new_df.copy(), 5)
+    result = azure.compare_max_instance(result_previous, new_df.copy(), 5)
+
+    pd.testing.assert_frame_equal(result, expected)
+    # both add the missing columns to the caller's previous_df
+    pd.testing.assert_frame_equal(result_previous, expected_previous)
+
+
+def test_duplicated_previous_keys_repeat_the_current_row():
+    previous_df, new_df = aws_snapshots(5)
+    assert previous_df.duplicated(["InstanceType", "AZ"]).any()
+
+    result = aws.compare_max_instance(previous_df, new_df, 5)
+    duplicated = previous_df.groupby(["InstanceType", "AZ"]).size().gt(1).sum()
+    new_keys = (~new_df.set_index(["InstanceType", "AZ"]).index.isin(
+        previous_df.set_index(["InstanceType", "AZ"]).index)).sum()
+    assert len(result) == len(new_df) + duplicated
+    assert new_keys > 0
+
+
+def test_single_node_score_falls_back_to_previous_score():
+    previous_df, new_df = aws_snapshots(1)
+    result = aws.compare_max_instance(previous_df, new_df, 1)
+
+    missing = new_df.loc[new_df["SPS"].isna(), ["InstanceType", "AZ"]]
+    previous = previous_df.drop_duplicates(["InstanceType", "AZ"]).set_index(["InstanceType", "AZ"])["SPS"]
+    for instance_type, az in missing.itertuples(index=False):
+        score = result.loc[(result["InstanceType"] == instance_type) & (result["AZ"] == az), "SPS"].iloc[0]
+        if (instance_type, az) in previous.index and pd.notna(previous[(instance_type, az)]):
+            assert score == previous[(instance_type, az)]
+        else:
+            assert pd.isna(score)
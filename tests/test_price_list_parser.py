@@ -0,0 +1,69 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from support import load_module
+
+price_list_parser = load_module("aws_price_price_list_parser", "collector/spot-dataset/aws/batch/price/price_list_parser.py")
+
+# one get_products page for us-east-1 with the filters of get_ondemand_price_region(): products with and without
+# Reserved terms, and one instance type listed with an on-demand price of 0.0
+PAYLOAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "price_list", "get_products_us-east-1.json")
+
+
+@pytest.fixture(scope="module")
+def price_list():
+    with open(PAYLOAD) as f:
+        return json.load(f)["PriceList"]
+
+
+# the expressions of get_ondemand_price() before price_list_parser.py
+def json_loads_product(price_info):
+    instance_type = json.loads(price_info)['product']['attributes']['instanceType']
+    instance_price = float(list(list(json.loads(price_info)['terms']['OnDemand'].values())[0]['priceDimensions'].values())[0]['pricePerUnit']['USD'])
+    return instance_type, instance_price
+
+
+def test_parse_product_matches_json_loads(price_list):
+    for price_info in price_list:
+        assert price_list_parser.parse_product(price_info) == json_loads_product(price_info)
+
+
+@pytest.mark.parametrize("encode", [
+    lambda price_info: json.dumps(json.loads(price_info), indent=4),
+    lambda price_info: price_info.encode(),
+], ids=["pretty-printed", "bytes"])
+def test_parse_product_other_encodings(price_list, encode):
+    for price_info in price_list:
+        assert price_list_parser.parse_product(encode(price_info)) == json_loads_product(price_info)
+
+
+def test_parse_product_falls_back_to_full_decode(price_list):
+    decoded = []
+
+    def loads(price_info):
+        decoded.append(price_info)
+        return json.loads(price_info)
+
+    # the key scan reads the payload documents without a full decode
+    for price_info in price_list:
+        price_list_parser.parse_product(price_info, loads)
+    assert decoded == []
+
+    # a key written with an escape is not found by str.find, but is the same key to a JSON decoder
+    escaped = price_list[0].replace('"instanceType"', '"instance\\u0054ype"')
+    assert price_list_parser.parse_product(escaped, loads) == json_loads_product(price_list[0])
+    assert decoded == [escaped]
+
+
+def test_parse_price_list_skips_unavailable(price_list):
+    expected = [product for product in map(json_loads_product, price_list) if product[1] != 0.0]
+    assert len(expected) == len(price_list) - 1
+
+    instance_types, prices = price_list_parser.parse_price_list(price_list)
+
+    assert instance_types == [instance_type for instance_type, _ in expected]
+    assert prices.dtype == np.float64
+    np.testing.assert_array_equal(prices, [price for _, price in expected])
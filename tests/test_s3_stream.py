@@ -0,0 +1,98 @@
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from utility.s3_stream import MIN_PART_SIZE, S3StreamWriter
+
+BUCKET = "spotlake-test"
+KEY = "rawdata/aws/2026/10/18/00-00.csv.gz"
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+# forwards to the real client and fails the upload_part call of `failing_part`
+class FailingPartClient:
+    def __init__(self, s3_client, failing_part):
+        self.s3_client = s3_client
+        self.failing_part = failing_part
+
+    def upload_part(self, **kwargs):
+        if kwargs["PartNumber"] == self.failing_part:
+            raise ClientError({"Error": {"Code": "InternalError", "Message": "InternalError"}}, "UploadPart")
+        return self.s3_client.upload_part(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.s3_client, name)
+
+
+def write_in_chunks(stream, data, chunk_size=1024 * 1024):
+    for start in range(0, len(data), chunk_size):
+        stream.write(data[start:start + chunk_size])
+
+
+def assert_no_object(s3_client):
+    assert s3_client.list_objects_v2(Bucket=BUCKET).get("KeyCount") == 0
+    assert s3_client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+
+
+def test_multipart_upload_larger_than_one_part(s3_client):
+    data = os.urandom(MIN_PART_SIZE * 5 // 2)
+
+    with S3StreamWriter(s3_client, BUCKET, KEY, part_size=MIN_PART_SIZE, max_inflight_parts=2) as stream:
+        write_in_chunks(stream, data)
+        assert stream.tell() == len(data)
+
+    response = s3_client.get_object(Bucket=BUCKET, Key=KEY)
+    assert response["Body"].read() == data
+    # a multipart ETag ends with the number of parts
+    assert response["ETag"].strip('"').endswith("-3")
+    assert s3_client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+
+
+def test_small_object_is_a_single_put(s3_client):
+    data = b"InstanceType,Region,AZ\nm5.large,us-east-1,use1-az1\n"
+
+    with S3StreamWriter(s3_client, BUCKET, KEY, extra_args={"ContentType": "text/csv"}) as stream:
+        stream.write(data)
+    assert stream.upload_id is None
+
+    response = s3_client.get_object(Bucket=BUCKET, Key=KEY)
+    assert response["Body"].read() == data
+    assert "-" not in response["ETag"]
+    assert response["ContentType"] == "text/csv"
+
+
+def test_error_in_the_with_block_aborts_the_upload(s3_client):
+    with pytest.raises(RuntimeError):
+        with S3StreamWriter(s3_client, BUCKET, KEY, part_size=MIN_PART_SIZE) as stream:
+            write_in_chunks(stream, os.urandom(MIN_PART_SIZE + 1024))
+            assert stream.upload_id is not None
+            raise RuntimeError("serialization failed")
+
+    assert stream.closed
+    assert_no_object(s3_client)
+
+
+def test_failed_part_aborts_the_upload(s3_client):
+    stream = S3StreamWriter(FailingPartClient(s3_client, failing_part=2), BUCKET, KEY, part_size=MIN_PART_SIZE)
+    write_in_chunks(stream, os.urandom(MIN_PART_SIZE * 2 + 1024))
+
+    with pytest.raises(ClientError):
+        stream.close()
+
+    assert stream.closed
+    assert_no_object(s3_client)
+
+
+def test_part_size_below_the_s3_minimum_is_rejected(s3_client):
+    with pytest.raises(ValueError):
+        S3StreamWriter(s3_client, BUCKET, KEY, part_size=MIN_PART_SIZE - 1)
@@ -0,0 +1,151 @@
+import http.server
+import json
+import os
+import threading
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from support import load_module
+from utility import spot_advisor
+
+collect_if = load_module("aws_if_collect_if", "collector/spot-dataset/aws/batch/if/collect_if.py")
+
+# a reduced copy of spot-advisor-data.json: 4 regions, Linux and Windows advice, all five ranges
+FEED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "spot_advisor", "spot-advisor-data.json")
+BUCKET = collect_if.BUCKET_NAME
+CACHE_KEY = collect_if.SPOT_ADVISOR_CACHE_KEY
+
+
+def read_feed():
+    with open(FEED, "rb") as f:
+        return f.read()
+
+
+# feed server answering conditional GETs like S3: If-None-Match is checked first, If-Modified-Since only without it
+class FeedHandler(http.server.BaseHTTPRequestHandler):
+    body = b""
+    etag = '"1"'
+    last_modified = "Sat, 17 Oct 2026 23:50:00 GMT"
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if_none_match = self.headers.get("If-None-Match")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_none_match == self.etag or (if_none_match is None and if_modified_since == self.last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed_server():
+    FeedHandler.body = read_feed()
+    FeedHandler.etag = '"1"'
+    FeedHandler.requests = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/spot-advisor-data.json"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_parse_linux_advice():
+    spotinfo_df = spot_advisor.parse_spot_advisor(read_feed())
+
+    assert list(spotinfo_df.columns) == ["Region", "InstanceType", "IF"]
+    assert spotinfo_df["IF"].dtype == "float64"
+    assert len(spotinfo_df) == 10
+    assert "me-central-1" not in set(spotinfo_df["Region"])
+    advice = spotinfo_df.set_index(["Region", "InstanceType"])["IF"]
+    assert advice[("us-east-1", "m5.large")] == 3.0
+    assert advice[("us-east-1", "c5.xlarge")] == 2.5
+    assert advice[("us-east-1", "r5.2xlarge")] == 2.0
+    assert advice[("eu-west-1", "c5.xlarge")] == 1.5
+    assert advice[("us-east-1", "p3.2xlarge")] == 1.0
+
+
+def test_parse_other_os():
+    spotinfo_df = spot_advisor.parse_spot_advisor(read_feed(), os_name="Windows")
+
+    assert len(spotinfo_df) == 5
+    assert spotinfo_df.set_index(["Region", "InstanceType"])["IF"][("me-central-1", "m5.large")] == 2.0
+
+
+def test_fetch_file_url():
+    body, etag, _ = spot_advisor.fetch_spot_advisor("file://" + FEED)
+
+    assert body == read_feed()
+    assert etag is None
+
+
+def test_unchanged_feed_is_answered_with_304_and_read_from_the_cache(s3_client, feed_server):
+    spotinfo_df, changed = spot_advisor.load_spot_advisor(s3_client, BUCKET, CACHE_KEY, feed_server)
+    assert changed
+    cached = s3_client.get_object(Bucket=BUCKET, Key=CACHE_KEY)
+    assert cached["Body"].read() == read_feed()
+    assert cached["Metadata"] == {spot_advisor.ETAG_METADATA: FeedHandler.etag,
+                                  spot_advisor.LAST_MODIFIED_METADATA: FeedHandler.last_modified}
+
+    cached_df, changed = spot_advisor.load_spot_advisor(s3_client, BUCKET, CACHE_KEY, feed_server)
+
+    assert not changed
+    assert FeedHandler.requests[1]["If-None-Match"] == FeedHandler.etag
+    assert FeedHandler.requests[1]["If-Modified-Since"] == FeedHandler.last_modified
+    pd.testing.assert_frame_equal(cached_df, spotinfo_df)
+    assert s3_client.get_object(Bucket=BUCKET, Key=CACHE_KEY)["ETag"] == cached["ETag"]
+
+
+def test_last_modified_alone_is_sent(s3_client, feed_server):
+    s3_client.put_object(Bucket=BUCKET, Key=CACHE_KEY, Body=read_feed(),
+                         Metadata={spot_advisor.LAST_MODIFIED_METADATA: FeedHandler.last_modified})
+
+    _, changed = spot_advisor.load_spot_advisor(s3_client, BUCKET, CACHE_KEY, feed_server)
+
+    assert not changed
+    assert "If-None-Match" not in FeedHandler.requests[0]
+
+
+def test_changed_feed_replaces_the_cache(s3_client, feed_server):
+    spot_advisor.load_spot_advisor(s3_client, BUCKET, CACHE_KEY, feed_server)
+    FeedHandler.etag = '"2"'
+    feed = json.loads(FeedHandler.body)
+    feed["spot_advisor"]["us-east-1"]["Linux"]["m5.large"]["r"] = 4
+    FeedHandler.body = json.dumps(feed).encode()
+
+    spotinfo_df, changed = spot_advisor.load_spot_advisor(s3_client, BUCKET, CACHE_KEY, feed_server)
+
+    assert changed
+    assert spotinfo_df.set_index(["Region", "InstanceType"])["IF"][("us-east-1", "m5.large")] == 1.0
+    cached = s3_client.get_object(Bucket=BUCKET, Key=CACHE_KEY)
+    assert cached["Metadata"][spot_advisor.ETAG_METADATA] == '"2"'
+    assert cached["Body"].read() == FeedHandler.body
+
+
+def test_collect_spot_if_uses_the_cache(s3_client, feed_server):
+    spotinfo_df = collect_if.collect_spot_if(s3_client, feed_server)
+    cached_df = collect_if.collect_spot_if(s3_client, feed_server)
+
+    pd.testing.assert_frame_equal(cached_df, spotinfo_df)
+    assert len(FeedHandler.requests) == 2
+    assert FeedHandler.requests[1]["If-None-Match"] == FeedHandler.etag
@@ -0,0 +1,205 @@
+import http.server
+import threading
+
+import boto3
+import pytest
+from botocore.config import Config
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+
+from utility import timestream_writer
+from utility.timestream_writer import TimestreamBatchWriter, deduplicate_records, table_records_per_second
+
+
+def record(dimension, time="1760745600000"):
+    return {"Dimensions": [{"Name": "InstanceType", "Value": dimension}], "MeasureName": "aws_values", "Time": time}
+
+
+def batches(count, size=100):
+    return [[record(f"b{batch}-r{index}") for index in range(size)] for batch in range(count)]
+
+
+def client_error(code, **extra):
+    return ClientError({"Error": {"Code": code, "Message": code}, **extra}, "WriteRecords")
+
+
+# local stand-in for the timestream-write client; `script` maps the n-th WriteRecords call (1-based) to an error
+# factory taking the records of that call, every other call succeeds
+class FakeTimestreamClient:
+    def __init__(self, script=None):
+        self.script = script or {}
+        self.calls = []
+        self.written = []
+        self.lock = threading.Lock()
+
+    def write_records(self, DatabaseName, TableName, Records, CommonAttributes):
+        with self.lock:
+            self.calls.append(list(Records))
+            error = self.script.get(len(self.calls))
+            if error is None:
+                self.written += Records
+                return {"RecordsIngested": {"Total": len(Records)}}
+            err = error(Records)
+            if isinstance(err, ClientError) and err.response["Error"]["Code"] == "RejectedRecordsException":
+                rejected = {rr["RecordIndex"] for rr in err.response["RejectedRecords"]}
+                self.written += [r for i, r in enumerate(Records) if i not in rejected]
+        raise err
+
+
+def writer_for(client, notifications, **kwargs):
+    kwargs.setdefault("max_workers", 1)
+    return TimestreamBatchWriter(client, "spotlake", "aws", records_per_second=100000, base_delay=0.001,
+                                 max_delay=0.01, notify=notifications.append, **kwargs)
+
+
+def test_throttled_batches_are_retried_and_pause_the_bucket(monkeypatch):
+    pauses = []
+    real_pause = timestream_writer.TokenBucket.pause
+    monkeypatch.setattr(timestream_writer.TokenBucket, "pause",
+                        lambda self, seconds: pauses.append(seconds) or real_pause(self, seconds))
+    throttled = lambda records: client_error("ThrottlingException")
+    client = FakeTimestreamClient({1: throttled, 2: throttled, 4: throttled})
+    notifications = []
+
+    writer = writer_for(client, notifications)
+    writer.write(batches(3))
+    report = writer.close()
+
+    assert report["records_written"] == report["records"] == 300
+    assert report["throttled"] == 3 and len(pauses) == 3
+    assert len(client.written) == 300
+    assert notifications == []
+
+
+def test_throttling_beyond_max_attempts_fails_the_batch():
+    client = FakeTimestreamClient({n: (lambda records: client_error("ThrottlingException")) for n in range(1, 4)})
+    notifications = []
+
+    writer = writer_for(client, notifications, max_attempts=3)
+    writer.write(batches(1))
+    report = writer.close()
+
+    assert report["records_failed"] == 100
+    assert report["errors"] == {"ThrottlingException": 1}
+    assert len(notifications) == 1
+
+
+def test_connection_errors_are_retried():
+    client = FakeTimestreamClient({
+        1: lambda records: EndpointConnectionError(endpoint_url="https://ingest.timestream.us-west-2.amazonaws.com"),
+        2: lambda records: ReadTimeoutError(endpoint_url="https://ingest.timestream.us-west-2.amazonaws.com"),
+    })
+    notifications = []
+
+    writer = writer_for(client, notifications)
+    writer.write(batches(1))
+    report = writer.close()
+
+    assert report["records_written"] == 100
+    assert report["transient_errors"] == 2
+    assert len(client.calls) == 3
+    assert notifications == []
+
+
+# timestream-write endpoint answering every WriteRecords call with a throttling error
+class ThrottlingHandler(http.server.BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).calls += 1
+        body = b'{"__type": "ThrottlingException", "message": "Rate exceeded"}'
+        self.send_response(400)
+        self.send_header("Content-Type", "application/x-amz-json-1.0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_writer_client_retries_leave_the_retries_to_the_writer():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = boto3.client("timestream-write", region_name="us-west-2", endpoint_url=f"http://127.0.0.1:{server.server_port}",
+                          aws_access_key_id="testing", aws_secret_access_key="testing",
+                          config=Config(retries=timestream_writer.WRITER_CLIENT_RETRIES))
+    notifications = []
+
+    writer = writer_for(client, notifications, max_attempts=3)
+    writer.write(batches(1))
+    report = writer.close()
+    server.shutdown()
+    server.server_close()
+
+    # one request per writer attempt
+    assert ThrottlingHandler.calls == 3
+    assert report["throttled"] == 3 and report["records_failed"] == 100
+
+
+def test_rejected_records_are_deduplicated_before_the_retry():
+    def rejected(records):
+        # records 0 and 1 are the same record sent twice, record 2 is a different one
+        return client_error("RejectedRecordsException", RejectedRecords=[
+            {"RecordIndex": 0, "Reason": "Duplicate"}, {"RecordIndex": 1, "Reason": "Duplicate"},
+            {"RecordIndex": 2, "Reason": "Version"}])
+    client = FakeTimestreamClient({1: rejected})
+    batch = [record("dup"), record("dup"), record("other")] + [record(f"r{i}") for i in range(7)]
+    notifications = []
+
+    writer = writer_for(client, notifications)
+    writer.write([batch])
+    report = writer.close()
+
+    assert client.calls[1] == [record("dup"), record("other")]
+    assert report["records_deduplicated"] == 1
+    assert report["rejected_retries"] == 1
+    assert report["rejected_reasons"] == {"Duplicate": 2, "Version": 1}
+    assert report["records_written"] == 9
+    assert notifications == []
+
+
+def test_records_still_rejected_after_the_retries_are_reported_once():
+    always_rejected = lambda records: client_error(
+        "RejectedRecordsException", RejectedRecords=[{"RecordIndex": 0, "Reason": "Invalid"}])
+    client = FakeTimestreamClient({n: always_rejected for n in range(1, 10)})
+    notifications = []
+
+    writer = writer_for(client, notifications, max_rejected_retries=2)
+    writer.write(batches(2, size=5))
+    report = writer.close()
+
+    assert report["records_rejected"] == 2
+    assert report["records_written"] == 8
+    assert len(notifications) == 1
+    assert "rejected 2" in notifications[0]
+
+
+def test_close_reports_once_for_all_batches():
+    validation = lambda records: client_error("ValidationException")
+    client = FakeTimestreamClient({2: validation, 3: validation})
+    notifications = []
+
+    writer = writer_for(client, notifications, max_workers=4)
+    writer.write(batches(5, size=10))
+    report = writer.close()
+
+    assert report["batches"] == 5
+    assert report["records_failed"] == 20 and report["records_written"] == 30
+    assert report["errors"] == {"ValidationException": 2}
+    assert len(notifications) == 1
+
+
+def test_deduplicate_records_keeps_one_record_per_identity():
+    assert deduplicate_records([record("a"), record("a"), record("a", time="2"), record("b")]) == [
+        record("a"), record("a", time="2"), record("b")]
+
+
+@pytest.mark.parametrize("value, expected", [(None, 5000), ("", 5000), ("1200", 1200)])
+def test_table_records_per_second_reads_the_table_variable(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv("TIMESTREAM_RECORDS_PER_SECOND_AWS", raising=False)
+    else:
+        monkeypatch.setenv("TIMESTREAM_RECORDS_PER_SECOND_AWS", value)
+
+    assert table_records_per_second("aws", 5000) == expected
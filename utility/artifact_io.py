@@ -0,0 +1,95 @@
+# ------ import module ------
+import io
+import gzip
+import pickle
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ------ import user module ------
+from utility.s3_stream import S3StreamWriter
+
+# Intermediate collector artifacts (SPS, IF, spot/on-demand price) are stored as Parquet (zstd) by default.
+# Keys written before the switch are pickle.gz, so readers fall back to them when no Parquet object exists.
+DEFAULT_FORMAT = "parquet"
+FORMAT_EXTENSIONS = {
+    "parquet": ".parquet",
+    "pickle": ".pkl.gz",
+}
+
+
+# return the key for an artifact path without extension, e.g. ".../02-10_sps_50" -> ".../02-10_sps_50.parquet"
+def artifact_key(base_key, fmt=DEFAULT_FORMAT):
+    return f"{base_key}{FORMAT_EXTENSIONS[fmt]}"
+
+
+# detect artifact format from the key extension
+def artifact_format(key):
+    for fmt, extension in FORMAT_EXTENSIONS.items():
+        if key.endswith(extension):
+            return fmt
+    raise ValueError(f"Unknown artifact format: {key}")
+
+
+# strip a known artifact extension from the key
+def strip_artifact_extension(key):
+    return key[:-len(FORMAT_EXTENSIONS[artifact_format(key)])]
+
+
+# deserialize DataFrame, reading only `columns` and rows matching `filters` (pyarrow DNF filter format)
+def loads_df(body, fmt, columns=None, filters=None):
+    if fmt == "parquet":
+        table = pq.read_table(io.BytesIO(body), columns=columns, filters=filters)
+        return table.to_pandas()
+
+    df = pickle.load(gzip.GzipFile(fileobj=io.BytesIO(body)))
+    if columns is not None:
+        df = df[columns]
+    if filters is not None:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        df = table.filter(pq.filters_to_expression(filters)).to_pandas()
+    return df
+
+
+# serialize DataFrame into a writable binary stream
+def write_df(df, stream, fmt=DEFAULT_FORMAT):
+    if fmt == "parquet":
+        df.to_parquet(stream, engine="pyarrow", compression="zstd", index=False)
+    elif fmt == "pickle":
+        with gzip.GzipFile(fileobj=stream, mode="wb") as gz:
+            pickle.dump(df, gz)
+    else:
+        raise ValueError(f"Unknown artifact format: {fmt}")
+
+
+# serialize DataFrame in memory
+def dumps_df(df, fmt=DEFAULT_FORMAT):
+    buffer = io.BytesIO()
+    write_df(df, buffer, fmt)
+    return buffer.getvalue()
+
+
+# stream DataFrame to S3 without going through local temp files and return the written key
+def upload_df(s3_client, df, bucket, base_key, fmt=DEFAULT_FORMAT):
+    key = artifact_key(base_key, fmt)
+    with S3StreamWriter(s3_client, bucket, key) as stream:
+        write_df(df, stream, fmt)
+    return key
+
+
+# load DataFrame from S3
+# `key` may be given with or without extension; every known format is tried in order, Parquet first
+def load_df(s3_client, bucket, key, columns=None, filters=None):
+    try:
+        base_key = strip_artifact_extension(key)
+        candidates = [key] + [artifact_key(base_key, fmt) for fmt in FORMAT_EXTENSIONS if artifact_key(base_key, fmt) != key]
+    except ValueError:
+        candidates = [artifact_key(key, fmt) for fmt in FORMAT_EXTENSIONS]
+
+    for candidate in candidates:
+        try:
+            body = s3_client.get_object(Bucket=bucket, Key=candidate)["Body"].read()
+        except s3_client.exceptions.NoSuchKey:
+            continue
+        return loads_df(body, artifact_format(candidate), columns=columns, filters=filters)
+
+    raise FileNotFoundError(f"No artifact found in s3://{bucket} for any of {candidates}")
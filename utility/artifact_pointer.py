@@ -0,0 +1,102 @@
+# ------ import module ------
+import json
+import hashlib
+from datetime import datetime, timezone
+import pandas as pd
+
+# ------ import user module ------
+from utility.artifact_io import DEFAULT_FORMAT, upload_df, load_df
+
+# Skip-unchanged mode for collector artifacts that rarely change between cycles (spot IF, spot price)
+# A collector hashes its normalized DataFrame and only uploads a new snapshot when the hash differs from the last one.
+# Every cycle writes a small pointer next to where the snapshot would be, naming the snapshot that holds its data:
+#   {artifact prefix}/latest.json                          {"hash", "key", "updated_at"} of the last real snapshot
+#   {artifact prefix}/YYYY/MM/DD/HH-MM_<name>.pointer.json  {"hash", "key"} of the snapshot for that cycle
+# The merge stage resolves the pointer of its cycle and falls back to the cycle's own key for data written before
+# pointers existed.
+# Trade-off: an unchanged cycle stores no snapshot bytes, but costs more S3 requests. The collector does a latest.json
+# GET, a HEAD of the last snapshot and a pointer PUT, and the merge does a pointer GET before the snapshot GET.
+POINTER_SUFFIX = ".pointer.json"
+LATEST_FILENAME = "latest.json"
+
+
+# content hash of a DataFrame that does not depend on row order, index or categorical encoding
+def frame_hash(df):
+    normalized = df.reset_index(drop=True)
+    for column in normalized.columns:
+        if isinstance(normalized[column].dtype, pd.CategoricalDtype):
+            normalized[column] = normalized[column].astype(normalized[column].cat.categories.dtype)
+    columns = list(normalized.columns)
+    if columns:
+        normalized = normalized.sort_values(columns, kind="mergesort").reset_index(drop=True)
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[column, normalized[column].dtype.kind] for column in columns]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(normalized, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _get_json(s3_client, bucket, key):
+    try:
+        return json.loads(s3_client.get_object(Bucket=bucket, Key=key)["Body"].read())
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+
+def _put_json(s3_client, bucket, key, data):
+    s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(data).encode("utf-8"), ContentType="application/json")
+
+
+def _exists(s3_client, bucket, key):
+    try:
+        s3_client.head_object(Bucket=bucket, Key=key)
+        return True
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise e
+
+
+def pointer_key(base_key):
+    return f"{base_key}{POINTER_SUFFIX}"
+
+
+# upload `df` to `base_key` unless it equals the last snapshot recorded in `{artifact_prefix}/latest.json`
+# the pointer of `base_key` is written in both cases
+# return (key of the snapshot holding df, uploaded)
+def upload_df_if_changed(s3_client, df, bucket, base_key, artifact_prefix, fmt=DEFAULT_FORMAT):
+    content_hash = frame_hash(df)
+    latest_key = f"{artifact_prefix.rstrip('/')}/{LATEST_FILENAME}"
+    latest = _get_json(s3_client, bucket, latest_key)
+
+    # the previous snapshot may have been removed by a lifecycle rule
+    if latest is not None and latest.get("hash") == content_hash and _exists(s3_client, bucket, latest["key"]):
+        key = latest["key"]
+        uploaded = False
+    else:
+        key = upload_df(s3_client, df, bucket, base_key, fmt)
+        _put_json(s3_client, bucket, latest_key, {
+            "hash": content_hash,
+            "key": key,
+            "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        })
+        uploaded = True
+
+    _put_json(s3_client, bucket, pointer_key(base_key), {"hash": content_hash, "key": key})
+    return key, uploaded
+
+
+# return (snapshot key, content hash) for the cycle artifact `base_key`
+# artifacts written without a pointer resolve to `base_key` itself with an unknown (None) hash
+def resolve_artifact(s3_client, bucket, base_key):
+    pointer = _get_json(s3_client, bucket, pointer_key(base_key))
+    if pointer is None:
+        return base_key, None
+    return pointer["key"], pointer.get("hash")
+
+
+# load the DataFrame of the cycle artifact `base_key`, following its pointer
+# return (df, content hash)
+def load_snapshot(s3_client, bucket, base_key, columns=None):
+    key, content_hash = resolve_artifact(s3_client, bucket, base_key)
+    return load_df(s3_client, bucket, key, columns=columns), content_hash
@@ -0,0 +1,84 @@
+# ------ import module ------
+import threading
+from collections import OrderedDict
+import boto3.session
+import botocore.session
+
+DEFAULT_MAX_CLIENTS = 256
+
+
+# Thread-safe cache of boto3 clients, one per credential
+# - clients are keyed by credential index and rebuilt if the access key behind that index changes
+# - at most `max_clients` clients are kept; the least recently used one is closed and evicted
+# - every session shares one botocore data loader, so service models and endpoint data are parsed once per process
+#   instead of once per credential, and a cached client reuses its HTTPS connection pool
+#
+# usage:
+#   client_pool = CredentialClientPool('ec2', region_name=get_region())
+#   ec2 = client_pool.get(credential_index, credentials.iloc[credential_index])
+class CredentialClientPool:
+    def __init__(self, service_name, region_name, max_clients=DEFAULT_MAX_CLIENTS, config=None):
+        self.service_name = service_name
+        self.region_name = region_name
+        self.max_clients = max_clients
+        self.config = config
+        self.loader = botocore.session.get_session().get_component('data_loader')
+        self.clients = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _new_client(self, credential):
+        botocore_session = botocore.session.get_session()
+        botocore_session.register_component('data_loader', self.loader)
+        session = boto3.session.Session(
+            aws_access_key_id=credential["AccessKeyId"],
+            aws_secret_access_key=credential["SecretAccessKey"],
+            botocore_session=botocore_session
+        )
+        return session.client(self.service_name, region_name=self.region_name, config=self.config)
+
+    # return the cached client of `credential_index`, creating it on first use
+    # `credential` is a mapping (e.g. a credentials DataFrame row) with AccessKeyId and SecretAccessKey
+    def get(self, credential_index, credential):
+        access_key_id = credential["AccessKeyId"]
+        with self.lock:
+            cached = self.clients.get(credential_index)
+            if cached is not None and cached[0] == access_key_id:
+                self.clients.move_to_end(credential_index)
+                return cached[1]
+
+        # build outside the lock so that other threads are not blocked by client construction
+        client = self._new_client(credential)
+
+        evicted = []
+        with self.lock:
+            cached = self.clients.get(credential_index)
+            if cached is not None and cached[0] == access_key_id:
+                evicted.append(client)
+                client = cached[1]
+            else:
+                if cached is not None:
+                    evicted.append(cached[1])
+                self.clients[credential_index] = (access_key_id, client)
+            self.clients.move_to_end(credential_index)
+            while len(self.clients) > self.max_clients:
+                evicted.append(self.clients.popitem(last=False)[1][1])
+
+        for old_client in evicted:
+            self._close(old_client)
+        return client
+
+    def _close(self, client):
+        close = getattr(client, "close", None)
+        if close is not None:
+            close()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.clients)
+
+    def clear(self):
+        with self.lock:
+            clients = [client for _, client in self.clients.values()]
+            self.clients.clear()
+        for client in clients:
+            self._close(client)
@@ -0,0 +1,101 @@
+# ------ import module ------
+import json
+
+# ------ import user module ------
+from utility.artifact_io import upload_df, load_df, artifact_key
+
+# Number of snapshots kept for rollback (one per merge run)
+DEFAULT_KEEP_SNAPSHOTS = 6
+MANIFEST_FILENAME = "manifest.json"
+
+
+# Versioned latest-state store for merge jobs
+# Each merge run saves the full merged DataFrame as a Parquet snapshot under `prefix`, and a small
+# manifest records the current version and the retained versions (oldest first):
+#   {prefix}/manifest.json
+#   {prefix}/{version}.parquet
+# The next run reads the current snapshot instead of parsing the public latest JSON,
+# which becomes a derived artifact written from the same DataFrame.
+#
+# usage:
+#   store = LatestStateStore(s3_client, BUCKET_NAME, "latest_data/state/aws", key_columns=['InstanceType', 'Region', 'AZ'])
+#   previous_df = store.load()      # None if no state has been saved yet
+#   store.save(current_df, "2024-01-01T00-10")
+#   store.rollback()                 # point "current" back to the previous snapshot
+class LatestStateStore:
+    def __init__(self, s3_client, bucket, prefix, key_columns, keep=DEFAULT_KEEP_SNAPSHOTS):
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.key_columns = list(key_columns)
+        self.keep = keep
+
+    def manifest_key(self):
+        return f"{self.prefix}/{MANIFEST_FILENAME}"
+
+    def snapshot_base_key(self, version):
+        return f"{self.prefix}/{version}"
+
+    def read_manifest(self):
+        try:
+            body = self.s3_client.get_object(Bucket=self.bucket, Key=self.manifest_key())["Body"].read()
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return json.loads(body)
+
+    def write_manifest(self, manifest):
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.manifest_key(), Body=json.dumps(manifest).encode("utf-8"),
+                                  ContentType="application/json")
+
+    def versions(self):
+        manifest = self.read_manifest()
+        return manifest["versions"] if manifest else []
+
+    # load the current snapshot (or a specific retained version), None if nothing was saved yet
+    def load(self, version=None, columns=None):
+        manifest = self.read_manifest()
+        if manifest is None or not manifest.get("current"):
+            return None
+        version = version or manifest["current"]
+        if version not in manifest["versions"]:
+            raise KeyError(f"Snapshot version {version} is not retained in {self.prefix}")
+        return load_df(self.s3_client, self.bucket, self.snapshot_base_key(version), columns=columns)
+
+    # save `df` as a new snapshot, make it current and delete snapshots beyond `keep`
+    def save(self, df, version):
+        missing = [col for col in self.key_columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"State DataFrame is missing key columns: {missing}")
+
+        key = upload_df(self.s3_client, df, self.bucket, self.snapshot_base_key(version))
+
+        manifest = self.read_manifest() or {"versions": []}
+        versions = [v for v in manifest["versions"] if v != version] + [version]
+        expired, versions = versions[:-self.keep], versions[-self.keep:]
+        self.write_manifest({"current": version, "versions": versions, "key_columns": self.key_columns})
+
+        if expired:
+            self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": artifact_key(self.snapshot_base_key(v))} for v in expired], "Quiet": True}
+            )
+        return key
+
+    # make `version` (default: the snapshot saved before the current one) current again
+    def rollback(self, version=None):
+        manifest = self.read_manifest()
+        if manifest is None or not manifest.get("current"):
+            raise KeyError(f"No state saved in {self.prefix}")
+        versions = manifest["versions"]
+        if version is None:
+            index = versions.index(manifest["current"])
+            if index == 0:
+                raise KeyError(f"No snapshot older than {manifest['current']} in {self.prefix}")
+            version = versions[index - 1]
+        elif version not in versions:
+            raise KeyError(f"Snapshot version {version} is not retained in {self.prefix}")
+        manifest["current"] = version
+        self.write_manifest(manifest)
+        return version
@@ -0,0 +1,82 @@
+# ------ import module ------
+import numpy as np
+import pandas as pd
+
+# Shared T3/T2 (max instance count) arithmetic of the AWS and Azure merge stages.
+# The previous state is aligned to the current rows by integer key codes instead of a merged frame, and the T3/T2
+# fallbacks are computed on small integer arrays: scores fit in int8 and instance counts in int16.
+FALLBACK_CAPACITY = {50: 45, 45: 40, 40: 35, 35: 30, 30: 25, 25: 20, 20: 15, 15: 10, 10: 5, 5: 1, 1: 0}
+SCORE_DTYPE = np.int8
+COUNT_DTYPE = np.int16
+
+
+# align the previous state to the current rows like a left merge on `key_cols`
+# return (current_positions, previous_positions) with one entry per output row; previous_positions is -1 for rows
+# without a previous state, and a key repeated in previous_df repeats the current row once per match in previous order
+def align_previous(previous_df, current_df, key_cols):
+    n_previous = len(previous_df)
+    codes = None
+    for col in key_cols:
+        values = pd.concat([previous_df[col], current_df[col]], ignore_index=True)
+        col_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        # re-factorize the combined code so it stays dense for any number of key columns
+        codes = col_codes if codes is None else pd.factorize(codes * len(uniques) + col_codes)[0]
+    previous_codes, current_codes = codes[:n_previous], codes[n_previous:]
+
+    # codes are dense, so previous rows are grouped by code with a counting sort instead of a search
+    code_counts = np.bincount(previous_codes, minlength=len(codes) and codes.max() + 1)
+    code_start = np.cumsum(code_counts) - code_counts
+    order = np.argsort(previous_codes, kind="stable")
+    counts = code_counts[current_codes]
+    start = code_start[current_codes]
+
+    if counts.max(initial=0) <= 1:
+        previous_positions = np.full(len(current_df), -1, dtype=np.int64)
+        matched = counts > 0
+        previous_positions[matched] = order[start[matched]]
+        return np.arange(len(current_df)), previous_positions
+
+    repeats = np.maximum(counts, 1)
+    current_positions = np.repeat(np.arange(len(current_df)), repeats)
+    previous_positions = np.full(len(current_positions), -1, dtype=np.int64)
+    matched = np.repeat(counts > 0, repeats)
+    offsets = np.arange(len(current_positions)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    previous_positions[matched] = order[(np.repeat(start, repeats) + offsets)[matched]]
+    return current_positions, previous_positions
+
+
+# gather `values` (a numpy array of previous_df) at `positions`, using `fill` where there is no previous state
+def take_previous(values, positions, fill):
+    taken = np.full(len(positions), fill, dtype=values.dtype)
+    matched = positions >= 0
+    taken[matched] = values[positions[matched]]
+    return taken
+
+
+# integer array of a numeric column, missing values replaced by `fill`
+def int_values(series, dtype, fill):
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=dtype, na_value=fill)
+
+
+# compute (score, T3, T2) of the current collection
+#   score / score_prev : current score and previous score (single node score) of each row
+#   t3, t2 / t3_prev, t2_prev : current and previous max instance counts
+# a score of 3 (2) raises T3 (T2) to the target capacity, a lower score falls back to the next lower capacity
+# scores equal to `missing` are unknown: they fall back like a low score but do not zero T3 / T2
+def max_instance_values(score, score_prev, t3, t3_prev, t2, t2_prev, target_capacity, missing=None):
+    fallback = FALLBACK_CAPACITY.get(target_capacity, 0)
+
+    # merge single node score with multi node score if (multi node score) > (single node score)
+    score_prev = np.maximum(score, score_prev)
+
+    t3 = np.where(score >= 3, np.maximum(t3, t3_prev), np.minimum(fallback, t3_prev))
+    t2 = np.where(score >= 2, np.maximum(t2, t2_prev), np.minimum(fallback, t2_prev))
+
+    # when score is lower than condition, set T3 or T2 to 0; collections with a target capacity > 1 report the
+    # single node score
+    if target_capacity != 1:
+        score = score_prev
+    known = score != missing if missing is not None else np.ones(len(score), dtype=bool)
+    t3[(score <= 2) & known] = 0
+    t2[(score < 2) & known] = 0
+    return score, t3, t2
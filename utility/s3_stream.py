@@ -0,0 +1,118 @@
+# ------ import module ------
+import io
+import threading
+import concurrent.futures
+
+# S3 requires every multipart part except the last one to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_INFLIGHT_PARTS = 4
+
+
+# Writable file object that streams into an S3 object
+# - data is buffered up to `part_size` and then sent as one multipart part in a background thread
+# - at most `max_inflight_parts` parts are in flight, so memory stays bounded by about part_size * (max_inflight_parts + 1)
+# - objects smaller than one part are sent with a single put_object call
+# - `extra_args` (ContentType, ACL, ...) are passed to put_object / create_multipart_upload
+#
+# usage:
+#   with S3StreamWriter(s3_client, bucket, key) as stream:
+#       df.to_csv(stream, index=False, compression="gzip")
+class S3StreamWriter(io.RawIOBase):
+    def __init__(self, s3_client, bucket, key, extra_args=None, part_size=DEFAULT_PART_SIZE, max_inflight_parts=DEFAULT_MAX_INFLIGHT_PARTS):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.extra_args = extra_args or {}
+        self.part_size = part_size
+        self.max_inflight_parts = max_inflight_parts
+
+        self.buffer = bytearray()
+        self.position = 0
+        self.upload_id = None
+        self.parts = []
+        self.futures = []
+        self.executor = None
+        self.inflight = threading.BoundedSemaphore(max_inflight_parts)
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed S3StreamWriter")
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def _submit_part(self, data):
+        if self.upload_id is None:
+            response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra_args)
+            self.upload_id = response["UploadId"]
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_inflight_parts)
+
+        # block until a slot is free so that at most max_inflight_parts are held in memory
+        self.inflight.acquire()
+        part_number = len(self.futures) + 1
+        future = self.executor.submit(self._upload_part, part_number, data)
+        future.add_done_callback(lambda _: self.inflight.release())
+        self.futures.append(future)
+
+    def _upload_part(self, part_number, data):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=data
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer), **self.extra_args)
+            else:
+                if self.buffer:
+                    self._submit_part(bytes(self.buffer))
+                parts = [future.result() for future in self.futures]
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": parts}
+                )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.buffer = bytearray()
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self):
+        if self.upload_id is not None:
+            for future in self.futures:
+                future.cancel()
+            try:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            except Exception as e:
+                print(f"Failed to abort multipart upload of s3://{self.bucket}/{self.key}: {e}")
+            self.upload_id = None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # do not publish a partially written object
+            self.abort()
+            self.buffer = bytearray()
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+            super().close()
+            return False
+        self.close()
+        return False
@@ -0,0 +1,80 @@
+# ------ import module ------
+import json
+import urllib.error
+import urllib.request
+import pandas as pd
+
+# Public feed behind the EC2 Spot Instance Advisor (the same data the spotinfo CLI reads)
+SPOT_ADVISOR_URL = "https://spot-bid-advisor.s3.amazonaws.com/spot-advisor-data.json"
+# interruption frequency label -> IF score
+FREQUENCY_MAP = {'<5%': 3.0, '5-10%': 2.5, '10-15%': 2.0, '15-20%': 1.5, '>20%': 1.0}
+# S3 object metadata holding the HTTP validators of a cached feed
+ETAG_METADATA = "source-etag"
+LAST_MODIFIED_METADATA = "source-last-modified"
+
+
+# download the spot advisor feed
+# etag / last_modified are the validators of a previously downloaded copy and are sent as If-None-Match /
+# If-Modified-Since, so an unchanged feed is answered with 304 and not downloaded again
+# `url` may also be a file:// URL, e.g. a local fixture standing in for the feed
+# return (body, etag, last_modified) where body is None when the feed did not change
+def fetch_spot_advisor(url=SPOT_ADVISOR_URL, etag=None, last_modified=None, timeout=30):
+    request = urllib.request.Request(url)
+    if etag:
+        request.add_header("If-None-Match", etag)
+    if last_modified:
+        request.add_header("If-Modified-Since", last_modified)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read(), response.headers.get("ETag"), response.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, etag, last_modified
+        raise e
+
+
+# parse the spot advisor feed into (Region, InstanceType, IF) rows for `os_name`
+# IF is the score of the interruption frequency range, e.g. '<5%' -> 3.0
+def parse_spot_advisor(body, os_name="Linux"):
+    data = json.loads(body)
+    range_labels = {r['index']: r['label'] for r in data['ranges']}
+
+    spotinfo_dict = {'Region': [], 'InstanceType': [], 'IF': []}
+    for region, os_advice in data['spot_advisor'].items():
+        for instance_type, advice in os_advice.get(os_name, {}).items():
+            spotinfo_dict['Region'].append(region)
+            spotinfo_dict['InstanceType'].append(instance_type)
+            spotinfo_dict['IF'].append(range_labels.get(advice['r']))
+
+    spotinfo_df = pd.DataFrame(spotinfo_dict)
+    spotinfo_df['IF'] = spotinfo_df['IF'].map(FREQUENCY_MAP).astype('float64')
+    return spotinfo_df
+
+
+# load the spot advisor IF data, keeping the last downloaded feed in s3://{bucket}/{cache_key}
+# the cached object carries the ETag / Last-Modified of the feed as metadata, so the next run sends a conditional GET
+# and reuses the cached body when the feed did not change
+# return (spotinfo_df, changed) where changed is False when the cached feed was reused
+def load_spot_advisor(s3_client, bucket, cache_key, url=SPOT_ADVISOR_URL, os_name="Linux"):
+    cached = None
+    try:
+        cached = s3_client.get_object(Bucket=bucket, Key=cache_key)
+    except s3_client.exceptions.NoSuchKey:
+        pass
+
+    etag = last_modified = None
+    if cached is not None:
+        etag = cached['Metadata'].get(ETAG_METADATA)
+        last_modified = cached['Metadata'].get(LAST_MODIFIED_METADATA)
+
+    body, etag, last_modified = fetch_spot_advisor(url, etag, last_modified)
+    if body is None:
+        return parse_spot_advisor(cached['Body'].read(), os_name), False
+
+    metadata = {}
+    if etag:
+        metadata[ETAG_METADATA] = etag
+    if last_modified:
+        metadata[LAST_MODIFIED_METADATA] = last_modified
+    s3_client.put_object(Bucket=bucket, Key=cache_key, Body=body, ContentType="application/json", Metadata=metadata)
+    return parse_spot_advisor(body, os_name), True
@@ -0,0 +1,58 @@
+# ------ import module ------
+import numpy as np
+
+# Maximum number of records accepted by a single Timestream WriteRecords call
+MAX_RECORDS_PER_BATCH = 100
+
+# Declarative record layout per vendor
+#   "dimensions" : dimension columns, columns missing from the DataFrame are skipped (e.g. "Ceased")
+#   "measures"   : (column, Timestream type) pairs of the multi-measure record
+#   "fields"     : constant keys copied into every record
+AWS_RECORD_SPEC = {
+    "dimensions": ["InstanceType", "Region", "AZ", "OndemandPrice", "Ceased"],
+    "measures": [("SPS", "BIGINT"), ("T3", "BIGINT"), ("T2", "BIGINT"), ("IF", "DOUBLE"), ("SpotPrice", "DOUBLE")],
+    "fields": {"MeasureName": "aws_values", "MeasureValueType": "MULTI"},
+}
+
+# MeasureName / MeasureValueType are sent as CommonAttributes by the Azure uploader
+AZURE_RECORD_SPEC = {
+    "dimensions": ["InstanceTier", "InstanceType", "Region", "AvailabilityZone"],
+    "measures": [("DesiredCount", "DOUBLE"), ("OndemandPrice", "DOUBLE"), ("SpotPrice", "DOUBLE"), ("IF", "DOUBLE"),
+                 ("Score", "VARCHAR"), ("Time", "VARCHAR"), ("T2", "DOUBLE"), ("T3", "DOUBLE")],
+    "fields": {},
+}
+
+GCP_RECORD_SPEC = {
+    "dimensions": ["InstanceType", "Region", "Ceased"],
+    "measures": [("OnDemand Price", "DOUBLE"), ("Spot Price", "DOUBLE")],
+    "fields": {"MeasureName": "gcp_values", "MeasureValueType": "MULTI"},
+}
+
+
+# convert one column to a list of python strings, same text as str(value) per cell
+def column_as_str(series):
+    return np.asarray(series.astype(str), dtype=object).tolist()
+
+
+# encode DataFrame rows to Timestream records and yield them in batches of `batch_size`
+# every column is converted to strings once, then records are assembled column-wise without iterrows
+def iter_record_batches(data, spec, time_value, batch_size=MAX_RECORDS_PER_BATCH, fields=None):
+    dimension_cols = [col for col in spec["dimensions"] if col in data.columns]
+    measure_cols = spec["measures"]
+    record_fields = {**spec["fields"], **(fields or {})}
+
+    dimension_values = [column_as_str(data[col]) for col in dimension_cols]
+    measure_values = [column_as_str(data[col]) for col, _ in measure_cols]
+
+    for start in range(0, len(data), batch_size):
+        end = min(start + batch_size, len(data))
+        batch = []
+        for i in range(start, end):
+            batch.append({
+                'Dimensions': [{'Name': col, 'Value': values[i]} for col, values in zip(dimension_cols, dimension_values)],
+                'MeasureValues': [{'Name': col, 'Value': values[i], 'Type': types}
+                                  for (col, types), values in zip(measure_cols, measure_values)],
+                'Time': time_value,
+                **record_fields
+            })
+        yield batch
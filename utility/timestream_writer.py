@@ -0,0 +1,211 @@
+# ------ import module ------
+import os
+import time
+import random
+import threading
+import concurrent.futures
+from collections import Counter
+from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError, HTTPClientError
+
+# Default write budget of one table, in records per second (100 records per WriteRecords call)
+DEFAULT_RECORDS_PER_SECOND = 5000
+# environment variable overriding the write budget of a table, e.g. TIMESTREAM_RECORDS_PER_SECOND_AWS
+RECORDS_PER_SECOND_ENV = "TIMESTREAM_RECORDS_PER_SECOND_{table}"
+# Errors worth retrying with backoff, anything else fails the batch immediately
+RETRYABLE_ERROR_CODES = {"ThrottlingException", "InternalServerException", "ServiceUnavailable"}
+# connection errors and read timeouts, retried like the retryable error codes
+RETRYABLE_EXCEPTIONS = (BotocoreConnectionError, HTTPClientError)
+# botocore retries of the timestream-write client given to TimestreamBatchWriter: the writer retries throttled,
+# transient and connection errors itself, so the client makes a single attempt instead of multiplying the writer's
+# attempts (and its sleeps) by its own
+WRITER_CLIENT_RETRIES = {"total_max_attempts": 1}
+
+
+# write budget of `table_name`: the table's default unless its environment variable is set
+def table_records_per_second(table_name, default=DEFAULT_RECORDS_PER_SECOND):
+    value = os.environ.get(RECORDS_PER_SECOND_ENV.format(table=table_name.upper()))
+    return int(value) if value else default
+
+
+# Token bucket shared by all writer threads
+# acquire() blocks until `tokens` are available, pause() empties the bucket so every thread backs off together
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.updated:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return
+                    wait = (tokens - self.tokens) / self.rate
+                else:
+                    # paused after throttling
+                    wait = self.updated - now
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.tokens = 0
+            self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+# identity of a Timestream record, used to drop duplicated records before they are retried
+def record_key(record):
+    dimensions = tuple(sorted((d["Name"], d["Value"]) for d in record.get("Dimensions", [])))
+    return record.get("Time"), record.get("MeasureName"), dimensions
+
+
+def deduplicate_records(records):
+    unique = {}
+    for record in records:
+        unique[record_key(record)] = record
+    return list(unique.values())
+
+
+# Writes record batches to one Timestream table from a shared thread pool
+# - a token bucket keeps the write rate under `records_per_second`
+# - ThrottlingException, transient and connection errors are retried with exponential backoff and full jitter; the
+#   client should not retry on its own (Config(retries=WRITER_CLIENT_RETRIES))
+# - rejected records are de-duplicated and retried at most `max_rejected_retries` times
+# - close() waits for all batches and reports aggregated metrics once, calling `notify` only when records were lost
+#
+# usage:
+#   writer = TimestreamBatchWriter(write_client, DATABASE_NAME, TABLE_NAME, notify=send_slack_message,
+#                                  records_per_second=table_records_per_second(TABLE_NAME, TABLE_RECORDS_PER_SECOND))
+#   writer.write(batches)
+#   report = writer.close()
+class TimestreamBatchWriter:
+    def __init__(self, client, database_name, table_name, common_attributes=None, max_workers=10,
+                 records_per_second=DEFAULT_RECORDS_PER_SECOND, max_attempts=8, max_rejected_retries=3,
+                 base_delay=0.5, max_delay=30.0, notify=None):
+        self.client = client
+        self.database_name = database_name
+        self.table_name = table_name
+        self.common_attributes = common_attributes or {}
+        self.max_attempts = max_attempts
+        self.max_rejected_retries = max_rejected_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.notify = notify
+
+        self.bucket = TokenBucket(records_per_second)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = []
+        self.metrics = Counter()
+        self.rejected_reasons = Counter()
+        self.errors = Counter()
+        self.metrics_lock = threading.Lock()
+        self.start_time = time.monotonic()
+
+    def submit(self, records):
+        with self.metrics_lock:
+            self.metrics["batches"] += 1
+            self.metrics["records"] += len(records)
+        self.futures.append(self.executor.submit(self._write_batch, list(records)))
+
+    def write(self, batches):
+        for records in batches:
+            self.submit(records)
+
+    def _count(self, name, value=1, counter=None):
+        with self.metrics_lock:
+            (counter if counter is not None else self.metrics)[name] += value
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _write_batch(self, records):
+        attempt = 0
+        rejected_retries = 0
+        while records:
+            self.bucket.acquire(len(records))
+            try:
+                self.client.write_records(DatabaseName=self.database_name, TableName=self.table_name,
+                                          Records=records, CommonAttributes=self.common_attributes)
+                self._count("records_written", len(records))
+                return
+            except ClientError as err:
+                code = err.response.get("Error", {}).get("Code", "ClientError")
+
+                if code == "RejectedRecordsException":
+                    rejected = err.response.get("RejectedRecords", [])
+                    rejected_indices = sorted({rr["RecordIndex"] for rr in rejected})
+                    for rr in rejected:
+                        self._count(rr.get("Reason", "Unknown"), counter=self.rejected_reasons)
+                    self._count("records_written", len(records) - len(rejected_indices))
+
+                    retry_records = deduplicate_records([records[i] for i in rejected_indices])
+                    self._count("records_deduplicated", len(rejected_indices) - len(retry_records))
+
+                    rejected_retries += 1
+                    if rejected_retries > self.max_rejected_retries:
+                        self._count("records_rejected", len(retry_records))
+                        return
+                    self._count("rejected_retries")
+                    records = retry_records
+                    time.sleep(self._backoff_delay(rejected_retries))
+                    continue
+
+                if code in RETRYABLE_ERROR_CODES:
+                    attempt += 1
+                    self._count("throttled" if code == "ThrottlingException" else "transient_errors")
+                    if attempt < self.max_attempts:
+                        delay = self._backoff_delay(attempt)
+                        if code == "ThrottlingException":
+                            self.bucket.pause(delay)
+                        time.sleep(delay)
+                        continue
+
+                self._count(code, counter=self.errors)
+                self._count("records_failed", len(records))
+                return
+            except RETRYABLE_EXCEPTIONS as err:
+                attempt += 1
+                self._count("transient_errors")
+                if attempt < self.max_attempts:
+                    time.sleep(self._backoff_delay(attempt))
+                    continue
+                self._count(type(err).__name__, counter=self.errors)
+                self._count("records_failed", len(records))
+                return
+            except Exception as err:
+                self._count(type(err).__name__, counter=self.errors)
+                self._count("records_failed", len(records))
+                return
+
+    # wait for every submitted batch and return the aggregated report
+    def close(self):
+        for future in concurrent.futures.as_completed(self.futures):
+            future.result()
+        self.executor.shutdown(wait=True)
+        self.futures = []
+
+        report = dict(self.metrics)
+        report["elapsed_seconds"] = round(time.monotonic() - self.start_time, 2)
+        report["rejected_reasons"] = dict(self.rejected_reasons)
+        report["errors"] = dict(self.errors)
+
+        message = (f"Timestream {self.database_name}.{self.table_name}: "
+                   f"{report.get('records_written', 0)}/{report.get('records', 0)} records written in {report.get('batches', 0)} batches, "
+                   f"rejected {report.get('records_rejected', 0)}, failed {report.get('records_failed', 0)}, "
+                   f"throttled {report.get('throttled', 0)} times, {report['elapsed_seconds']}s")
+        if report["rejected_reasons"]:
+            message += f"\nrejected reasons : {report['rejected_reasons']}"
+        if report["errors"]:
+            message += f"\nerrors : {report['errors']}"
+        print(message)
+
+        if self.notify is not None and (report.get("records_rejected", 0) or report.get("records_failed", 0)):
+            self.notify(message)
+        return report
@@ -0,0 +1,60 @@
+# ------ import module ------
+import numpy as np
+import pandas as pd
+
+
+# hash columns row-wise into one uint64 per row
+# numeric columns are compared by value (3 == 3.0, NaN == NaN) regardless of int/float/nullable dtype
+def hash_columns(df, cols):
+    normalized = {}
+    for col in cols:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            normalized[col] = series.astype("float64")
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            normalized[col] = series
+        else:
+            normalized[col] = series.astype(str)
+    normalized_df = pd.DataFrame(normalized, index=df.index)
+    return pd.util.hash_pandas_object(normalized_df, index=False).to_numpy()
+
+
+# build (workload hash, occurrence) keys so duplicated workloads are paired in order of appearance
+def workload_keys(df, workload_cols):
+    key_hash = hash_columns(df, workload_cols)
+    occurrence = pd.Series(key_hash).groupby(key_hash, sort=False).cumcount().to_numpy()
+    return pd.DataFrame({"Key": key_hash, "Occurrence": occurrence, "Position": np.arange(len(df))})
+
+
+# compare previous collected workload with current collected workload
+# return (changed_df, removed_df)
+#   changed_df : current rows whose workload is new or whose feature values differ
+#   removed_df : previous rows whose workload disappeared, features set to 0 and "Ceased" flag added
+def diff_workloads(previous_df, current_df, workload_cols, feature_cols):
+    previous_keys = workload_keys(previous_df, workload_cols)
+    current_keys = workload_keys(current_df, workload_cols)
+
+    joined = current_keys.merge(previous_keys, on=["Key", "Occurrence"], how="left", suffixes=("", "_prev"), sort=False)
+    joined = joined.sort_values("Position", kind="stable")
+    matched = joined["Position_prev"].notna().to_numpy()
+    previous_position = joined["Position_prev"].fillna(-1).astype("int64").to_numpy()
+
+    previous_feature = hash_columns(previous_df, feature_cols)
+    current_feature = hash_columns(current_df, feature_cols)
+
+    changed_mask = ~matched
+    changed_mask[matched] = current_feature[matched] != previous_feature[previous_position[matched]]
+
+    removed_mask = np.ones(len(previous_df), dtype=bool)
+    removed_mask[previous_position[matched]] = False
+
+    changed_df = current_df.iloc[np.flatnonzero(changed_mask)].copy()
+    removed_df = previous_df.iloc[np.flatnonzero(removed_mask)].copy()
+
+    for col in feature_cols:
+        removed_df[col] = 0
+
+    # removed_df have one more column, "Ceased"
+    removed_df["Ceased"] = True
+
+    return changed_df, removed_df